@@ -0,0 +1,89 @@
+"""
+Benchmark: per-item savings/validation pipelines vs NumPy batches
+
+    python benchmarks/bench_batch.py [n_items] [batch_size] [repeat]
+
+Items already have float prices, like stored products being
+re-processed. Each path runs `repeat` times on fresh items and the best
+time counts, since single runs are noisy. Also checks both paths agree.
+"""
+
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scrapy
+from itemadapter import ItemAdapter
+from scrapy.exceptions import DropItem
+
+from fixtures import make_items
+from jumiascraper.batch import process_batch
+from jumiascraper.pipelines import (
+    CalculateSavingsPipeline,
+    DropNoPricePipeline,
+    ValidateItemPipeline,
+)
+from jumiascraper.prices import parse_price
+
+
+def stored_items(n):
+    items = make_items(n)
+    for item in items:
+        item.current_price = parse_price(item.current_price)
+        item.original_price = parse_price(item.original_price)
+    return items
+
+
+def run_scalar(items, spider):
+    stages = [CalculateSavingsPipeline(), DropNoPricePipeline(), ValidateItemPipeline()]
+    kept = []
+    for item in items:
+        try:
+            for stage in stages:
+                item = stage.process_item(item, spider)
+            kept.append(item)
+        except DropItem:
+            pass
+    return kept
+
+
+def run_batches(items, batch_size):
+    kept = []
+    for i in range(0, len(items), batch_size):
+        batch = items[i:i + batch_size]
+        kept.extend(item for item, reason in zip(batch, process_batch(batch)) if reason is None)
+    return kept
+
+
+def best_of(repeat, n, run):
+    best, kept = None, None
+    for _ in range(repeat):
+        items = stored_items(n)
+        start = time.perf_counter()
+        kept = run(items)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, [ItemAdapter(item).asdict() for item in kept]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    spider = scrapy.Spider(name='bench')
+    logging.getLogger('bench').setLevel(logging.CRITICAL)
+
+    scalar, kept_scalar = best_of(repeat, n, lambda items: run_scalar(items, spider))
+    batched, kept_batch = best_of(repeat, n, lambda items: run_batches(items, batch_size))
+
+    print(f"{n:,} items, batch size {batch_size:,}, best of {repeat}")
+    print(f"per-item pipelines: {scalar:.3f}s  {n / scalar:12,.0f} items/s  kept={len(kept_scalar)}")
+    print(f"numpy batches:      {batched:.3f}s  {n / batched:12,.0f} items/s  kept={len(kept_batch)}")
+    print(f"speed-up: {scalar / batched:.2f}x  identical output: {kept_scalar == kept_batch}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: listing pages parsed per second, loader vs lxml extractor
+vs the embedded window.__STORE__ JSON
+
+    python benchmarks/bench_extractors.py [n_pages]
+
+Also checks that both HTML engines yield identical items, and that the
+JSON state gives the same products with the same values for every field
+the HTML cards carry (it adds rating, reviews_count, in_stock, seller).
+"""
+
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from itemadapter import ItemAdapter
+from scrapy.http import HtmlResponse
+
+from fixtures import listing_responses
+from jumiascraper.extractors import extract_listing, extract_store_products
+from jumiascraper.spiders.jumiaspider import JumiaSpiderSpider
+
+
+def fresh(responses):
+    # New response objects so no cached selector is reused between runs
+    return [HtmlResponse(r.url, body=r.body, encoding='utf-8', request=r.request) for r in responses]
+
+
+def run(label, parse, responses):
+    start = time.perf_counter()
+    items = [item for response in responses for item in parse(response)]
+    elapsed = time.perf_counter() - start
+    print(f"{label:8s} {len(responses) / elapsed:8.1f} pages/s  {len(items) / elapsed:10,.0f} items/s")
+    return items
+
+
+def main():
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    responses = listing_responses(n_pages, store=True)
+    spider = JumiaSpiderSpider()
+    logging.getLogger(spider.name).setLevel(logging.ERROR)
+
+    print(f"{n_pages} listing pages, {len(responses[0].body) // 1024} KiB each")
+    loader_items = run('loader', spider.parse_products, fresh(responses))
+    lxml_items = run('lxml', lambda r: extract_listing(r, logger=spider.logger), fresh(responses))
+
+    json_items = run('json', lambda r: extract_store_products(r), fresh(responses))
+
+    same = loader_items == lxml_items
+    print(f"identical output: {same} ({len(loader_items)} items)")
+    mismatches = [
+        (html, store) for html, store in zip(lxml_items, json_items)
+        if any(ItemAdapter(store).get(field) != value
+               for field, value in ItemAdapter(html).items() if value is not None)
+    ]
+    same_json = len(json_items) == len(lxml_items) and not mismatches
+    print(f"json state matches html: {same_json} ({len(json_items)} items)")
+    for html, store in mismatches[:3]:
+        print(f"  html: {ItemAdapter(html).asdict()}\n  json: {ItemAdapter(store).asdict()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark and check: shared crawl frontier backends
+
+    python benchmarks/bench_frontier.py [requests] [redis_url]
+
+Runs the same checks against SQLiteFrontier and RedisFrontier (a real
+server when redis_url is given, else an in-process fakeredis, pip
+install fakeredis; skipped when neither is available):
+
+- a busy domain at the head of the queue doesn't hide ready domains
+  behind it;
+- every request is handed out once, in priority order per domain, and
+  an expired lease hands it out again;
+- push and pop+ack throughput with no domain budgets.
+"""
+
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jumiascraper.frontier import RedisFrontier, SQLiteFrontier
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def backends(redis_url):
+    yield 'sqlite', lambda: SQLiteFrontier(str(Path(tempfile.mkdtemp()) / 'frontier.sqlite'))
+    prefix = lambda: f'bench-{uuid.uuid4().hex[:8]}'
+    if redis_url:
+        yield 'redis', lambda: RedisFrontier(redis_url, prefix())
+    elif fakeredis is not None:
+        yield 'fakeredis', lambda: RedisFrontier(None, prefix(), client=fakeredis.FakeRedis())
+    else:
+        print('redis: skipped (pip install fakeredis, or pass a redis:// URL)')
+
+
+def check_head_of_line(frontier):
+    # One budget per second per domain; the busy domain's requests all
+    # sort before the others
+    for i in range(500):
+        frontier.push(f'busy-{i}', 'busy', 10, b'x')
+    for i in range(50):
+        frontier.push(f'other-{i}', f'd{i % 5}', 0, b'x')
+    popped = [frontier.pop('node', 300, {}, 1.0)[0][0] for _ in range(6)]
+    assert popped[0] == 'busy-0', popped
+    assert sorted(popped[1:]) == [f'other-{i}' for i in range(5)], popped
+    entry, wait = frontier.pop('node', 300, {}, 1.0)
+    assert entry is None and 0 < wait <= 1.0, (entry, wait)
+
+
+def check_order_and_leases(frontier):
+    for i in range(20):
+        frontier.push(f'r{i}', 'a' if i % 2 else 'b', i % 3, b'x')
+    assert not frontier.push('r0', 'b', 0, b'x')
+    popped = []
+    while True:
+        entry, _ = frontier.pop('node', 300, {}, 0.0)
+        if entry is None:
+            break
+        popped.append(entry[0])
+    assert sorted(popped) == sorted(f'r{i}' for i in range(20)), popped
+    for domain in ('a', 'b'):
+        priorities = [int(key[1:]) % 3 for key in popped if (int(key[1:]) % 2 == 1) == (domain == 'a')]
+        assert priorities == sorted(priorities, reverse=True), (domain, priorities)
+
+    frontier.push('leased', 'c', 0, b'payload')
+    (key, payload), _ = frontier.pop('dead-node', 0.01, {}, 0.0)
+    time.sleep(0.02)
+    (again, payload), _ = frontier.pop('node', 300, {}, 0.0)
+    assert key == again == 'leased' and payload == b'payload'
+    for key in popped + ['leased']:
+        frontier.ack(key)
+    assert frontier.pending() == 0, frontier.pending()
+
+
+def throughput(frontier, n, domains=8):
+    started = time.perf_counter()
+    for i in range(n):
+        frontier.push(f'req-{i}', f'domain-{i % domains}', i % 4, b'x' * 200)
+    push_rate = n / (time.perf_counter() - started)
+    started = time.perf_counter()
+    count = 0
+    while True:
+        entry, _ = frontier.pop('node', 300, {}, 0.0)
+        if entry is None:
+            break
+        frontier.ack(entry[0])
+        count += 1
+    assert count == n, count
+    return push_rate, n / (time.perf_counter() - started)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    redis_url = sys.argv[2] if len(sys.argv) > 2 else None
+    for name, factory in backends(redis_url):
+        for check in (check_head_of_line, check_order_and_leases):
+            frontier = factory()
+            check(frontier)
+            frontier.close()
+        frontier = factory()
+        push_rate, pop_rate = throughput(frontier, n)
+        frontier.close()
+        print(f"{name:10s} checks ok  push {push_rate:9,.0f}/s  pop+ack {pop_rate:9,.0f}/s  ({n:,} requests)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: JumiaProduct as a slotted dataclass vs the old scrapy.Item
+
+    python benchmarks/bench_items.py [n_items]
+
+Reports memory per item (tracemalloc, n items alive at once, as when
+they queue in the engine), construction time and ItemAdapter
+get/set throughput.
+"""
+
+import sys
+import time
+import tracemalloc
+from dataclasses import fields
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scrapy
+from itemadapter import ItemAdapter
+
+from fixtures import load_rows
+from jumiascraper.items import JumiaProduct, register_adapter
+from jumiascraper.prices import parse_price
+
+# The dict-backed item JumiaProduct used to be, same fields
+LegacyJumiaProduct = type(
+    'LegacyJumiaProduct', (scrapy.Item,),
+    {f.name: scrapy.Field() for f in fields(JumiaProduct)},
+)
+
+
+def rows(n):
+    sample = load_rows()
+    out = []
+    for i in range(n):
+        row = dict(sample[i % len(sample)])
+        row['name'] = f"{row['name']} #{i}"
+        row['product_id'] = f"{row['product_id']}{i}"
+        row['current_price'] = parse_price(row['current_price'])
+        row['original_price'] = parse_price(row['original_price'])
+        out.append(row)
+    return out
+
+
+def measure(item_cls, data):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    items = [item_cls(**row) for row in data]
+    build = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for item in items:
+        adapter = ItemAdapter(item)
+        current = adapter.get('current_price')
+        original = adapter.get('original_price')
+        if current and original:
+            adapter['savings_amount'] = round(original - current, 2)
+    access = time.perf_counter() - start
+    return memory / len(items), build, access
+
+
+def main():
+    register_adapter()
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    data = rows(n)
+    print(f"{n:,} items alive at once (field values excluded: shared by both)")
+    results = {}
+    for label, item_cls in (('scrapy.Item', LegacyJumiaProduct), ('dataclass', JumiaProduct)):
+        per_item, build, access = measure(item_cls, data)
+        results[label] = per_item
+        print(f"{label:12s} {per_item:7.0f} B/item  build {n / build:10,.0f} items/s  "
+              f"ItemAdapter get/set {n / access:10,.0f} items/s")
+    print(f"memory saved: {1 - results['dataclass'] / results['scrapy.Item']:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: six-stage pipeline chain vs the fused NormalizePipeline
+
+Run from the project root (next to scrapy.cfg):
+
+    python benchmarks/bench_pipelines.py [n_items]
+"""
+
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scrapy
+from scrapy.exceptions import DropItem
+
+from fixtures import make_items
+from jumiascraper.pipelines import (
+    CalculateSavingsPipeline,
+    DropNoPricePipeline,
+    DuplicatesPipeline,
+    NormalizePipeline,
+    PriceConverterPipeline,
+    PriceToZARPipeline,
+    ValidateItemPipeline,
+)
+
+def run_chain(stages, items, spider):
+    start = time.perf_counter()
+    kept = 0
+    for item in items:
+        try:
+            for stage in stages:
+                item = stage.process_item(item, spider)
+            kept += 1
+        except DropItem:
+            pass
+    return time.perf_counter() - start, kept
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    spider = scrapy.Spider(name='bench')
+    logging.getLogger('bench').setLevel(logging.ERROR)
+
+    chain = [
+        PriceConverterPipeline(),
+        PriceToZARPipeline(),
+        CalculateSavingsPipeline(),
+        DropNoPricePipeline(),
+        DuplicatesPipeline(),
+        ValidateItemPipeline(),
+    ]
+    chain_time, chain_kept = run_chain(chain, make_items(n), spider)
+    fused_time, fused_kept = run_chain([NormalizePipeline()], make_items(n), spider)
+
+    print(f"items:        {n}")
+    print(f"six-stage:    {chain_time:.3f}s  {n / chain_time:,.0f} items/s  kept={chain_kept}")
+    print(f"fused:        {fused_time:.3f}s  {n / fused_time:,.0f} items/s  kept={fused_kept}")
+    print(f"speed-up:     {chain_time / fused_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: per-value price parsing cost
+
+Compares the old MapCompose lambda chain from JumiaProductLoader
+and the old remove_currency_symbol/clean_number/to_float helpers
+against prices.parse_price, over every price in jumia_smartphones.json.
+
+    python benchmarks/bench_prices.py [repeat]
+"""
+
+import json
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from itemloaders.processors import MapCompose
+
+from jumiascraper.prices import parse_price
+
+SAMPLE = Path(__file__).resolve().parent.parent / 'jumia_smartphones.json'
+
+# The chains as they were before prices.py
+legacy_loader_chain = MapCompose(
+    lambda x: x.strip() if x else None,
+    lambda x: x.replace('KSh', '').replace('Ksh', '').replace('ksh', '').strip() if x else None,
+    lambda x: x.replace(',', '').replace(' ', '') if x else None,
+    lambda x: x if x and x.replace('.', '').isdigit() else None
+)
+
+
+def _remove_currency_symbol(value):
+    return re.sub(r'[KSh$£€¥₹]', '', value).strip() if value else None
+
+
+def _clean_number(value):
+    return re.sub(r'[,\s]', '', value) if value else None
+
+
+def _to_float(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+legacy_advanced_chain = MapCompose(
+    str.strip, _remove_currency_symbol, _clean_number, _to_float
+)
+
+new_chain = MapCompose(parse_price)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rows = json.loads(SAMPLE.read_text(encoding='utf-8'))
+    values = [
+        row[field] for row in rows
+        for field in ('current_price', 'original_price') if row.get(field)
+    ]
+
+    print(f"{len(values)} price values x {repeat} runs")
+    cases = [
+        ('loader lambdas (MapCompose)', lambda: [legacy_loader_chain(v) for v in values]),
+        ('advanced helpers (MapCompose)', lambda: [legacy_advanced_chain(v) for v in values]),
+        ('parse_price (MapCompose)', lambda: [new_chain(v) for v in values]),
+        ('parse_price (direct)', lambda: [parse_price(v) for v in values]),
+    ]
+    for label, fn in cases:
+        best = min(timeit.repeat(fn, number=1, repeat=repeat))
+        print(f"{label:32s} {best / len(values) * 1e9:8.0f} ns/value")
+
+
+if __name__ == '__main__':
+    main()
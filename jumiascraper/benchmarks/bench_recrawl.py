@@ -0,0 +1,53 @@
+"""
+Benchmark: change-rate-aware recrawl vs uniform revisits, offline
+
+    python benchmarks/bench_recrawl.py [pages] [days] [visits_per_hour]
+
+Generates listing pages whose product sets change as Poisson processes
+with very different rates (most pages rarely change, a few churn
+several times a day), then replays them through recrawl.simulate()
+with the same visit budget for both schedules.
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jumiascraper.recrawl import DAY, HOUR, RecrawlPolicy, simulate
+
+
+def synthetic_timelines(pages, days, seed=7):
+    rng = random.Random(seed)
+    timelines = {}
+    for page in range(pages):
+        # Changes per day, log-uniform between once a month and 5 times a day
+        rate = 10 ** rng.uniform(-1.5, 0.7) / DAY
+        t, times = 0.0, []
+        while True:
+            t += rng.expovariate(rate)
+            if t > days * DAY:
+                break
+            times.append(t)
+        timelines[f'https://www.jumia.co.ke/smartphones/?page={page + 1}'] = times
+    return timelines
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    budget = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    timelines = synthetic_timelines(pages, days)
+    total = sum(len(times) for times in timelines.values())
+    print(f"{pages} pages, {days} days, {total} changes, {budget} visits/hour")
+    policy = RecrawlPolicy(min_interval=HOUR, max_interval=14 * DAY)
+    results = simulate(timelines, budget, HOUR, policy, start=0.0, end=days * DAY)
+    for name, result in results.items():
+        visits, caught = result['visits'], result['changes_caught']
+        print(f"{name:9s} visits={visits:6d}  changes caught={caught:5d}  "
+              f"per 100 visits={100 * caught / visits:5.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: SearchIndex queries vs scanning the JSON feed
+
+    python benchmarks/bench_search.py [products] [index_dir]
+
+Builds a feed and an index of `products` products from the sample
+rows (prices spread around the originals), then answers the same
+queries by json.load() + a linear scan and by SearchIndex.search().
+Finally re-indexes every product with 1% of the prices changed, to time
+an incremental commit.
+"""
+
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fixtures import load_rows
+from jumiascraper.prices import parse_price
+from jumiascraper.search import SearchIndex, parse_query, tokenize
+
+QUERIES = [
+    'Samsung under 20,000 KSh with 128GB',
+    'infinix between 10k and 15k 8gb',
+    'brand:tecno over 30000',
+    'xiaomi redmi a3x',
+    'under 5000',
+    # A model range, not prices
+    'iphone 12 to 13',
+    'iphone price:12k to 13k',
+]
+
+
+def make_products(n, seed=7):
+    rng = random.Random(seed)
+    rows = load_rows()
+    products = []
+    for i in range(n):
+        row = rows[i % len(rows)]
+        price = parse_price(row.get('current_price'))
+        products.append({
+            'product_id': f"{row['product_id']}{i}",
+            'name': row['name'],
+            'brand': row.get('brand'),
+            'current_price': round(price * rng.uniform(0.7, 1.3)) if price else None,
+            'full_url': row.get('full_url'),
+        })
+    return products
+
+
+def scan(products, query):
+    q = parse_query(query)
+    low = q['min_price'] if q['min_price'] is not None else float('-inf')
+    high = q['max_price'] if q['max_price'] is not None else float('inf')
+    hits = []
+    for product in products:
+        price = product['current_price']
+        if (q['min_price'] is not None or q['max_price'] is not None) and (
+                price is None or not low <= price <= high):
+            continue
+        tokens = set(tokenize(product['name'])) | set(tokenize(product['brand']))
+        if all(term in tokens for term in q['terms']) and (
+                not q['brands'] or ' '.join(tokenize(product['brand'])) in q['brands']):
+            hits.append(product)
+    return len(hits)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    path = Path(sys.argv[2]) if len(sys.argv) > 2 else Path(tempfile.mkdtemp()) / 'search_index'
+    shutil.rmtree(path, ignore_errors=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    products = make_products(n)
+    feed = path.with_name('feed.json')
+    feed.write_text(json.dumps(products), encoding='utf-8')
+
+    started = time.perf_counter()
+    index = SearchIndex(path)
+    for product in products:
+        index.add(product)
+    index.commit()
+    print(f"{n} products indexed in {time.perf_counter() - started:.1f} s")
+
+    started = time.perf_counter()
+    index = SearchIndex(path)
+    print(f"index opened in {(time.perf_counter() - started) * 1000:.0f} ms")
+    for query in QUERIES:
+        started = time.perf_counter()
+        loaded = json.loads(feed.read_text(encoding='utf-8'))
+        scanned = scan(loaded, query)
+        scan_ms = (time.perf_counter() - started) * 1000
+        index.search(query)  # first touch of the postings pages
+        started = time.perf_counter()
+        total, _ = index.search(query)
+        index_ms = (time.perf_counter() - started) * 1000
+        assert total == scanned, (query, total, scanned)
+        print(f"{query!r:42s} {total:7d} hits  scan {scan_ms:8.0f} ms  index {index_ms:6.2f} ms")
+
+    rng = random.Random(11)
+    for product in rng.sample(products, n // 100):
+        if product['current_price']:
+            product['current_price'] += 1
+    started = time.perf_counter()
+    changed = sum(index.add(product) for product in products)
+    index.commit()
+    print(f"re-index with {changed} changed: {time.perf_counter() - started:.1f} s, "
+          f"{len(index.segments)} segments")
+    total, _ = index.search(QUERIES[0])
+    print(f"{QUERIES[0]!r}: {total} hits after the update")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: sharded JSON Lines feed vs one JSON array
+
+    python benchmarks/bench_shards.py [items] [items_per_shard] [compression]
+
+Writes the same items as a single JSON array (what -O items.json
+produces) and as ShardWriter shards, then reads both back: the array
+with one json.load(), the shards with a process pool across all cores.
+Also reports when the first items became readable: after the whole
+array was written, versus after the first shard.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from itemadapter import ItemAdapter
+from scrapy.utils.serialize import ScrapyJSONEncoder
+
+from fixtures import make_items
+from jumiascraper.items import register_adapter
+from jumiascraper.shards import ShardWriter, finished_shards, read_shard
+
+
+def count_items(path):
+    return sum(1 for _ in read_shard(path))
+
+
+def main():
+    register_adapter()
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    per_shard = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    compression = sys.argv[3] if len(sys.argv) > 3 else 'gzip'
+    items = make_items(n)
+    out = Path(tempfile.mkdtemp())
+
+    started = time.perf_counter()
+    encoder = ScrapyJSONEncoder(ensure_ascii=False)
+    with open(out / 'items.json', 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        for i, item in enumerate(items):
+            f.write((',\n' if i else '') + encoder.encode(ItemAdapter(item).asdict()))
+        f.write('\n]')
+    array_write = time.perf_counter() - started
+
+    started = time.perf_counter()
+    first_shard = None
+    writer = ShardWriter(out / 'feed', 'bench', compression=compression, max_items=per_shard)
+    for item in items:
+        writer.write(item)
+        if first_shard is None and writer.manifest['shards']:
+            first_shard = time.perf_counter() - started
+    writer.close()
+    shard_write = time.perf_counter() - started
+    shards = finished_shards(out / 'feed')
+    shard_bytes = sum(path.stat().st_size for path in shards)
+
+    started = time.perf_counter()
+    with open(out / 'items.json', encoding='utf-8') as f:
+        array_count = len(json.load(f))
+    array_read = time.perf_counter() - started
+
+    workers = os.cpu_count() or 1
+    started = time.perf_counter()
+    with Pool(workers) as pool:
+        shard_count = sum(pool.map(count_items, shards))
+    shard_read = time.perf_counter() - started
+    assert array_count == shard_count == n
+
+    print(f"{n} items, {workers} cores")
+    print(f"json array  write {array_write:5.2f} s  {(out / 'items.json').stat().st_size / 1e6:7.1f} MB  "
+          f"first items readable after {array_write:5.2f} s  read {array_read:5.2f} s")
+    print(f"{len(shards):3d} {compression} shards write {shard_write:5.2f} s  {shard_bytes / 1e6:7.1f} MB  "
+          f"first items readable after {first_shard or shard_write:5.2f} s  read {shard_read:5.2f} s")
+
+
+if __name__ == '__main__':
+    main()
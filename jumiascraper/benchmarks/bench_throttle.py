@@ -0,0 +1,92 @@
+"""
+Benchmark: fixed DOWNLOAD_DELAY vs AdaptiveThrottleMiddleware
+
+    python benchmarks/bench_throttle.py [pages] [rate_limit]
+
+Starts mock_server.py and crawls it once per configuration, each in
+its own process (the Twisted reactor can't be restarted). Item
+pipelines are off so only the download rate is measured.
+"""
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_server import serve
+
+PORT = 8800
+CONFIGS = {
+    'fixed (settings.py)': {'ADAPTIVE_THROTTLE_ENABLED': False},
+    'adaptive': {'ADAPTIVE_THROTTLE_ENABLED': True},
+}
+
+
+def crawl(overrides):
+    """
+    Child process: crawl the mock server, print the stats as JSON
+    """
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from jumiascraper.spiders.jumiaspider import JumiaSpiderSpider
+
+    class MockSpider(JumiaSpiderSpider):
+        start_urls = [f'http://127.0.0.1:{PORT}/smartphones/']
+
+    settings = get_project_settings()
+    settings.setdict({
+        'LOG_LEVEL': 'WARNING',
+        'ROBOTSTXT_OBEY': False,
+        'ITEM_PIPELINES': {},
+        'TELNETCONSOLE_ENABLED': False,
+        'RETRY_TIMES': 10,
+        **overrides,
+    }, priority='cmdline')
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(MockSpider)
+    process.crawl(crawler)
+    process.start()
+    stats = crawler.stats.get_stats()
+    print(json.dumps({key: value for key, value in stats.items()
+                      if isinstance(value, (int, float, str))}))
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    rate_limit = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    server, load = serve(PORT, pages, rate_limit=rate_limit)
+    print(f"mock server: {pages} pages, capacity {load.capacity}, "
+          f"rate limit {load.rate_limit}/s")
+    try:
+        for label, overrides in CONFIGS.items():
+            load.statuses.clear()
+            load.max_in_flight = 0
+            start = time.perf_counter()
+            out = subprocess.run(
+                [sys.executable, __file__, '--child', json.dumps(overrides)],
+                capture_output=True, text=True, check=True,
+                cwd=Path(__file__).resolve().parent.parent,
+            )
+            elapsed = time.perf_counter() - start
+            stats = json.loads(out.stdout.strip().splitlines()[-1])
+            slot = 'adaptive_throttle/127.0.0.1'
+            backoffs = sum(value for key, value in stats.items()
+                           if key.startswith('adaptive_throttle/backoff/'))
+            print(f"{label:20s} {elapsed:6.1f}s  {pages / elapsed:5.1f} pages/s  "
+                  f"items={stats.get('item_scraped_count', 0)}  "
+                  f"429s={load.statuses[429]}  max_in_flight={load.max_in_flight}  "
+                  f"backoffs={backoffs}  max_concurrency={stats.get(f'{slot}/max_concurrency', '-')}  "
+                  f"rate={stats.get(f'{slot}/rate', '-')}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        crawl(json.loads(sys.argv[2]))
+    else:
+        main()
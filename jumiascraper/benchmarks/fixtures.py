@@ -0,0 +1,170 @@
+"""
+Synthetic Jumia listing pages for the benchmarks
+
+Builds listing HTML shaped like www.jumia.co.ke category pages
+(a.core product cards, pagination links) from the rows in
+jumia_smartphones.json. listing_responses(store=True) adds the
+window.__STORE__ state blob the live pages embed, with the same
+products, for the JSON-first extractor.
+"""
+
+import json
+from html import escape
+from pathlib import Path
+
+import scrapy
+from scrapy.http import HtmlResponse
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+SAMPLE = PROJECT_DIR / 'jumia_smartphones.json'
+PER_PAGE = 40
+
+
+def load_rows():
+    return json.loads(SAMPLE.read_text(encoding='utf-8'))
+
+
+def make_items(n, item_cls=None):
+    """
+    n unique raw (pre-pipeline) items built from the sample feed; names
+    and ids get a suffix so duplicate filters don't drop them
+    """
+    if item_cls is None:
+        from jumiascraper.items import JumiaProduct as item_cls
+    rows = load_rows()
+    items = []
+    for i in range(n):
+        row = dict(rows[i % len(rows)])
+        row['name'] = f"{row['name']} #{i}"
+        row['product_id'] = f"{row['product_id']}{i}"
+        items.append(item_cls(**row))
+    return items
+
+
+def product_card(row, index=0):
+    """
+    One <article> product card. Every few cards vary the markup the
+    way real listings do (div.name instead of h3, no discount badge,
+    no image).
+    """
+    name_tag = 'div' if index % 7 == 3 else 'h3'
+    discount = (
+        f'<div class="bdg _dsct _sm">{escape(row["discount"])}</div>'
+        if row.get('discount') and index % 5 != 4 else ''
+    )
+    image = (
+        f'<img data-src="{escape(row["image"])}" class="img" width="208" height="208" alt="">'
+        if row.get('image') and index % 11 != 10 else ''
+    )
+    oprc = f' data-oprc="{escape(row["original_price"])}"' if row.get('original_price') else ''
+    return (
+        '<article class="prd _fb col c-prd">'
+        f'<a class="core" href="{escape(row["url"])}" data-gtm-id="{escape(row["product_id"])}" '
+        f'data-gtm-name="{escape(row["name"])}" data-gtm-brand="{escape(row.get("brand") or "")}">'
+        f'<div class="img-c">{image}</div>'
+        '<div class="info">'
+        f'<{name_tag} class="name">\n  {escape(row["name"])}  </{name_tag}>'
+        f'<div class="prc"{oprc}>{escape(row.get("current_price") or "")}</div>'
+        f'<div class="s-prc-w"><div class="old">{escape(row.get("original_price") or "")}</div>{discount}</div>'
+        '</div></a></article>'
+    )
+
+
+def store_product(row, index=0):
+    """
+    One entry of window.__STORE__.products, in the live page's shape
+    """
+    def raw(price):
+        return f"{float(price.split()[-1].replace(',', '')):.2f}" if price else None
+
+    return {
+        'sku': row['product_id'],
+        'name': row['name'],
+        'displayName': row['name'],
+        'brand': row.get('brand'),
+        'sellerId': 1000 + index % 13,
+        'isShopExpress': index % 3 == 0,
+        'categories': 'Phones & Tablets/Mobile Phones/Smartphones',
+        'prices': {
+            'rawPrice': raw(row.get('current_price')),
+            'price': row.get('current_price'),
+            'rawOldPrice': raw(row.get('original_price')),
+            'oldPrice': row.get('original_price'),
+            'discount': row.get('discount'),
+        },
+        'rating': {'average': 3 + index % 20 / 10, 'totalRatings': 10 + index} if index % 4 else None,
+        'image': row.get('image'),
+        'url': row['url'],
+        'isBuyable': index % 9 != 0,
+    }
+
+
+def listing_html(rows, page=1, last_page=1, category='smartphones', store=False):
+    cards = ''.join(product_card(row, i) for i, row in enumerate(rows))
+    pagination = ''
+    if page < last_page:
+        pagination = (
+            f'<a class="pg" href="/{category}/?page={page + 1}#catalog-listing" aria-label="Next Page"></a>'
+            f'<a class="pg" href="/{category}/?page={last_page}#catalog-listing" aria-label="Last Page"></a>'
+        )
+    script = ''
+    if store:
+        state = {
+            'products': [store_product(row, i) for i, row in enumerate(rows)],
+            'pagination': {'currentPage': page, 'totalPages': last_page},
+        }
+        script = f'<script>window.__STORE__={json.dumps(state)};</script>'
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Smartphones | Jumia Kenya</title></head>'
+        f'<body>{script}<main><section class="card -fh"><div class="-paxs row _no-g _4cl-3cm-shs">{cards}</div>'
+        f'<div class="pg-w -ptm -pbxl">{pagination}</div></section></main></body></html>'
+    )
+
+
+def detail_html(row, index=0):
+    """
+    Product page with a JSON-LD Product block and a specifications list
+    """
+    product = {
+        '@context': 'https://schema.org',
+        '@type': 'Product',
+        'name': row['name'],
+        'sku': row['product_id'],
+        'aggregateRating': {'@type': 'AggregateRating', 'ratingValue': 3 + index % 20 / 10,
+                            'reviewCount': 10 + index},
+        'offers': {'@type': 'Offer', 'priceCurrency': 'KES',
+                   'availability': 'https://schema.org/InStock' if index % 9 else 'https://schema.org/OutOfStock',
+                   'seller': {'@type': 'Organization', 'name': f'Seller {index % 13}'}},
+    }
+    specs = ''.join(
+        f'<li class="-pvxs"><span class="-b">{escape(key)}</span>: {escape(value)}</li>'
+        for key, value in (('SKU', row['product_id']), ('Brand', row.get('brand') or ''),
+                           ('Weight (kg)', f'0.{index % 9 + 1}'))
+    )
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><title>{escape(row["name"])} | Jumia KE</title>'
+        f'<script type="application/ld+json">{json.dumps(product)}</script></head>'
+        f'<body><main><h1>{escape(row["name"])}</h1>'
+        f'<section class="card aim -mtm"><h2>Specifications</h2><div class="-pvs"><ul>{specs}</ul></div></section>'
+        '</main></body></html>'
+    )
+
+
+def listing_responses(n_pages, category='smartphones', store=False):
+    """
+    n_pages HtmlResponses, 40 products each, cycling over the sample rows;
+    with store=True the pages also embed window.__STORE__
+    """
+    rows = load_rows()
+    responses = []
+    for page in range(1, n_pages + 1):
+        start = (page - 1) * PER_PAGE
+        page_rows = [rows[i % len(rows)] for i in range(start, start + PER_PAGE)]
+        url = f'https://www.jumia.co.ke/{category}/' + (f'?page={page}' if page > 1 else '')
+        responses.append(HtmlResponse(
+            url,
+            body=listing_html(page_rows, page, n_pages, category, store).encode('utf-8'),
+            encoding='utf-8',
+            request=scrapy.Request(url),
+        ))
+    return responses
@@ -0,0 +1,183 @@
+"""
+Local mock of a Jumia category that slows down under load
+
+Serves /<category>/?page=N listing pages (fixtures.listing_html) and
+the product pages they link to (fixtures.detail_html); with
+images=True product image URLs point at the server too and get a
+generated JPEG (needs Pillow), several products sharing a picture. The
+server handles `capacity` requests at a time at `latency` seconds each;
+every request above that adds `per_request` seconds, and past
+`rate_limit` requests/s it answers 429 with a Retry-After header, like
+the real site does when a crawler is too aggressive.
+
+    python benchmarks/mock_server.py --port 8800 --pages 30
+
+bench_throttle.py crawls it with fixed and adaptive throttling.
+"""
+
+import argparse
+import io
+import sys
+import zlib
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fixtures import PER_PAGE, detail_html, listing_html, load_rows
+
+
+class LoadModel:
+    """
+    In-flight counter plus a one-second window rate limiter
+    """
+
+    def __init__(self, capacity=4, latency=0.05, per_request=0.05, rate_limit=40):
+        self.capacity = capacity
+        self.latency = latency
+        self.per_request = per_request
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.window = 0
+        self.window_count = 0
+        self.statuses = Counter()
+
+    def enter(self):
+        """
+        Returns (status, seconds to sleep)
+        """
+        with self.lock:
+            now = int(time.monotonic())
+            if now != self.window:
+                self.window, self.window_count = now, 0
+            self.window_count += 1
+            if self.rate_limit and self.window_count > self.rate_limit:
+                self.statuses[429] += 1
+                return 429, 0.0
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            overload = max(0, self.in_flight - self.capacity)
+            self.statuses[200] += 1
+            return 200, self.latency + overload * self.per_request
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+IMAGE_HOST = 'https://ke.jumia.is'
+
+
+def image_jpeg(path, variants=50):
+    """
+    A 300x300 JPEG picked by the image path, one of `variants` pictures
+    """
+    from PIL import Image, ImageDraw
+
+    seed = zlib.crc32(path.encode()) % variants
+    image = Image.new('RGB', (300, 300), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((60 + seed, 30, 240 - seed, 270), fill=(seed * 5 % 256, 40, 200 - seed * 3))
+    draw.ellipse((120, 220 - seed, 180, 260 - seed), fill=(250, 250, 250))
+    buf = io.BytesIO()
+    image.save(buf, 'JPEG', quality=80)
+    return buf.getvalue()
+
+
+def make_handler(load, rows, pages):
+    products = {row['url']: (index, row) for index, row in enumerate(rows)}
+    images = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path.startswith('/unsafe/'):
+                if parts.path not in images:
+                    images[parts.path] = image_jpeg(parts.path)
+                load.statuses['image'] += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(images[parts.path])))
+                self.end_headers()
+                self.wfile.write(images[parts.path])
+                return
+            category = parts.path.strip('/')
+            product = products.get(parts.path)
+            if not category or '/' in category or (category.endswith('.html') and not product):
+                self.send_error(404)
+                return
+            status, delay = load.enter()
+            if status == 429:
+                self.send_response(429)
+                self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            try:
+                time.sleep(delay)
+                if product:
+                    body = detail_html(product[1], product[0]).encode('utf-8')
+                else:
+                    page = int(parse_qs(parts.query).get('page', ['1'])[0])
+                    start = (page - 1) * PER_PAGE
+                    page_rows = [rows[i % len(rows)] for i in range(start, start + PER_PAGE)]
+                    body = listing_html(page_rows, page, pages, category).encode('utf-8')
+            finally:
+                load.leave()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=8800, pages=30, images=False, **load_kwargs):
+    """
+    Start the server in a daemon thread; returns (server, load)
+    """
+    load = LoadModel(**load_kwargs)
+    rows = load_rows()
+    if images:
+        base = f'http://127.0.0.1:{port}'
+        rows = [dict(row, image=row['image'].replace(IMAGE_HOST, base)) if row.get('image') else row
+                for row in rows]
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(load, rows, pages))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, load
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--capacity', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--per-request', type=float, default=0.05)
+    parser.add_argument('--rate-limit', type=int, default=40, help='requests/s, 0 = none')
+    parser.add_argument('--images', action='store_true', help='serve product images too')
+    args = parser.parse_args()
+    server, load = serve(args.port, args.pages, args.images, capacity=args.capacity, latency=args.latency,
+                         per_request=args.per_request, rate_limit=args.rate_limit)
+    print(f"serving {args.pages} pages on http://127.0.0.1:{args.port}/smartphones/")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(dict(load.statuses), 'max in flight:', load.max_in_flight)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+Benchmark harness: spider parsing + item pipeline throughput
+
+Feeds synthetic listing pages (fixtures.py) and, optionally, pages
+recorded with JUMIA_CACHE_MODE=record through JumiaSpiderSpider.parse,
+then pushes generated JumiaProduct items through the ITEM_PIPELINES
+configured in settings.py, one stage at a time. Items a stage returns
+as a Deferred (BatchPostProcessPipeline) continue through the later
+stages once it fires; DatabaseSinkPipeline and ProductImagePipeline need
+a running crawl and are skipped.
+
+Reports items/s, per-page and per-stage latency percentiles and peak
+RSS, and saves them as JSON so runs can be compared:
+
+    python benchmarks/run.py                                  # save to benchmarks/results/
+    python benchmarks/run.py --recorded .scrapy/httpcache     # add recorded pages
+    python benchmarks/run.py --compare benchmarks/results/baseline.json
+
+With --compare the exit code is 1 if any throughput dropped by more
+than --tolerance (default 10%).
+"""
+
+import argparse
+import json
+import logging
+import resource
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import scrapy
+from scrapy.crawler import Crawler
+from scrapy.exceptions import DropItem
+from scrapy.http import HtmlResponse
+from scrapy.pipelines import ItemPipelineManager
+from scrapy.utils.project import get_project_settings
+from scrapy.utils.reactor import install_reactor
+from twisted.internet.defer import Deferred
+
+from fixtures import listing_responses, make_items
+from jumiascraper.spiders.jumiaspider import JumiaSpiderSpider
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def percentiles(samples):
+    """
+    p50/p95/p99/max of a list of seconds, in microseconds
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6, 1)
+
+    return {'p50_us': pick(0.50), 'p95_us': pick(0.95), 'p99_us': pick(0.99),
+            'max_us': round(ordered[-1] * 1e6, 1)}
+
+
+def recorded_responses(cache_dir, spider_name='jumiaspider'):
+    """
+    Listing responses stored by httpcache.ContentAddressedCacheStorage
+    """
+    root = Path(cache_dir, spider_name)
+    responses = []
+    for index_path in sorted(root.glob('index/*/*.json')):
+        meta = json.loads(index_path.read_text(encoding='utf-8'))
+        object_path = root / 'objects' / meta['body'][:2] / f"{meta['body']}.z"
+        if meta['status'] != 200 or not object_path.exists():
+            continue
+        url = meta['response_url']
+        if url.endswith('/robots.txt'):
+            continue
+        responses.append(HtmlResponse(
+            url, body=zlib.decompress(object_path.read_bytes()),
+            encoding='utf-8', request=scrapy.Request(url),
+        ))
+    return responses
+
+
+def make_crawler(overrides):
+    settings = get_project_settings()
+    settings.setdict(overrides, priority='cmdline')
+    install_reactor(settings['TWISTED_REACTOR'], settings['ASYNCIO_EVENT_LOOP'])
+    crawler = Crawler(JumiaSpiderSpider, settings)
+    # Same start-up order as Crawler.crawl(), without starting the engine
+    crawler.spider = crawler._create_spider()
+    crawler._apply_settings()
+    return crawler
+
+
+def bench_parse(spider, responses):
+    latencies = []
+    items = 0
+    start = time.perf_counter()
+    for response in responses:
+        t0 = time.perf_counter()
+        for result in spider.parse(response):
+            if not isinstance(result, scrapy.Request):
+                items += 1
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return {
+        'pages': len(responses),
+        'items': items,
+        'pages_per_s': round(len(responses) / elapsed, 1),
+        'items_per_s': round(items / elapsed, 1),
+        'page_latency': percentiles(latencies),
+    }
+
+
+# Stages that only finish inside a running reactor/engine (adbapi writer
+# threads, downloads through crawler.engine); left out of the run
+SKIPPED_STAGES = ('DatabaseSinkPipeline', 'ProductImagePipeline')
+
+
+def bench_pipelines(crawler, items):
+    manager = ItemPipelineManager.from_crawler(crawler)
+    spider = crawler.spider
+    stages = [pipe for pipe in manager.middlewares if hasattr(pipe, 'process_item')]
+    skipped = [type(pipe).__name__ for pipe in stages if type(pipe).__name__ in SKIPPED_STAGES]
+    stages = [pipe for pipe in stages if type(pipe).__name__ not in SKIPPED_STAGES]
+    for pipe in stages:
+        if hasattr(pipe, 'open_spider'):
+            pipe.open_spider(spider)
+
+    timings = {type(pipe).__name__: [] for pipe in stages}
+    drops = dict.fromkeys(timings, 0)
+    # (item, next stage) of items released by a Deferred, e.g. when
+    # BatchPostProcessPipeline flushes a batch
+    resumed = []
+    pending = [0]
+
+    def deferred(d, name, index):
+        pending[0] += 1
+
+        def released(item):
+            pending[0] -= 1
+            resumed.append((item, index + 1))
+
+        def dropped(failure):
+            pending[0] -= 1
+            failure.trap(DropItem)
+            drops[name] += 1
+
+        d.addCallbacks(released, dropped)
+
+    def run_stages(item, first=0):
+        for index in range(first, len(stages)):
+            pipe = stages[index]
+            name = type(pipe).__name__
+            t0 = time.perf_counter()
+            try:
+                item = pipe.process_item(item, spider)
+            except DropItem:
+                drops[name] += 1
+                timings[name].append(time.perf_counter() - t0)
+                return
+            timings[name].append(time.perf_counter() - t0)
+            if isinstance(item, Deferred):
+                deferred(item, name, index)
+                return
+
+    def drain():
+        while resumed:
+            run_stages(*resumed.pop(0))
+
+    start = time.perf_counter()
+    for item in items:
+        run_stages(item)
+        drain()
+    # Closing a stage may release what it still holds (a last partial batch)
+    for pipe in stages:
+        if hasattr(pipe, 'close_spider'):
+            pipe.close_spider(spider)
+        drain()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'items': len(items),
+        'items_per_s': round(len(items) / elapsed, 1),
+        'skipped_stages': skipped,
+        'unresolved': pending[0],
+        'stages': {
+            name: {'calls': len(samples), 'dropped': drops[name], **percentiles(samples)}
+            for name, samples in timings.items()
+        },
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Throughput regressions against a baseline result file
+    """
+    regressions = []
+    for section in ('parse_synthetic', 'parse_recorded', 'pipelines'):
+        old = baseline.get(section, {}).get('items_per_s')
+        new = results.get(section, {}).get('items_per_s')
+        if old and new and new < old * (1 - tolerance):
+            regressions.append(f"{section}: {old:,.0f} -> {new:,.0f} items/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pages', type=int, default=100, help='synthetic listing pages')
+    parser.add_argument('--items', type=int, default=50000, help='generated items for the pipelines')
+    parser.add_argument('--recorded', metavar='CACHE_DIR', help='also parse pages recorded in this HTTP cache')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='fail on regressions against this result file')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    parser.add_argument('-s', '--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='override a Scrapy setting, e.g. -s JUMIA_EXTRACTOR=lxml')
+    args = parser.parse_args()
+
+    overrides = dict(opt.split('=', 1) for opt in args.set)
+    overrides.setdefault('LOG_LEVEL', 'ERROR')
+    crawler = make_crawler(overrides)
+    logging.getLogger(crawler.spider.name).setLevel(logging.ERROR)
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'settings': overrides,
+        'parse_synthetic': bench_parse(crawler.spider, listing_responses(args.pages)),
+    }
+    if args.recorded:
+        results['parse_recorded'] = bench_parse(crawler.spider, recorded_responses(args.recorded))
+    results['pipelines'] = bench_pipelines(crawler, make_items(args.items))
+    # ru_maxrss is in KiB on Linux
+    results['peak_rss_mib'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+    print(json.dumps(results, indent=2))
+    print(f"saved to {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Exchange rates and multi-currency conversion
+
+A RateTable holds rates against one base currency. It is loaded from
+a rate source - a local JSON file or an HTTP endpoint serving the same
+JSON - and cached for a TTL, after which the next refresh() loads it
+again. Long crawls pick up new rates without restarting.
+
+Rate JSON:
+
+    {"base": "KES", "timestamp": 1760000000, "rates": {"KES": 1, "ZAR": 0.15, ...}}
+
+Rates are units of the currency per one unit of the base.
+
+convert_items() converts a whole batch of items: prices are grouped by
+source currency and each group goes through convert_many() once, as one
+NumPy multiply and round per target when numpy is installed.
+"""
+
+import json
+import os
+import time
+import urllib.request
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Project directory (next to scrapy.cfg), where the default rates.json lives
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Currency of each Jumia storefront, by domain suffix
+DOMAIN_CURRENCIES = {
+    'jumia.co.ke': 'KES',
+    'jumia.com.ng': 'NGN',
+    'jumia.com.eg': 'EGP',
+    'jumia.com.gh': 'GHS',
+    'jumia.ma': 'MAD',
+    'jumia.ug': 'UGX',
+    'jumia.ci': 'XOF',
+    'jumia.sn': 'XOF',
+    'jumia.com.tn': 'TND',
+    'jumia.dz': 'DZD',
+}
+
+
+def currency_for_url(url):
+    """
+    Storefront currency of a product URL, or None
+    """
+    if not url:
+        return None
+    for domain, currency in DOMAIN_CURRENCIES.items():
+        if f'{domain}/' in url or url.endswith(domain):
+            return currency
+    return None
+
+
+class RateTable:
+
+    def __init__(self, base, rates, timestamp=None):
+        self.base = base
+        self.rates = dict(rates)
+        self.rates.setdefault(base, 1.0)
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['base'], data['rates'], data.get('timestamp'))
+
+    def factor(self, source, target):
+        """
+        Multiply an amount in `source` by this to get `target`
+        """
+        try:
+            return self.rates[target] / self.rates[source]
+        except KeyError as e:
+            raise KeyError(f"No exchange rate for {e.args[0]}") from None
+
+    def convert_many(self, amounts, source, targets, ndigits=2):
+        """
+        Convert a batch of amounts into several currencies at once.
+
+        One factor per target for the whole batch; None amounts stay
+        None. Returns {target: [converted amounts]}.
+
+        With numpy the amounts become one float array and each target
+        is a single multiply and np.round (round half to even on the
+        binary value, like batch.py); without it, a loop with round().
+        """
+        factors = {target: self.factor(source, target) for target in targets}
+        if np is None:
+            return {
+                target: [
+                    round(amount * factor, ndigits) if amount is not None else None
+                    for amount in amounts
+                ]
+                for target, factor in factors.items()
+            }
+
+        # None becomes NaN in a float array and back to None at the end
+        values = np.array(amounts, dtype=float)
+        missing = np.isnan(values)
+        converted = {}
+        for target, factor in factors.items():
+            result = np.round(values * factor, ndigits).tolist()
+            if missing.any():
+                for i in np.flatnonzero(missing).tolist():
+                    result[i] = None
+            converted[target] = result
+        return converted
+
+
+class FileRateSource:
+    """
+    Rates from a local JSON file; reloaded when the file changes
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+
+    def changed(self):
+        try:
+            return os.path.getmtime(self.path) != self.mtime
+        except OSError:
+            return False
+
+    def load(self):
+        self.mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding='utf-8') as f:
+            return RateTable.from_json(json.load(f))
+
+
+class HttpRateSource:
+    """
+    Rates from an HTTP endpoint returning the rate JSON
+    """
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def changed(self):
+        # No cheap way to tell, rely on the TTL
+        return False
+
+    def load(self):
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            return RateTable.from_json(json.load(response))
+
+
+class CurrencyConverter:
+    """
+    RateTable cache with a time-to-live
+
+        converter = CurrencyConverter(FileRateSource('rates.json'), ttl=3600)
+        converter.table.convert_many([7699.0, 9200.0], 'KES', ['ZAR', 'USD'])
+    """
+
+    def __init__(self, source, ttl=3600):
+        self.source = source
+        self.ttl = ttl
+        self.loaded_at = None
+        self.table = None
+        self.refresh(force=True)
+
+    def stale(self):
+        return (
+            self.loaded_at is None
+            or time.monotonic() - self.loaded_at >= self.ttl
+            or self.source.changed()
+        )
+
+    def refresh(self, force=False):
+        """
+        Reload the rates if the TTL ran out (or force); returns the table.
+
+        If loading fails the previous table is kept, so a rate service
+        outage doesn't stop the crawl.
+        """
+        if force or self.stale():
+            try:
+                self.table = self.source.load()
+            except (OSError, ValueError, KeyError):
+                if self.table is None:
+                    raise
+            self.loaded_at = time.monotonic()
+        return self.table
+
+
+def convert_items(adapters, table, targets, default_currency='KES'):
+    """
+    Convert the prices of a batch of ItemAdapters into several currencies.
+
+    Items are grouped by source currency (currency field, else the
+    product URL's storefront, else default_currency) and the current and
+    original prices of each group are converted in one convert_many()
+    call. Fills currency, converted_prices, converted_original_prices
+    and price_zar. Returns the set of source currencies without a rate;
+    their items are left unconverted.
+    """
+    groups = {}
+    for adapter in adapters:
+        if not isinstance(adapter.get('current_price'), (int, float)):
+            continue
+        source = (
+            adapter.get('currency')
+            or currency_for_url(adapter.get('full_url'))
+            or default_currency
+        )
+        groups.setdefault(source, []).append(adapter)
+
+    missing = set()
+    for source, group in groups.items():
+        originals = [adapter.get('original_price') for adapter in group]
+        originals = [value if isinstance(value, (int, float)) else None for value in originals]
+        try:
+            converted = table.convert_many(
+                [adapter['current_price'] for adapter in group] + originals, source, targets,
+            )
+        except KeyError:
+            missing.add(source)
+            continue
+        n = len(group)
+        for i, adapter in enumerate(group):
+            adapter['currency'] = source
+            adapter['converted_prices'] = {target: values[i] for target, values in converted.items()}
+            if originals[i] is not None:
+                adapter['converted_original_prices'] = {
+                    target: values[n + i] for target, values in converted.items()
+                }
+            if 'ZAR' in converted:
+                adapter['price_zar'] = converted['ZAR'][i]
+    return missing
+
+
+def rate_source_from_settings(settings):
+    url = settings.get('CURRENCY_RATES_URL')
+    if url:
+        return HttpRateSource(url)
+    path = settings.get('CURRENCY_RATES_FILE', 'rates.json')
+    # A relative path is tried from the working directory, then from the
+    # project directory, so crawls started elsewhere still find rates.json
+    if not os.path.isabs(path) and not os.path.exists(path):
+        project_path = os.path.join(PROJECT_DIR, path)
+        if os.path.exists(project_path):
+            path = project_path
+    return FileRateSource(path)
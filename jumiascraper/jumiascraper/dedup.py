@@ -0,0 +1,197 @@
+"""
+Deduplication engines
+
+    SetDeduper     - a plain set of the keys; the fastest, and the
+                     default. Fine for a crawl of a few hundred
+                     thousand products, but every key is a full str
+    DigestDeduper  - exact up to 64-bit hash collisions; keeps one
+                     8-byte digest per key in an open-addressing
+                     table of unsigned 64-bit ints (array('Q'))
+    BloomDeduper   - probabilistic; fixed-size bit array sized for a
+                     capacity and false-positive rate, grows by adding
+                     tighter filters when the capacity is exceeded
+
+All share one method: add(key) -> True if the key was seen before.
+
+The trade-off: with ~70-character keys the digest table takes 14 MiB
+per million keys against ~139 for the set, but its probe loop runs in
+Python, so adds are about 4x slower (~250k/s vs ~950k/s, see
+benchmarks/bench_dedup.py). Either is negligible next to a crawl's
+downloads; pick "exact" or "bloom" when millions of keys have to fit
+in memory.
+"""
+
+import hashlib
+import math
+from array import array
+
+
+def _digest(key, size=8):
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=size).digest()
+
+
+class SetDeduper:
+    """
+    Exact dedup on the keys themselves, in a set
+    """
+
+    def __init__(self):
+        self.seen = set()
+
+    def add(self, key):
+        seen = self.seen
+        if key in seen:
+            return True
+        seen.add(key)
+        return False
+
+    def __len__(self):
+        return len(self.seen)
+
+
+class DigestDeduper:
+    """
+    Exact dedup on 64-bit digests
+
+    Digests live in a flat array('Q') hash table with linear probing,
+    0 marking an empty slot, kept at most 2/3 full: 12-24 bytes per key
+    instead of ~64 for a set of ints.
+    """
+
+    max_load = 2 / 3
+
+    def __init__(self, size=1024):
+        self.table = array('Q', bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+
+    def add(self, key):
+        # 0 is the empty marker; the digest that happens to be 0 shares 1's slot
+        digest = int.from_bytes(_digest(key), 'little') or 1
+        table, mask = self.table, self.mask
+        i = digest & mask
+        while True:
+            value = table[i]
+            if value == digest:
+                return True
+            if not value:
+                break
+            i = (i + 1) & mask
+        table[i] = digest
+        self.count += 1
+        if self.count > len(table) * self.max_load:
+            self._grow()
+        return False
+
+    def _grow(self):
+        old = self.table
+        self.table = table = array('Q', bytes(16 * len(old)))
+        self.mask = mask = len(table) - 1
+        for digest in old:
+            if digest:
+                i = digest & mask
+                while table[i]:
+                    i = (i + 1) & mask
+                table[i] = digest
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return len(self.table) * self.table.itemsize
+
+
+class BloomFilter:
+    """
+    Plain Bloom filter over a bytearray, double hashing for the k probes
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest):
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def contains(self, digest):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(digest))
+
+    def add(self, digest):
+        """
+        Set the key's bits; returns True if they were all set already
+        """
+        bits = self.bits
+        present = True
+        for p in self._positions(digest):
+            byte, mask = p >> 3, 1 << (p & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                present = False
+        if not present:
+            self.count += 1
+        return present
+
+
+class BloomDeduper:
+    """
+    Scalable Bloom filter dedup
+
+    Starts with one filter for `capacity` keys. Once full, a new filter
+    with twice the capacity and half the error rate is added, so the
+    overall false-positive rate stays below `error_rate` (a duplicate
+    is never missed; a false positive drops a new key).
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001):
+        self.error_rate = error_rate
+        self.filters = [BloomFilter(capacity, error_rate / 2)]
+
+    def add(self, key):
+        digest = _digest(key, 16)
+        for bloom in self.filters[:-1]:
+            if bloom.contains(digest):
+                return True
+
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            if current.contains(digest):
+                return True
+            current = BloomFilter(current.capacity * 2, current.error_rate / 2)
+            self.filters.append(current)
+        return current.add(digest)
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def nbytes(self):
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+
+def make_deduper(mode='set', capacity=1_000_000, error_rate=0.001,
+                 frontier_url=None, frontier_key='jumia'):
+    """
+    Build a deduper from the DEDUP_* settings values; "shared" dedups
+    across crawl nodes through the FRONTIER_URL backend (frontier.py)
+    """
+    if mode == 'shared':
+        if not frontier_url:
+            raise ValueError("DEDUP_MODE 'shared' needs FRONTIER_URL")
+        from jumiascraper.frontier import SharedDeduper, open_frontier
+        return SharedDeduper(open_frontier(frontier_url, frontier_key))
+    if mode == 'bloom':
+        return BloomDeduper(capacity, error_rate)
+    if mode == 'exact':
+        return DigestDeduper()
+    if mode == 'set':
+        return SetDeduper()
+    raise ValueError(f"Unknown dedup mode {mode!r}, expected 'set', 'exact', 'bloom' or 'shared'")
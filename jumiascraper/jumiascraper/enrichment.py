@@ -0,0 +1,146 @@
+"""
+Product detail page enrichment
+
+parse_detail() pulls specs, rating, review count, stock and seller
+from a Jumia product page: from its JSON-LD Product block when there
+is one, from the page markup otherwise.
+
+DetailStore keeps the details fetched for every product together with
+the listing fingerprint (fingerprints.product_fingerprint) they were
+fetched for. While a product's listing card doesn't change, the stored
+details are reused and its detail page isn't requested again, so
+enrichment cost follows catalogue churn rather than catalogue size.
+
+Enable with JUMIA_ENRICH = True (see JumiaSpiderSpider.enrich).
+"""
+
+import json
+import sqlite3
+import time
+
+from jumiascraper.itemloaders import collapse_whitespace
+from jumiascraper.prices import parse_price
+
+# JumiaProduct fields a detail page can fill
+DETAIL_FIELDS = ('specs', 'rating', 'reviews_count', 'in_stock', 'seller')
+
+
+def _number(text, cast=float):
+    # Same separator rules as listing prices: "4,5", "1,234", "12,345,678"
+    number = parse_price(text or '')
+    return None if number is None else cast(number)
+
+
+def _text(value):
+    return collapse_whitespace(value).strip() or None if value else None
+
+
+def _json_ld_product(response):
+    for raw in response.css('script[type="application/ld+json"]::text').getall():
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        for node in data if isinstance(data, list) else data.get('@graph', [data]):
+            if isinstance(node, dict) and node.get('@type') == 'Product':
+                return node
+    return None
+
+
+def parse_detail(response):
+    """
+    {field: value} for the DETAIL_FIELDS found on a product page
+    """
+    details = {}
+    product = _json_ld_product(response)
+    if product is not None:
+        rating = product.get('aggregateRating') or {}
+        offers = product.get('offers') or {}
+        if isinstance(offers, list):
+            offers = offers[0] if offers else {}
+        seller = offers.get('seller') or {}
+        details['rating'] = _number(str(rating.get('ratingValue', '')))
+        details['reviews_count'] = _number(
+            str(rating.get('reviewCount') or rating.get('ratingCount') or ''), int
+        )
+        availability = offers.get('availability')
+        if availability:
+            details['in_stock'] = availability.rstrip('/').endswith('InStock')
+        details['seller'] = seller.get('name') if isinstance(seller, dict) else seller
+
+    # Markup fallbacks, for pages without JSON-LD or with partial JSON-LD
+    if details.get('rating') is None:
+        details['rating'] = _number(response.css('div.stars._s::text').get())
+    if details.get('reviews_count') is None:
+        details['reviews_count'] = _number(response.css('a.-plxs._more::text').get(), int)
+    if details.get('seller') is None:
+        details['seller'] = _text(response.css('section.card div.-hr p.-m::text').get())
+
+    # Specifications: <li><span class="-b">Weight (kg)</span>: 0.2</li>
+    specs = {}
+    for li in response.css('section.card ul.-pvs li, div.-pvs ul li'):
+        key = _text(li.css('span.-b::text').get())
+        value = _text(''.join(li.xpath('./text()').getall()).lstrip(' :'))
+        if key and value:
+            specs[key] = value
+    if specs:
+        details['specs'] = specs
+
+    return {field: value for field, value in details.items() if value not in (None, '')}
+
+
+class DetailStore:
+    """
+    On-disk product_id -> (listing fingerprint, details) map
+
+        store = DetailStore('details.sqlite')
+        store.lookup('XI996MP5R1YBONAFAMZ', fingerprint)  # details or None
+        store.save('XI996MP5R1YBONAFAMZ', fingerprint, details)
+    """
+
+    def __init__(self, path, commit_every=100):
+        self.path = path
+        self.commit_every = commit_every
+        self._pending = 0
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS details (
+                product_id  TEXT PRIMARY KEY,
+                fingerprint BLOB NOT NULL,
+                details     TEXT NOT NULL,
+                fetched     REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+    def lookup(self, product_id, fingerprint):
+        """
+        Stored details if they were fetched for this fingerprint, else None
+        """
+        row = self.conn.execute(
+            'SELECT fingerprint, details FROM details WHERE product_id = ?', (product_id,)
+        ).fetchone()
+        if row is None or row[0] != fingerprint:
+            return None
+        return json.loads(row[1])
+
+    def save(self, product_id, fingerprint, details):
+        self.conn.execute(
+            'INSERT INTO details (product_id, fingerprint, details, fetched) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (product_id) DO UPDATE SET fingerprint = excluded.fingerprint, '
+            'details = excluded.details, fetched = excluded.fetched',
+            (product_id, fingerprint, json.dumps(details, ensure_ascii=False), time.time()),
+        )
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.conn.commit()
+            self._pending = 0
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM details').fetchone()[0]
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
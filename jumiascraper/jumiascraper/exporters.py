@@ -0,0 +1,210 @@
+"""
+Columnar feed exporters: Parquet and Arrow IPC stream
+
+Items are buffered column by column and written out every
+row_group_size rows, so memory stays flat however long the crawl
+runs. Every file has the same typed schema (SCHEMA below): prices
+are float64, discount an int, brand and currency are dictionary
+encoded, converted prices (currency -> amount) and specs are maps.
+
+Needs pyarrow (pip install pyarrow). Usage:
+
+    scrapy crawl jumiaspider -O smartphones.parquet
+    scrapy crawl jumiaspider -O smartphones.arrow
+
+Row group size: PARQUET_ROW_GROUP_SIZE setting, or per feed with
+'item_export_kwargs': {'row_group_size': 50000}.
+"""
+
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+from scrapy.exporters import BaseItemExporter
+
+from jumiascraper.prices import detect_currency, parse_price
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+def _build_schema():
+    categorical = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('product_id', pa.string()),
+        ('name', pa.string()),
+        ('brand', categorical),
+        ('current_price', pa.float64()),
+        ('original_price', pa.float64()),
+        ('currency', categorical),
+        ('discount', pa.int16()),
+        ('savings_amount', pa.float64()),
+        ('savings_percent', pa.float64()),
+        ('price_zar', pa.float64()),
+        ('url', pa.string()),
+        ('full_url', pa.string()),
+        ('image', pa.string()),
+        ('image_path', pa.string()),
+        ('converted_prices', pa.map_(pa.string(), pa.float64())),
+        ('converted_original_prices', pa.map_(pa.string(), pa.float64())),
+        ('rating', pa.float32()),
+        ('reviews_count', pa.int32()),
+        ('in_stock', pa.bool_()),
+        ('seller', categorical),
+        ('specs', pa.map_(pa.string(), pa.string())),
+    ])
+
+
+SCHEMA = _build_schema() if pa is not None else None
+
+
+def _to_float(value):
+    # "KSh 7,699", "16%", "18.9%" and plain numbers alike
+    return parse_price(value)
+
+
+def _to_int(value):
+    number = parse_price(value)
+    return int(number) if number is not None else None
+
+
+def _to_str(value):
+    return str(value) if value is not None else None
+
+
+_FALSE_STRINGS = {'', '0', 'false', 'no', 'n', 'off'}
+
+
+def _to_bool(value):
+    if value is None:
+        return None
+    # A string "False" (e.g. from a CSV or JSON feed) is not truthy here
+    if isinstance(value, str):
+        return value.strip().lower() not in _FALSE_STRINGS
+    return bool(value)
+
+
+def _to_map(convert):
+    def to_map(value):
+        if not isinstance(value, dict):
+            return None
+        return [(str(key), convert(item)) for key, item in value.items()]
+    return to_map
+
+
+# Column -> converter from the item value
+CONVERTERS = {
+    'product_id': _to_str,
+    'name': _to_str,
+    'brand': _to_str,
+    'current_price': _to_float,
+    'original_price': _to_float,
+    'currency': _to_str,
+    'discount': _to_int,
+    'savings_amount': _to_float,
+    'savings_percent': _to_float,
+    'price_zar': _to_float,
+    'url': _to_str,
+    'full_url': _to_str,
+    'image': _to_str,
+    'image_path': _to_str,
+    'converted_prices': _to_map(_to_float),
+    'converted_original_prices': _to_map(_to_float),
+    'rating': _to_float,
+    'reviews_count': _to_int,
+    'in_stock': _to_bool,
+    'seller': _to_str,
+    'specs': _to_map(_to_str),
+}
+
+
+class ArrowColumnExporter(BaseItemExporter):
+    """
+    Shared buffering for the Parquet and Arrow IPC exporters
+    """
+
+    default_row_group_size = 10_000
+
+    def __init__(self, file, row_group_size=None, **kwargs):
+        if pa is None:
+            raise NotConfigured(f"{type(self).__name__} needs pyarrow: pip install pyarrow")
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+        self.row_group_size = int(row_group_size or self.default_row_group_size)
+        self.writer = None
+        self._reset()
+
+    @classmethod
+    def from_crawler(cls, crawler, file, **kwargs):
+        kwargs.setdefault(
+            'row_group_size', crawler.settings.getint('PARQUET_ROW_GROUP_SIZE', cls.default_row_group_size)
+        )
+        return cls(file, **kwargs)
+
+    def _reset(self):
+        self.columns = {name: [] for name in SCHEMA.names}
+        self.rows = 0
+
+    def start_exporting(self):
+        self.writer = self.open_writer()
+
+    def export_item(self, item):
+        adapter = ItemAdapter(item)
+        for name, convert in CONVERTERS.items():
+            self.columns[name].append(convert(adapter.get(name)))
+
+        # Infer the currency from a raw price string when no pipeline set it
+        if self.columns['currency'][-1] is None:
+            self.columns['currency'][-1] = detect_currency(adapter.get('current_price'))
+
+        self.rows += 1
+        if self.rows >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        batch = pa.RecordBatch.from_pydict(self.columns, schema=SCHEMA)
+        self.write_batch(batch)
+        self._reset()
+
+    def finish_exporting(self):
+        self.flush()
+        self.writer.close()
+
+    def open_writer(self):
+        raise NotImplementedError
+
+    def write_batch(self, batch):
+        raise NotImplementedError
+
+
+class ParquetItemExporter(ArrowColumnExporter):
+    """
+    One Parquet row group per row_group_size items
+    """
+
+    compression = 'zstd'
+
+    def open_writer(self):
+        return pq.ParquetWriter(self.file, SCHEMA, compression=self.compression)
+
+    def write_batch(self, batch):
+        self.writer.write_batch(batch, row_group_size=self.row_group_size)
+
+
+class ArrowItemExporter(ArrowColumnExporter):
+    """
+    Arrow IPC stream, one record batch per row_group_size items
+
+    The stream format (not the random-access file format) because
+    brand/currency dictionaries differ from batch to batch.
+    Read back with pyarrow.ipc.open_stream().
+    """
+
+    def open_writer(self):
+        return pa.ipc.new_stream(self.file, SCHEMA)
+
+    def write_batch(self, batch):
+        self.writer.write_batch(batch)
@@ -0,0 +1,160 @@
+"""
+Persistent product fingerprint store for incremental crawls
+
+Every product_id maps to a short hash of the fields we care about
+(name, prices, discount) and the number of the last run that saw it.
+Comparing the hash tells whether a product is new, changed or
+unchanged; rows not touched by a finished run are products that
+vanished from the site.
+
+Backed by a single SQLite file with a WITHOUT ROWID table, so
+lookups stay a single B-tree probe with millions of keys.
+"""
+
+import hashlib
+import sqlite3
+import time
+
+from itemadapter import ItemAdapter
+
+# Fields that make up a product's fingerprint
+FINGERPRINT_FIELDS = ('name', 'current_price', 'original_price', 'discount')
+
+NEW = 'new'
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+
+
+def product_fingerprint(item, fields=FINGERPRINT_FIELDS):
+    """
+    8-byte blake2b digest of the fingerprint fields of an item
+    """
+    adapter = ItemAdapter(item)
+    values = (adapter.get(field) for field in fields)
+    # Unset fields hash as '' whether the item stores them as missing or None
+    data = '\x1f'.join('' if value is None else str(value) for value in values)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=8).digest()
+
+
+class FingerprintStore:
+    """
+    On-disk product_id -> fingerprint map
+
+        store = FingerprintStore('incremental.sqlite')
+        store.open_run()
+        store.check('XI996MP5R1YBONAFAMZ', fingerprint)  # 'new' / 'changed' / 'unchanged'
+        store.record('XI996MP5R1YBONAFAMZ', fingerprint)  # once the item is exported
+        vanished = store.close_run()
+    """
+
+    def __init__(self, path, commit_every=1000):
+        self.path = path
+        self.commit_every = commit_every
+        self.run_id = None
+        self._pending = 0
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS products (
+                product_id  TEXT PRIMARY KEY,
+                fingerprint BLOB NOT NULL,
+                last_seen   INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS products_last_seen ON products (last_seen);
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id   INTEGER PRIMARY KEY,
+                started  REAL NOT NULL,
+                finished REAL
+            );
+        """)
+
+    def open_run(self):
+        """
+        Start a new run; every product touched or recorded from now on is marked as seen by it
+        """
+        cursor = self.conn.execute('INSERT INTO runs (started) VALUES (?)', (time.time(),))
+        self.run_id = cursor.lastrowid
+        self.conn.commit()
+        return self.run_id
+
+    def get(self, product_id):
+        """
+        Stored fingerprint of a product, or None if we've never seen it
+        """
+        row = self.conn.execute(
+            'SELECT fingerprint FROM products WHERE product_id = ?', (product_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def check(self, product_id, fingerprint):
+        """
+        Compare a fingerprint with the stored one, without writing anything.
+
+        Returns NEW, CHANGED or UNCHANGED.
+        """
+        previous = self.get(product_id)
+        if previous is None:
+            return NEW
+        if previous != fingerprint:
+            return CHANGED
+        return UNCHANGED
+
+    def touch(self, product_id):
+        """
+        Mark a known product as seen by this run, keeping its fingerprint
+        """
+        self._write(
+            'UPDATE products SET last_seen = ? WHERE product_id = ?',
+            (self.run_id, product_id),
+        )
+
+    def record(self, product_id, fingerprint):
+        """
+        Store a product's fingerprint and mark it as seen by this run
+        """
+        self._write(
+            'INSERT INTO products (product_id, fingerprint, last_seen) VALUES (?, ?, ?) '
+            'ON CONFLICT (product_id) DO UPDATE SET '
+            'fingerprint = excluded.fingerprint, last_seen = excluded.last_seen',
+            (product_id, fingerprint, self.run_id),
+        )
+
+    def _write(self, sql, params):
+        self.conn.execute(sql, params)
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.conn.commit()
+            self._pending = 0
+
+    def close_run(self, collect_vanished=True):
+        """
+        Finish the current run.
+
+        With collect_vanished, products not seen by this run are
+        removed from the store and their ids returned (tombstones).
+        Only do that for complete crawls - a partial crawl would
+        tombstone everything it didn't get to.
+        """
+        vanished = []
+        if collect_vanished and self.run_id is not None:
+            vanished = [
+                row[0] for row in self.conn.execute(
+                    'SELECT product_id FROM products WHERE last_seen < ?', (self.run_id,)
+                )
+            ]
+            self.conn.execute('DELETE FROM products WHERE last_seen < ?', (self.run_id,))
+        self.conn.execute(
+            'UPDATE runs SET finished = ? WHERE run_id = ?', (time.time(), self.run_id)
+        )
+        self.conn.commit()
+        self._pending = 0
+        return vanished
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,450 @@
+"""
+Shared crawl frontier: several spider processes, one crawl
+
+FrontierScheduler replaces Scrapy's in-memory scheduler with a queue
+and request dedup kept in a shared backend, so any number of nodes can
+run `scrapy crawl jumiaspider` against the same FRONTIER_URL:
+
+    sqlite:///frontier.sqlite        (or a plain path) - nodes on one host
+    redis://host:6379/0              - nodes on several hosts, needs redis-py
+
+Every request is stored once, keyed by its fingerprint. A node leases
+the request it pops and acknowledges it when the download is over
+(FrontierAckMiddleware); leases of nodes that died expire after
+FRONTIER_LEASE seconds and the request is handed out again.
+
+Per-domain rate budgets (FRONTIER_DOMAIN_RATE requests/s, overridden
+per domain by FRONTIER_DOMAIN_RATES) are enforced at pop time across
+all nodes, so adding nodes adds throughput up to the budget without
+hammering any one Jumia site.
+
+Items are deduplicated across nodes with DEDUP_MODE = "shared".
+
+A frontier holds one crawl: start the next crawl with a new
+FRONTIER_URL or FRONTIER_KEY.
+"""
+
+import os
+import pickle
+import socket
+import sqlite3
+import time
+import uuid
+
+from scrapy import signals
+from scrapy.core.scheduler import BaseScheduler
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.request import request_from_dict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+QUEUED, LEASED, DONE = 0, 1, 2
+
+
+class SQLiteFrontier:
+    """
+    Frontier in one SQLite file (WAL mode), shared by local processes
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS requests (
+                id INTEGER PRIMARY KEY,
+                key TEXT UNIQUE NOT NULL,
+                domain TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                payload BLOB,
+                state INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lease_until REAL
+            );
+            CREATE INDEX IF NOT EXISTS requests_queue ON requests (state, priority DESC, id);
+            CREATE TABLE IF NOT EXISTS budgets (domain TEXT PRIMARY KEY, next_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS items (key TEXT PRIMARY KEY);
+        """)
+
+    def push(self, key, domain, priority, payload):
+        """
+        Queue a request; False if the key was queued before
+        """
+        cursor = self.db.execute(
+            'INSERT OR IGNORE INTO requests (key, domain, priority, payload) VALUES (?, ?, ?, ?)',
+            (key, domain, priority, payload),
+        )
+        return cursor.rowcount == 1
+
+    def pop(self, owner, lease, intervals, default_interval):
+        """
+        Lease the best queued request whose domain budget allows it.
+
+        Returns ((key, payload), 0) or (None, seconds until a domain
+        frees up; 0 when the queue is empty).
+        """
+        now = time.time()
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            self.db.execute(
+                'UPDATE requests SET state = ?, owner = NULL WHERE state = ? AND lease_until < ?',
+                (QUEUED, LEASED, now),
+            )
+            row = self.db.execute(
+                'SELECT r.id, r.key, r.domain, r.payload FROM requests r'
+                ' LEFT JOIN budgets b ON b.domain = r.domain'
+                ' WHERE r.state = ? AND (b.next_at IS NULL OR b.next_at <= ?)'
+                ' ORDER BY r.priority DESC, r.id LIMIT 1',
+                (QUEUED, now),
+            ).fetchone()
+            if row is None:
+                wait = self.db.execute(
+                    'SELECT MIN(b.next_at) FROM budgets b'
+                    ' WHERE b.domain IN (SELECT domain FROM requests WHERE state = ?)',
+                    (QUEUED,),
+                ).fetchone()[0]
+                self.db.execute('COMMIT')
+                return None, max(0.0, wait - now) if wait else 0.0
+            id_, key, domain, payload = row
+            self.db.execute(
+                'UPDATE requests SET state = ?, owner = ?, lease_until = ? WHERE id = ?',
+                (LEASED, owner, now + lease, id_),
+            )
+            self.db.execute(
+                'INSERT INTO budgets (domain, next_at) VALUES (?, ?)'
+                ' ON CONFLICT (domain) DO UPDATE SET next_at = excluded.next_at',
+                (domain, now + intervals.get(domain, default_interval)),
+            )
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        return (key, payload), 0.0
+
+    def ack(self, key):
+        self.db.execute(
+            'UPDATE requests SET state = ?, payload = NULL, owner = NULL WHERE key = ?',
+            (DONE, key),
+        )
+
+    def pending(self):
+        """
+        Requests queued or leased by any node
+        """
+        return self.db.execute(
+            'SELECT COUNT(*) FROM requests WHERE state != ?', (DONE,)
+        ).fetchone()[0]
+
+    def add_item(self, key):
+        """
+        Record an item key; False if any node recorded it before
+        """
+        cursor = self.db.execute('INSERT OR IGNORE INTO items (key) VALUES (?)', (key,))
+        return cursor.rowcount == 1
+
+    def close(self):
+        self.db.close()
+
+
+class RedisFrontier:
+    """
+    Frontier in Redis, for nodes on several hosts
+
+    Keys under <prefix>: queue:<domain> (one zset per domain, score
+    from priority and arrival), domains (zset, domain -> score of its
+    best queued request), leases (zset, score = lease expiry), seen and
+    items (sets), req (hash key -> payload), meta (hash key -> "score
+    domain") and one budget:<domain> key per domain whose TTL is the
+    budget.
+
+    A pop looks at the head of each domain's queue, best first, and
+    takes the first one whose budget is free, so a busy domain never
+    hides the requests of the others. It costs the number of domains,
+    not of queued requests.
+    """
+
+    def __init__(self, url, prefix, client=None):
+        if client is None:
+            if redis is None:
+                raise NotConfigured('redis:// frontiers need redis-py: pip install redis')
+            client = redis.Redis.from_url(url)
+        self.db = client
+        self.prefix = prefix
+
+    def _k(self, name):
+        return f'{self.prefix}:{name}'
+
+    def _queue(self, domain):
+        if isinstance(domain, bytes):
+            domain = domain.decode()
+        return self._k(f'queue:{domain}')
+
+    def push(self, key, domain, priority, payload):
+        if not self.db.sadd(self._k('seen'), key):
+            return False
+        # Higher priority first, then arrival order
+        score = -priority * 1e10 + self.db.incr(self._k('seq'))
+        pipe = self.db.pipeline()
+        pipe.hset(self._k('req'), key, payload)
+        pipe.hset(self._k('meta'), key, f'{score!r} {domain}')
+        self._enqueue(pipe, key, domain, score)
+        pipe.execute()
+        return True
+
+    def _enqueue(self, pipe, key, domain, score):
+        pipe.zadd(self._queue(domain), {key: score})
+        # lt: a domain's score only ever moves to its best request
+        pipe.zadd(self._k('domains'), {domain: score}, lt=True)
+
+    def pop(self, owner, lease, intervals, default_interval):
+        now = time.time()
+        self._requeue_expired(now)
+        wait = None
+        for domain in self.db.zrange(self._k('domains'), 0, -1):
+            name = domain.decode()
+            interval = intervals.get(name, default_interval)
+            budget = self._k(f'budget:{name}')
+            if interval > 0 and not self.db.set(budget, owner, px=max(1, int(interval * 1000)), nx=True):
+                ttl = self.db.pttl(budget)
+                if ttl > 0:
+                    wait = min(wait, ttl / 1000) if wait is not None else ttl / 1000
+                continue
+            # Another node may have emptied the queue since ZRANGE
+            popped = self.db.zpopmin(self._queue(name))
+            self._update_domain(name)
+            if not popped:
+                if interval > 0:
+                    self.db.delete(budget)
+                continue
+            key = popped[0][0]
+            self.db.zadd(self._k('leases'), {key: now + lease})
+            return (key.decode(), self.db.hget(self._k('req'), key)), 0.0
+        return None, max(0.0, wait or 0.0)
+
+    def _update_domain(self, domain):
+        """
+        Set a domain's score to its queue head, or drop it once empty
+        """
+        head = self.db.zrange(self._queue(domain), 0, 0, withscores=True)
+        if head:
+            self.db.zadd(self._k('domains'), {domain: head[0][1]})
+            return
+        self.db.zrem(self._k('domains'), domain)
+        # A push may have landed between the two calls
+        head = self.db.zrange(self._queue(domain), 0, 0, withscores=True)
+        if head:
+            self.db.zadd(self._k('domains'), {domain: head[0][1]}, lt=True)
+
+    def _requeue_expired(self, now):
+        for key in self.db.zrangebyscore(self._k('leases'), '-inf', now):
+            if self.db.zrem(self._k('leases'), key):
+                meta = self.db.hget(self._k('meta'), key)
+                if meta is not None:
+                    score, domain = meta.decode().split(' ', 1)
+                    pipe = self.db.pipeline()
+                    self._enqueue(pipe, key, domain, float(score))
+                    pipe.execute()
+
+    def ack(self, key):
+        pipe = self.db.pipeline()
+        pipe.zrem(self._k('leases'), key)
+        pipe.hdel(self._k('req'), key)
+        pipe.hdel(self._k('meta'), key)
+        pipe.execute()
+
+    def pending(self):
+        pipe = self.db.pipeline()
+        for domain in self.db.zrange(self._k('domains'), 0, -1):
+            pipe.zcard(self._queue(domain))
+        pipe.zcard(self._k('leases'))
+        return sum(pipe.execute())
+
+    def add_item(self, key):
+        return bool(self.db.sadd(self._k('items'), key))
+
+    def close(self):
+        self.db.close()
+
+
+def open_frontier(url, prefix='jumia'):
+    """
+    Backend for a FRONTIER_URL
+    """
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisFrontier(url, prefix)
+    # sqlite:///relative.sqlite, sqlite:////absolute.sqlite
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteFrontier(url)
+
+
+class SharedDeduper:
+    """
+    Deduper over the frontier's item set, same add() as dedup.py
+    """
+
+    def __init__(self, frontier):
+        self.frontier = frontier
+
+    def add(self, key):
+        return not self.frontier.add_item(key)
+
+
+def request_domain(request):
+    return request.meta.get('download_slot') or urlparse_cached(request).hostname or ''
+
+
+class FrontierScheduler(BaseScheduler):
+    """
+    Scheduler backed by a shared frontier (see the module docstring)
+
+    Enable with SCHEDULER = "jumiascraper.frontier.FrontierScheduler"
+    plus FrontierAckMiddleware in DOWNLOADER_MIDDLEWARES.
+
+    dont_filter requests are queued under a unique key, except start
+    requests: every node yields the same start URLs, and only one copy
+    of each is crawled.
+
+    A node stops once the frontier has been empty on every node for
+    FRONTIER_IDLE_TIMEOUT seconds, so it doesn't quit while another
+    node is still parsing a page that will add requests.
+    """
+
+    def __init__(self, frontier, crawler, lease=300.0, idle_timeout=10.0,
+                 domain_rate=1.0, domain_rates=None):
+        self.frontier = frontier
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.fingerprinter = crawler.request_fingerprinter
+        self.lease = lease
+        self.idle_timeout = idle_timeout
+        self.default_interval = 1 / domain_rate if domain_rate > 0 else 0.0
+        self.intervals = {
+            domain: (1 / rate if rate > 0 else 0.0)
+            for domain, rate in (domain_rates or {}).items()
+        }
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self.spider = None
+        self.empty_since = None
+        self.wakeup = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        url = settings.get('FRONTIER_URL')
+        if not url:
+            raise ValueError('FrontierScheduler needs FRONTIER_URL')
+        return cls(
+            open_frontier(url, settings.get('FRONTIER_KEY', 'jumia')),
+            crawler,
+            lease=settings.getfloat('FRONTIER_LEASE', 300.0),
+            idle_timeout=settings.getfloat('FRONTIER_IDLE_TIMEOUT', 10.0),
+            domain_rate=settings.getfloat('FRONTIER_DOMAIN_RATE', 1.0),
+            domain_rates={
+                domain: float(rate)
+                for domain, rate in settings.getdict('FRONTIER_DOMAIN_RATES').items()
+            },
+        )
+
+    def open(self, spider):
+        self.spider = spider
+        spider.logger.info(f'🌐 Frontier node {self.owner}: {self.frontier.pending()} requests pending')
+
+    def close(self, reason):
+        if self.wakeup is not None and self.wakeup.active():
+            self.wakeup.cancel()
+        self.frontier.close()
+
+    def has_pending_requests(self):
+        if self.frontier.pending():
+            self.empty_since = None
+            return True
+        now = time.monotonic()
+        if self.empty_since is None:
+            self.empty_since = now
+        return now - self.empty_since < self.idle_timeout
+
+    def enqueue_request(self, request):
+        key = self.fingerprinter.fingerprint(request).hex()
+        if request.dont_filter and not request.meta.get('is_start_request'):
+            key = f'{key}:{uuid.uuid4().hex}'
+        payload = pickle.dumps(request.to_dict(spider=self.spider), protocol=4)
+        if not self.frontier.push(key, request_domain(request), request.priority, payload):
+            self.stats.inc_value('frontier/duplicate')
+            return False
+        self.stats.inc_value('frontier/enqueued')
+        return True
+
+    def next_request(self):
+        entry, wait = self.frontier.pop(self.owner, self.lease, self.intervals, self.default_interval)
+        if entry is None:
+            if wait:
+                self.stats.inc_value('frontier/budget_wait')
+                self._wake_after(wait)
+            return None
+        key, payload = entry
+        request = request_from_dict(pickle.loads(payload), spider=self.spider)
+        request.meta['frontier_key'] = key
+        self.stats.inc_value('frontier/dequeued')
+        return request
+
+    def _wake_after(self, seconds):
+        """
+        Ask the engine for the next request once a domain budget frees
+        up, instead of waiting for its 5 s heartbeat
+        """
+        from twisted.internet import reactor
+
+        if self.wakeup is not None and self.wakeup.active():
+            return
+        slot = getattr(self.crawler.engine, '_slot', None)
+        nextcall = getattr(slot, 'nextcall', None)
+        if nextcall is not None:
+            self.wakeup = reactor.callLater(seconds, nextcall.schedule)
+
+
+class FrontierAckMiddleware:
+    """
+    Mark frontier requests done once their download is over
+
+    Keep it the closest middleware to the downloader (highest order in
+    DOWNLOADER_MIDDLEWARES) so it sees every response and exception,
+    including cached responses and ignored requests, before retries or
+    redirects replace the request.
+    """
+
+    def __init__(self, frontier, stats):
+        self.frontier = frontier
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get('FRONTIER_URL'):
+            raise NotConfigured('FRONTIER_URL is not set')
+        frontier = open_frontier(settings['FRONTIER_URL'], settings.get('FRONTIER_KEY', 'jumia'))
+        middleware = cls(frontier, crawler.stats)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _ack(self, request):
+        key = request.meta.get('frontier_key')
+        if key is not None:
+            self.frontier.ack(key)
+            self.stats.inc_value('frontier/acked')
+
+    def process_response(self, request, response, spider):
+        self._ack(request)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._ack(request)
+        return None
+
+    def spider_closed(self, spider):
+        self.frontier.close()
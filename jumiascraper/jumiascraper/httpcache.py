@@ -0,0 +1,178 @@
+"""
+Content-addressed HTTP cache storage for recording and replaying crawls
+
+Layout under HTTPCACHE_DIR/<spider name>/:
+
+    index/ab/<request fingerprint>.json   url, status, headers, body digest
+    objects/cd/<sha256 of body>.z         zlib-compressed response body
+
+Identical bodies (the same listing page fetched through different
+URLs, robots.txt across runs...) are stored once. When
+HTTPCACHE_MAX_BYTES is set, the least recently used bodies are
+evicted once the objects directory grows past it.
+
+Use it through the spider's cache modes (JUMIA_CACHE_MODE):
+
+    scrapy crawl jumiaspider -s JUMIA_CACHE_MODE=record   # crawl live, keep every response
+    scrapy crawl jumiaspider -s JUMIA_CACHE_MODE=replay   # no network, full speed
+
+Recording uses RecordPolicy, so every page is fetched again and
+replaces what was cached for it, rather than an old copy being served.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from pathlib import Path
+
+from scrapy.extensions.httpcache import DummyPolicy
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+
+logger = logging.getLogger(__name__)
+
+
+class RecordPolicy(DummyPolicy):
+    """
+    HTTPCACHE_POLICY that always downloads and stores, never serving a cached copy
+    """
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        return False
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        return False
+
+
+class ContentAddressedCacheStorage:
+    """
+    HTTPCACHE_STORAGE backend, see the module docstring
+    """
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings['HTTPCACHE_DIR'])
+        self.expiration_secs = settings.getint('HTTPCACHE_EXPIRATION_SECS')
+        self.max_bytes = settings.getint('HTTPCACHE_MAX_BYTES', 0)
+        self.compress_level = settings.getint('HTTPCACHE_COMPRESS_LEVEL', 6)
+        self.total_bytes = 0
+
+    def open_spider(self, spider):
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        self.root = Path(self.cachedir, spider.name)
+        self.objects_dir = self.root / 'objects'
+        self.index_dir = self.root / 'index'
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+        self.total_bytes = sum(size for _, size, _ in self._iter_objects())
+        spider.logger.info(
+            f"Content-addressed HTTP cache in {self.root} ({self.total_bytes / 2**20:.1f} MiB)"
+        )
+
+    def close_spider(self, spider):
+        self.evict()
+
+    def retrieve_response(self, spider, request):
+        """
+        Return the cached response, or None if not cached/expired/evicted
+        """
+        index_path = self._index_path(request)
+        try:
+            meta = json.loads(index_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+        if 0 < self.expiration_secs < time.time() - meta['timestamp']:
+            return None
+
+        object_path = self._object_path(meta['body'])
+        try:
+            body = zlib.decompress(object_path.read_bytes())
+        except FileNotFoundError:
+            # Body was evicted; drop the dangling index entry
+            index_path.unlink(missing_ok=True)
+            return None
+        # Mark as recently used for eviction
+        os.utime(object_path)
+
+        url = meta['response_url']
+        headers = Headers({
+            name.encode('latin-1'): [v.encode('latin-1') for v in values]
+            for name, values in meta['headers'].items()
+        })
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=meta['status'], body=body)
+
+    def store_response(self, spider, request, response):
+        digest = hashlib.sha256(response.body).hexdigest()
+        object_path = self._object_path(digest)
+        if object_path.exists():
+            os.utime(object_path)
+        else:
+            data = zlib.compress(response.body, self.compress_level)
+            _atomic_write(object_path, data)
+            self.total_bytes += len(data)
+
+        meta = {
+            'url': request.url,
+            'method': request.method,
+            'status': response.status,
+            'response_url': response.url,
+            'timestamp': time.time(),
+            'headers': {
+                name.decode('latin-1'): [v.decode('latin-1') for v in values]
+                for name, values in response.headers.items()
+            },
+            'body': digest,
+        }
+        _atomic_write(self._index_path(request), json.dumps(meta).encode('utf-8'))
+
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Delete least recently used bodies until the cache fits HTTPCACHE_MAX_BYTES
+        """
+        if not self.max_bytes or self.total_bytes <= self.max_bytes:
+            return
+        # Leave some headroom so we don't evict again on the next store
+        target = self.max_bytes * 0.9
+        removed = 0
+        for path, size, _ in sorted(self._iter_objects(), key=lambda entry: entry[2]):
+            if self.total_bytes <= target:
+                break
+            path.unlink(missing_ok=True)
+            self.total_bytes -= size
+            removed += 1
+        logger.info("Evicted %d cached bodies, cache is now %.1f MiB",
+                    removed, self.total_bytes / 2**20)
+
+    def _iter_objects(self):
+        """
+        (path, size, mtime) of every stored body
+        """
+        for shard in os.scandir(self.objects_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.z'):
+                    stat = entry.stat()
+                    yield Path(entry.path), stat.st_size, stat.st_mtime
+
+    def _index_path(self, request):
+        key = self._fingerprinter.fingerprint(request).hex()
+        return self.index_dir / key[:2] / f'{key}.json'
+
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / f'{digest}.z'
+
+
+def _atomic_write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
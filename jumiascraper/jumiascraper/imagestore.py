@@ -0,0 +1,235 @@
+"""
+Content-addressed product image store
+
+Jumia image URLs end in a cache-buster that changes when the picture
+does:
+
+    https://ke.jumia.is/unsafe/fit-in/300x300/filters:fill(white)/product/47/7716523/1.jpg?3620
+
+ImageStore files every downloaded image under the SHA-256 of its bytes
+(full/<sha[:2]>/<sha>.<ext>, thumbnails under thumbs/<name>/) and keeps
+an SQLite index of URL -> (cache-buster, sha, perceptual hash):
+
+- while a URL's cache-buster is the one last stored, the stored file is
+  reused and the image is not requested again;
+- an image whose bytes are already stored, under any URL, is not
+  written again;
+- when the cache-buster changes but the new image looks the same as the
+  one stored for that URL (difference hash within a few bits, e.g. a
+  re-encode), the stored file is kept.
+
+Perceptual hashing and thumbnails need Pillow; without it images are
+still stored and deduplicated by content.
+
+Used by pipelines.ProductImagePipeline.
+"""
+
+import hashlib
+import io
+import os
+import sqlite3
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Pillow format -> file extension
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+
+def split_version(url):
+    """
+    (url without the cache-buster, cache-buster or None)
+
+        >>> split_version('https://ke.jumia.is/product/47/7716523/1.jpg?3620')
+        ('https://ke.jumia.is/product/47/7716523/1.jpg', '3620')
+    """
+    parts = urlsplit(url)
+    if parts.query.isdigit():
+        return urlunsplit(parts._replace(query='', fragment='')), parts.query
+    return urlunsplit(parts._replace(fragment='')), None
+
+
+def dhash(image, size=8):
+    """
+    64-bit difference hash of a Pillow image, as 16 hex digits
+
+    Each bit says whether a pixel of the (size+1) x size grayscale
+    thumbnail is brighter than its right neighbour, so it survives
+    re-encoding and rescaling but not a different picture.
+    """
+    small = image.convert('L').resize((size + 1, size), Image.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f'{bits:0{size * size // 4}x}'
+
+
+def hamming(a, b):
+    return (int(a, 16) ^ int(b, 16)).bit_count()
+
+
+class ImageStore:
+    """
+    Image files plus their SQLite index under one directory
+
+        store = ImageStore('images', thumbs={'small': (100, 100)})
+        store.lookup(url)                     # stored path or None
+        sha, phash, image = store.analyse(body)
+        ...
+        store.close()
+
+    analyse() and write() only touch their arguments and the files, so
+    they can run in worker threads. Everything else reads or writes the
+    index and must stay on one thread.
+    """
+
+    def __init__(self, root, thumbs=None, max_distance=4, commit_every=100):
+        self.root = root
+        self.thumbs = dict(thumbs or {})
+        self.max_distance = max_distance
+        self.commit_every = commit_every
+        self._pending = 0
+
+        os.makedirs(root, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, 'index.sqlite'))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                key     TEXT PRIMARY KEY,
+                version TEXT,
+                sha     TEXT NOT NULL,
+                phash   TEXT,
+                fetched REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha   TEXT PRIMARY KEY,
+                path  TEXT NOT NULL,
+                phash TEXT
+            ) WITHOUT ROWID;
+        """)
+        # sha -> path, small enough to keep in memory
+        self.paths = dict(self.conn.execute('SELECT sha, path FROM blobs'))
+
+    def lookup(self, url):
+        """
+        Stored path for url if its cache-buster is the one stored, else None
+        """
+        key, version = split_version(url)
+        if version is None:
+            return None
+        row = self.conn.execute(
+            'SELECT version, sha FROM images WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[0] != version:
+            return None
+        return self.paths.get(row[1])
+
+    def analyse(self, body):
+        """
+        (sha256 hex, perceptual hash or None, decoded image or None)
+
+        Raises ValueError when Pillow is installed and body is not an image.
+        """
+        sha = hashlib.sha256(body).hexdigest()
+        if Image is None:
+            return sha, None, None
+        try:
+            image = Image.open(io.BytesIO(body))
+            image.load()
+        except Exception as e:
+            raise ValueError(f'not an image: {e}') from e
+        return sha, dhash(image), image
+
+    def match(self, url, sha, phash):
+        """
+        sha of a stored image to reuse for these bytes, else None
+        """
+        if sha in self.paths:
+            return sha
+        if phash is None:
+            return None
+        row = self.conn.execute(
+            'SELECT sha, phash FROM images WHERE key = ?', (split_version(url)[0],)
+        ).fetchone()
+        if row and row[1] and row[0] in self.paths and hamming(row[1], phash) <= self.max_distance:
+            return row[0]
+        return None
+
+    def reserve(self, sha, image=None):
+        """
+        Path for a new image; later match() calls reuse it right away
+        """
+        ext = EXTENSIONS.get(image.format, 'jpg') if image is not None else 'jpg'
+        path = self.paths[sha] = f'full/{sha[:2]}/{sha}.{ext}'
+        return path
+
+    def write(self, sha, path, body, image=None):
+        """
+        Write the original and its thumbnails; returns the thumbnail count
+        """
+        self._write_file(path, body)
+        if image is None:
+            return 0
+        rgb = image.convert('RGB')
+        for name, size in self.thumbs.items():
+            thumb = rgb.copy()
+            thumb.thumbnail(tuple(size), Image.LANCZOS)
+            buf = io.BytesIO()
+            thumb.save(buf, 'JPEG', quality=85)
+            self._write_file(f'thumbs/{name}/{sha[:2]}/{sha}.jpg', buf.getvalue())
+        return len(self.thumbs)
+
+    def _write_file(self, path, data):
+        full = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        # Same bytes always land at the same path, so a concurrent writer
+        # of the same image only ever replaces it with an identical file
+        tmp = f'{full}.{os.getpid()}.{id(data)}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, full)
+
+    def add(self, sha, phash):
+        """
+        Index a written image
+        """
+        self.conn.execute(
+            'INSERT OR IGNORE INTO blobs (sha, path, phash) VALUES (?, ?, ?)',
+            (sha, self.paths[sha], phash),
+        )
+        self._committed()
+
+    def link(self, url, sha, phash):
+        """
+        Point url at a stored image; returns its path
+        """
+        key, version = split_version(url)
+        self.conn.execute(
+            'INSERT INTO images (key, version, sha, phash, fetched) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET version = excluded.version, sha = excluded.sha, '
+            'phash = excluded.phash, fetched = excluded.fetched',
+            (key, version, sha, phash, time.time()),
+        )
+        self._committed()
+        return self.paths[sha]
+
+    def _committed(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.conn.commit()
+            self._pending = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
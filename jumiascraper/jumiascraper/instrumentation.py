@@ -0,0 +1,177 @@
+"""
+Per-stage pipeline timing and periodic metrics dumps
+
+Pipeline classes decorated with @timed_stage time their process_item
+and count drops, per stage:
+
+    pipeline/<Stage>/items
+    pipeline/<Stage>/time_ms      (total)
+    pipeline/<Stage>/max_ms
+    pipeline/<Stage>/dropped
+
+The decorator wraps from_crawler, which gives each pipeline instance a
+timed process_item before Scrapy's ItemPipelineManager picks it up; no
+Scrapy internals are touched. PIPELINE_TIMING_ENABLED = False turns it
+off.
+
+MetricsDump (EXTENSIONS) writes all numeric crawl stats - including
+the instrumentation/* ones from middlewares.py - to METRICS_FILE
+every METRICS_INTERVAL seconds, as JSON lines or as a Prometheus
+text file for node_exporter's textfile collector.
+"""
+
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet import task
+from twisted.internet.defer import Deferred
+
+
+def timed_stage(cls):
+    """
+    Class decorator: time the process_item of every instance built by from_crawler
+    """
+    build = getattr(cls, 'from_crawler', None)
+
+    def from_crawler(klass, crawler, *args, **kwargs):
+        if build is not None:
+            pipe = build.__func__(klass, crawler, *args, **kwargs)
+        else:
+            pipe = klass(*args, **kwargs)
+        # Already timed by a decorated base class' from_crawler
+        if 'process_item' not in vars(pipe) and crawler.settings.getbool('PIPELINE_TIMING_ENABLED', True):
+            pipe.process_item = _timed(pipe.process_item, type(pipe).__name__, crawler.stats)
+        return pipe
+
+    cls.from_crawler = classmethod(from_crawler)
+    return cls
+
+
+def _timed(process_item, stage, stats):
+    prefix = f'pipeline/{stage}'
+
+    def record(start, dropped=False):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        stats.inc_value(f'{prefix}/items')
+        stats.inc_value(f'{prefix}/time_ms', elapsed_ms, start=0.0)
+        stats.max_value(f'{prefix}/max_ms', elapsed_ms)
+        if dropped:
+            stats.inc_value(f'{prefix}/dropped')
+
+    def timed_process_item(item, spider):
+        start = time.perf_counter()
+        try:
+            result = deferred_from_coro(process_item(item, spider))
+        except DropItem:
+            record(start, dropped=True)
+            raise
+        if not isinstance(result, Deferred):
+            record(start)
+            return result
+
+        # Asynchronous stage: stop the clock when it fires
+        def on_success(value):
+            record(start)
+            return value
+
+        def on_failure(failure):
+            record(start, dropped=failure.check(DropItem) is not None)
+            return failure
+
+        return result.addCallbacks(on_success, on_failure)
+
+    return timed_process_item
+
+
+class MetricsDump:
+    """
+    Periodically write the crawl stats to a file
+
+    Settings:
+        METRICS_FILE      - where to write (extension is off without it)
+        METRICS_FORMAT    - 'jsonl' (append one line per dump) or
+                            'prometheus' (rewrite a text exposition file)
+        METRICS_INTERVAL  - seconds between dumps (default 30)
+    """
+
+    def __init__(self, stats, path, fmt='jsonl', interval=30.0):
+        if fmt not in ('jsonl', 'prometheus'):
+            raise ValueError(f"METRICS_FORMAT must be 'jsonl' or 'prometheus', got {fmt!r}")
+        self.stats = stats
+        self.path = path
+        self.format = fmt
+        self.interval = interval
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        path = settings.get('METRICS_FILE')
+        if not path:
+            raise NotConfigured('METRICS_FILE is not set')
+        ext = cls(
+            crawler.stats,
+            path,
+            fmt=settings.get('METRICS_FORMAT', 'jsonl'),
+            interval=settings.getfloat('METRICS_INTERVAL', 30.0),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.spider_name = spider.name
+        self.task = task.LoopingCall(self.dump)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        # Final numbers
+        self.dump()
+
+    def snapshot(self):
+        """
+        Numeric stats only (datetimes etc. are left out)
+        """
+        return {
+            key: value for key, value in self.stats.get_stats().items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+
+    def dump(self):
+        values = self.snapshot()
+        if self.format == 'jsonl':
+            line = {'timestamp': datetime.now().isoformat(), 'spider': self.spider_name, 'stats': values}
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(line) + '\n')
+        else:
+            _write_atomic(self.path, prometheus_text(values, self.spider_name))
+
+
+_METRIC_NAME_RE = re.compile(r'[^a-zA-Z0-9_]')
+
+
+def prometheus_text(values, spider_name):
+    """
+    Stats dict -> Prometheus text exposition format
+    """
+    lines = []
+    for key in sorted(values):
+        name = 'jumiascraper_' + _METRIC_NAME_RE.sub('_', key)
+        lines.append(f'{name}{{spider="{spider_name}"}} {values[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path, text):
+    # Scrapers read the file at any time, never let them see half of it
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
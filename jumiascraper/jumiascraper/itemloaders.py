@@ -2,28 +2,41 @@ from itemloaders.processors import TakeFirst, MapCompose, Join
 from scrapy.loader import ItemLoader
 import re
 
+from jumiascraper.prices import parse_price
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+# ===== Field cleaners (also used by extractors.py) =====
+
+def collapse_whitespace(value):
+    return _WHITESPACE_RE.sub(' ', value)
+
+
+def absolute_jumia_url(value):
+    return f'https://www.jumia.co.ke{value}' if value and not value.startswith('http') else value
+
+
+def http_url_only(value):
+    return value if value and value.startswith('http') else None
+
+
+def title_case(value):
+    return value.title() if value else None  # Capitalize first letter
+
 
 class JumiaProductLoader(ItemLoader):
     default_output_processor = TakeFirst()
     
     name_in = MapCompose(
         str.strip,  
-        lambda x: re.sub(r'\s+', ' ', x)  
+        collapse_whitespace
     )
     
-    current_price_in = MapCompose(
-        lambda x: x.strip() if x else None,  # Remove spaces
-        lambda x: x.replace('KSh', '').replace('Ksh', '').replace('ksh', '').strip() if x else None,  # Remove "KSh"
-        lambda x: x.replace(',', '').replace(' ', '') if x else None,  # Remove commas AND spaces
-        lambda x: x if x and x.replace('.', '').isdigit() else None  # Only keep if it's a number
-    )
+    # "KSh 7,699" -> 7699.0 (see prices.py)
+    current_price_in = MapCompose(parse_price)
     
-    original_price_in = MapCompose(
-        lambda x: x.strip() if x else None,
-        lambda x: x.replace('KSh', '').replace('Ksh', '').replace('ksh', '').strip() if x else None,
-        lambda x: x.replace(',', '').replace(' ', '') if x else None,
-        lambda x: x if x and x.replace('.', '').isdigit() else None
-    )
+    original_price_in = MapCompose(parse_price)
     
     discount_in = MapCompose(
         str.strip
@@ -35,51 +48,24 @@ class JumiaProductLoader(ItemLoader):
     
     full_url_in = MapCompose(
         str.strip,
-        lambda x: f'https://www.jumia.co.ke{x}' if x and not x.startswith('http') else x
+        absolute_jumia_url
     )
     
 
     image_in = MapCompose(
         str.strip,
-        lambda x: x if x and x.startswith('http') else None
+        http_url_only
     )
     
     brand_in = MapCompose(
         str.strip,
-        lambda x: x.title() if x else None  # Capitalize first letter
+        title_case
     )
     
     product_id_in = MapCompose(
         str.strip
     )
 
-def remove_currency_symbol(value):
-    if not value:
-        return None
-    # Remove common currency symbols
-    return re.sub(r'[KSh$£€¥₹]', '', value).strip()
-
-
-def clean_number(value):
-    """
-    Clean numeric strings: remove commas and spaces
-    """
-    if not value:
-        return None
-    return re.sub(r'[,\s]', '', value)
-
-
-def to_float(value):
-    """
-    Convert string to float (for calculations)
-    """
-    if not value:
-        return None
-    try:
-        return float(value)
-    except ValueError:
-        return None
-
 
 # ===== OPTIONAL: More Advanced Item Loader =====
 
@@ -92,19 +78,9 @@ class JumiaProductLoaderAdvanced(ItemLoader):
     default_output_processor = TakeFirst()
     
     # Clean and convert prices to floats
-    current_price_in = MapCompose(
-        str.strip,
-        remove_currency_symbol,
-        clean_number,
-        to_float
-    )
+    current_price_in = MapCompose(parse_price)
     
-    original_price_in = MapCompose(
-        str.strip,
-        remove_currency_symbol,
-        clean_number,
-        to_float
-    )
+    original_price_in = MapCompose(parse_price)
     
     # Extract just the number from discount
     # "25%" → "25"
@@ -114,12 +90,9 @@ class JumiaProductLoaderAdvanced(ItemLoader):
     )
     
     # All other fields same as basic version
-    name_in = MapCompose(str.strip, lambda x: re.sub(r'\s+', ' ', x))
+    name_in = MapCompose(str.strip, collapse_whitespace)
     url_in = MapCompose(str.strip)
-    full_url_in = MapCompose(
-        str.strip,
-        lambda x: f'https://www.jumia.co.ke{x}' if x and not x.startswith('http') else x
-    )
+    full_url_in = MapCompose(str.strip, absolute_jumia_url)
     image_in = MapCompose(str.strip)
-    brand_in = MapCompose(str.strip, lambda x: x.title() if x else None)
+    brand_in = MapCompose(str.strip, title_case)
     product_id_in = MapCompose(str.strip)
\ No newline at end of file
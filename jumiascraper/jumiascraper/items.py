@@ -3,22 +3,144 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
-import scrapy
+from collections.abc import KeysView
+from dataclasses import dataclass, fields
 
+from itemadapter import ItemAdapter
+from itemadapter.adapter import AdapterInterface
 
-class JumiaProduct(scrapy.Item):
+
+@dataclass(slots=True)
+class JumiaProduct:
+    """
+    One product from a Jumia listing
+
+    A slotted dataclass rather than a dict-backed scrapy.Item: no
+    per-item dict, and attribute access instead of hashing on every
+    field lookup. Loaders, pipelines and exporters all go through
+    ItemAdapter (see JumiaProductAdapter below). Unset fields are None
+    and, like unset scrapy.Item fields, left out of feeds.
+    """
     # define the fields for your item here like:
-    name = scrapy.Field()
-    current_price = scrapy.Field()
-    original_price =scrapy.Field()
-    discount = scrapy.Field()
-    url = scrapy.Field()
-    full_url =scrapy.Field()
-    image = scrapy.Field()
-    brand = scrapy.Field()
-    product_id = scrapy.Field()
-
-    currency = scrapy.Field()
-    price_zar = scrapy.Field
-  
+    name: str | None = None
+    current_price: float | None = None
+    original_price: float | None = None
+    discount: str | None = None
+    url: str | None = None
+    full_url: str | None = None
+    image: str | None = None
+    brand: str | None = None
+    product_id: str | None = None
+
+    currency: str | None = None
+    price_zar: float | None = None
+    # {currency: amount}, filled by CurrencyConversionPipeline
+    converted_prices: dict | None = None
+    converted_original_prices: dict | None = None
+    savings_amount: float | None = None
+    # "18.9%"
+    savings_percent: str | None = None
+
+    # From the page's embedded JSON state or the product detail page
+    rating: float | None = None
+    reviews_count: int | None = None
+    in_stock: bool | None = None
+    seller: str | None = None
+    # {name: value} from the detail page's specifications (JUMIA_ENRICH)
+    specs: dict | None = None
+    # Stored copy of image, relative to PRODUCT_IMAGES_DIR (ProductImagePipeline)
+    image_path: str | None = None
+
+
+class JumiaProductAdapter(AdapterInterface):
+    """
+    ItemAdapter support for JumiaProduct
+
+    The stock DataclassAdapter calls dataclasses.fields() for every
+    item it wraps, which made each ItemAdapter(item) in the pipelines
+    several times slower than for a scrapy.Item. This one looks the
+    field table up once per class.
+
+    None means unset: iterating the adapter (keys(), items(), asdict(),
+    and so the feed exporters) skips None fields, so feeds carry only
+    the populated fields, as they did with scrapy.Item. field_names()
+    still lists every declared field.
+
+    Installed by register_adapter().
+    """
+
+    _fields_by_class = {}
+
+    def __init__(self, item):
+        super().__init__(item)
+        self._fields_dict = self._fields_for(item.__class__)
+
+    @classmethod
+    def _fields_for(cls, item_class):
+        try:
+            return cls._fields_by_class[item_class]
+        except KeyError:
+            fields_dict = cls._fields_by_class[item_class] = {f.name: f for f in fields(item_class)}
+            return fields_dict
+
+    @classmethod
+    def is_item(cls, item):
+        return isinstance(item, JumiaProduct)
+
+    @classmethod
+    def is_item_class(cls, item_class):
+        return isinstance(item_class, type) and issubclass(item_class, JumiaProduct)
+
+    @classmethod
+    def get_field_meta_from_class(cls, item_class, field_name):
+        try:
+            return cls._fields_for(item_class)[field_name].metadata
+        except KeyError:
+            raise KeyError(f"{item_class.__name__} does not support field: {field_name}") from None
+
+    @classmethod
+    def get_field_names_from_class(cls, item_class):
+        return list(cls._fields_for(item_class))
+
+    def field_names(self):
+        return KeysView(self._fields_dict)
+
+    def __getitem__(self, field_name):
+        if field_name in self._fields_dict:
+            return getattr(self.item, field_name)
+        raise KeyError(field_name)
+
+    def __setitem__(self, field_name, value):
+        if field_name in self._fields_dict:
+            setattr(self.item, field_name, value)
+        else:
+            raise KeyError(f"{self.item.__class__.__name__} does not support field: {field_name}")
+
+    def __delitem__(self, field_name):
+        if getattr(self.item, field_name, None) is None or field_name not in self._fields_dict:
+            raise KeyError(field_name)
+        setattr(self.item, field_name, None)
+
+    def __iter__(self):
+        item = self.item
+        return (name for name in self._fields_dict if getattr(item, name) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def register_adapter():
+    """
+    Put JumiaProductAdapter first in ItemAdapter.ADAPTER_CLASSES, once
 
+    Called from the spider's from_crawler; scripts that build
+    ItemAdapters over JumiaProduct outside a crawl call it themselves.
+    A copy left behind by a reload of this module is replaced.
+    """
+    classes = ItemAdapter.ADAPTER_CLASSES
+    if classes and classes[0] is JumiaProductAdapter:
+        return
+    for cls in list(classes):
+        if (cls.__module__, cls.__qualname__) == (__name__, JumiaProductAdapter.__qualname__):
+            classes.remove(cls)
+    classes.appendleft(JumiaProductAdapter)
@@ -3,7 +3,10 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+import time
+
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
@@ -98,3 +101,306 @@ class JumiascraperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class InstrumentationSpiderMiddleware:
+    """
+    Record parse time and items per page in the crawl stats
+
+    Keep it the closest middleware to the spider (highest order in
+    SPIDER_MIDDLEWARES) so only the callback itself is timed.
+
+    Stats:
+        instrumentation/parse/responses
+        instrumentation/parse/time_ms       (total)
+        instrumentation/parse/max_ms
+        instrumentation/parse/items         (total)
+        instrumentation/parse/max_items_per_page
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def process_spider_output(self, response, result, spider):
+        items = 0
+        elapsed = 0.0
+        iterator = iter(result)
+        while True:
+            start = time.perf_counter()
+            try:
+                obj = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                break
+            elapsed += time.perf_counter() - start
+            if not isinstance(obj, Request):
+                items += 1
+            yield obj
+        self._record(items, elapsed)
+
+    async def process_spider_output_async(self, response, result, spider):
+        items = 0
+        elapsed = 0.0
+        iterator = result.__aiter__()
+        while True:
+            start = time.perf_counter()
+            try:
+                obj = await iterator.__anext__()
+            except StopAsyncIteration:
+                elapsed += time.perf_counter() - start
+                break
+            elapsed += time.perf_counter() - start
+            if not isinstance(obj, Request):
+                items += 1
+            yield obj
+        self._record(items, elapsed)
+
+    def _record(self, items, elapsed):
+        elapsed_ms = elapsed * 1000
+        self.stats.inc_value('instrumentation/parse/responses')
+        self.stats.inc_value('instrumentation/parse/time_ms', elapsed_ms, start=0.0)
+        self.stats.max_value('instrumentation/parse/max_ms', elapsed_ms)
+        self.stats.inc_value('instrumentation/parse/items', items)
+        self.stats.max_value('instrumentation/parse/max_items_per_page', items)
+
+
+class InstrumentationDownloaderMiddleware:
+    """
+    Record download latency per response in the crawl stats
+
+    Uses the download_latency Scrapy already puts in request.meta.
+
+    Stats:
+        instrumentation/download/responses
+        instrumentation/download/latency_ms (total)
+        instrumentation/download/max_latency_ms
+        instrumentation/download/status/<code>
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def process_response(self, request, response, spider):
+        latency = request.meta.get('download_latency')
+        # Cached responses (HTTPCACHE) never hit the downloader
+        if latency is not None:
+            latency_ms = latency * 1000
+            self.stats.inc_value('instrumentation/download/responses')
+            self.stats.inc_value('instrumentation/download/latency_ms', latency_ms, start=0.0)
+            self.stats.max_value('instrumentation/download/max_latency_ms', latency_ms)
+        self.stats.inc_value(f'instrumentation/download/status/{response.status}')
+        return response
+
+
+class _ThrottleSlot:
+    """Controller state for one downloader slot"""
+
+    def __init__(self):
+        self.latency = None     # EWMA of download latency, seconds
+        self.baseline = None    # lowest EWMA seen, the unloaded latency
+        self.healthy = 0        # healthy responses since the last change
+        self.changed_at = 0.0   # time of the last concurrency/delay change
+        self.last_seen = None   # time of the last response
+        self.interval = None    # EWMA of the time between responses
+
+
+class AdaptiveThrottleMiddleware:
+    """
+    AIMD rate control per download slot (one slot per Jumia domain)
+
+    Every slot starts at its configured concurrency and delay. After a
+    window of healthy responses (one per concurrent request) the delay
+    is lowered by ADAPTIVE_THROTTLE_DELAY_STEP until it reaches
+    ADAPTIVE_THROTTLE_MIN_DELAY, then concurrency goes up by one, up to
+    ADAPTIVE_THROTTLE_MAX_CONCURRENCY. A slot listed in DOWNLOAD_SLOTS
+    never goes above its configured concurrency (so the detail and
+    image slots keep their budgets) unless the entry sets a higher
+    "max_concurrency", as JumiaSpiderSpider does for the domain slots.
+
+    A 429/503 (ADAPTIVE_THROTTLE_BACKOFF_CODES) or a download error
+    halves concurrency and doubles the delay, honouring Retry-After.
+    A slowdown (latency EWMA above ADAPTIVE_THROTTLE_TARGET_LATENCY or
+    ADAPTIVE_THROTTLE_SLOWDOWN times the unloaded latency) halves
+    concurrency only. Responses to requests sent before the last change
+    are ignored, so one overload burst backs off once.
+
+    Runs instead of the AutoThrottle extension, not with it. Keep it
+    above RetryMiddleware (550) so it sees the 429s before retries.
+    CONCURRENT_REQUESTS caps the total across slots.
+
+    Stats, per slot:
+        adaptive_throttle/<slot>/concurrency
+        adaptive_throttle/<slot>/delay_ms
+        adaptive_throttle/<slot>/latency_ms     (EWMA)
+        adaptive_throttle/<slot>/rate           (responses/s, EWMA)
+        adaptive_throttle/<slot>/max_concurrency
+    and adaptive_throttle/increase, adaptive_throttle/backoff/<reason>
+    """
+
+    def __init__(self, crawler, min_concurrency=1, max_concurrency=8,
+                 min_delay=0.0, max_delay=60.0, delay_step=0.25,
+                 target_latency=2.0, slowdown=2.0, backoff_codes=(429, 503),
+                 smoothing=0.3, debug=False):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay_step = delay_step
+        self.target_latency = target_latency
+        self.slowdown = slowdown
+        self.backoff_codes = set(backoff_codes)
+        self.smoothing = smoothing
+        self.debug = debug
+        self.slots = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('ADAPTIVE_THROTTLE_ENABLED'):
+            raise NotConfigured('ADAPTIVE_THROTTLE_ENABLED is off')
+        if settings.getbool('AUTOTHROTTLE_ENABLED'):
+            raise NotConfigured('AutoThrottle is enabled; use one or the other')
+        return cls(
+            crawler,
+            min_concurrency=settings.getint('ADAPTIVE_THROTTLE_MIN_CONCURRENCY', 1),
+            max_concurrency=settings.getint('ADAPTIVE_THROTTLE_MAX_CONCURRENCY', 8),
+            min_delay=settings.getfloat('ADAPTIVE_THROTTLE_MIN_DELAY', 0.0),
+            max_delay=settings.getfloat('ADAPTIVE_THROTTLE_MAX_DELAY', 60.0),
+            delay_step=settings.getfloat('ADAPTIVE_THROTTLE_DELAY_STEP', 0.25),
+            target_latency=settings.getfloat('ADAPTIVE_THROTTLE_TARGET_LATENCY', 2.0),
+            slowdown=settings.getfloat('ADAPTIVE_THROTTLE_SLOWDOWN', 2.0),
+            backoff_codes=[int(code) for code in settings.getlist(
+                'ADAPTIVE_THROTTLE_BACKOFF_CODES', [429, 503])],
+            debug=settings.getbool('ADAPTIVE_THROTTLE_DEBUG'),
+        )
+
+    def process_response(self, request, response, spider):
+        latency = request.meta.get('download_latency')
+        # Cached responses never hit the site
+        if latency is None:
+            return response
+        found = self._slot(request)
+        if found is None:
+            return response
+        key, slot = found
+        state = self.slots.setdefault(key, _ThrottleSlot())
+        now = time.monotonic()
+        sent_at = now - latency
+        self._observe(state, latency, now)
+
+        if response.status in self.backoff_codes:
+            if sent_at >= state.changed_at:
+                self._backoff(key, slot, state, now, f'status_{response.status}',
+                              retry_after=self._retry_after(response))
+        elif self._slow(state):
+            if sent_at >= state.changed_at:
+                self._backoff(key, slot, state, now, 'slowdown', delay=False)
+        elif response.status < 400 and sent_at >= state.changed_at:
+            state.healthy += 1
+            if state.healthy >= slot.concurrency:
+                self._increase(key, slot, state, now)
+        self._record(key, slot, state)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        found = self._slot(request)
+        if found is None:
+            return None
+        key, slot = found
+        state = self.slots.setdefault(key, _ThrottleSlot())
+        now = time.monotonic()
+        # No latency for failed downloads: back off at most once per EWMA period
+        if now - state.changed_at >= (state.latency or 1.0):
+            self._backoff(key, slot, state, now, 'error')
+            self._record(key, slot, state)
+        return None
+
+    def _slot(self, request):
+        key = request.meta.get('download_slot')
+        slot = self.crawler.engine.downloader.slots.get(key)
+        return None if slot is None else (key, slot)
+
+    def _ceiling(self, key):
+        configured = self.crawler.engine.downloader.per_slot_settings.get(key)
+        if configured is None:
+            return self.max_concurrency
+        return min(self.max_concurrency, configured.get(
+            'max_concurrency', configured.get('concurrency', self.max_concurrency)))
+
+    def _observe(self, state, latency, now):
+        if state.last_seen is not None:
+            interval = now - state.last_seen
+            if state.interval is None:
+                state.interval = interval
+            else:
+                state.interval += self.smoothing * (interval - state.interval)
+        state.last_seen = now
+        if state.latency is None:
+            state.latency = latency
+        else:
+            state.latency += self.smoothing * (latency - state.latency)
+        if state.baseline is None or state.latency < state.baseline:
+            state.baseline = state.latency
+
+    def _slow(self, state):
+        return (state.latency > self.target_latency
+                or state.latency > state.baseline * self.slowdown)
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get(b'Retry-After')
+        try:
+            return float(value) if value else None
+        except ValueError:
+            # HTTP-date form: treat as "don't know"
+            return None
+
+    def _increase(self, key, slot, state, now):
+        if slot.delay > self.min_delay:
+            slot.delay = max(self.min_delay, slot.delay - self.delay_step)
+        elif slot.concurrency < self._ceiling(key):
+            slot.concurrency += 1
+        else:
+            state.healthy = 0
+            return
+        state.healthy = 0
+        state.changed_at = now
+        self.stats.inc_value('adaptive_throttle/increase')
+        if self.debug:
+            self.crawler.spider.logger.debug(
+                f"⏫ {key}: concurrency {slot.concurrency}, delay {slot.delay:.2f}s")
+
+    def _backoff(self, key, slot, state, now, reason, retry_after=None, delay=True):
+        slot.concurrency = max(self.min_concurrency, slot.concurrency // 2)
+        if delay:
+            slot.delay = min(self.max_delay, max(slot.delay * 2, self.delay_step))
+            if retry_after is not None:
+                slot.delay = min(self.max_delay, max(slot.delay, retry_after))
+        state.healthy = 0
+        state.changed_at = now
+        # Forget the latencies measured under overload
+        state.latency = state.baseline
+        self.stats.inc_value(f'adaptive_throttle/backoff/{reason}')
+        if self.debug:
+            self.crawler.spider.logger.debug(
+                f"⏬ {key} ({reason}): concurrency {slot.concurrency}, delay {slot.delay:.2f}s")
+
+    def _record(self, key, slot, state):
+        prefix = f'adaptive_throttle/{key}'
+        self.stats.set_value(f'{prefix}/concurrency', slot.concurrency)
+        self.stats.set_value(f'{prefix}/delay_ms', round(slot.delay * 1000))
+        if state.latency is not None:
+            self.stats.set_value(f'{prefix}/latency_ms', round(state.latency * 1000, 1))
+        if state.interval:
+            self.stats.set_value(f'{prefix}/rate', round(1 / state.interval, 2))
+        self.stats.max_value(f'{prefix}/max_concurrency', slot.concurrency)
@@ -1,6 +1,30 @@
+import importlib
+import json
+import logging
+import time
+
 from itemadapter import ItemAdapter
-from scrapy.exceptions import DropItem
+from scrapy import Request, signals
+from scrapy.exceptions import DropItem, NotConfigured
+from twisted.enterprise import adbapi
+from twisted.internet import task, threads
+from twisted.internet.defer import Deferred, DeferredList, DeferredSemaphore, succeed
+from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
+
+from jumiascraper.batch import np as batch_np, process_batch
+from jumiascraper.currency import CurrencyConverter, convert_items, rate_source_from_settings
+from jumiascraper.dedup import make_deduper
+from jumiascraper.fingerprints import NEW, UNCHANGED, FingerprintStore, product_fingerprint
+from jumiascraper.imagestore import ImageStore
+from jumiascraper.instrumentation import timed_stage
+from jumiascraper.pricehistory import PriceHistory
+from jumiascraper.prices import parse_price
+from jumiascraper.search import SearchIndex, np as search_np
+
+logger = logging.getLogger(__name__)
 
+@timed_stage
 class PriceConverterPipeline:
     
     def process_item(self, item, spider):
@@ -8,49 +32,33 @@ class PriceConverterPipeline:
         
         # Check if current_price exists and is not empty
         if adapter.get('current_price'):
-            try:
-                price_str = str(adapter['current_price'])
-                
-                # Extra cleaning: remove any remaining commas, spaces, currency symbols
-                price_str = price_str.replace(',', '').replace(' ', '')
-                price_str = price_str.replace('KSh', '').replace('Ksh', '').replace('ksh', '')
-                price_str = price_str.strip()
-                
-                # Convert to float
-                adapter['current_price'] = float(price_str)
-                
+            # Strip currency symbols/separators and convert to float
+            price = parse_price(adapter['current_price'])
+            
+            if price is not None:
                 spider.logger.debug(
-                    f"✅ Converted price to float: {adapter['current_price']}"
+                    f"✅ Converted price to float: {price}"
                 )
-                
-            except (ValueError, TypeError) as e:
+            else:
                 spider.logger.warning(
-                    f"⚠️ Could not convert price '{adapter.get('current_price')}' to float: {e}"
+                    f"⚠️ Could not convert price '{adapter.get('current_price')}' to float"
                 )
-                # Set to None if conversion fails
-                adapter['current_price'] = None
+            # None if conversion fails
+            adapter['current_price'] = price
         
         # Check original_price too
         if adapter.get('original_price'):
-            try:
-                orig_price_str = str(adapter['original_price'])
-                
-                # Extra cleaning
-                orig_price_str = orig_price_str.replace(',', '').replace(' ', '')
-                orig_price_str = orig_price_str.replace('KSh', '').replace('Ksh', '').replace('ksh', '')
-                orig_price_str = orig_price_str.strip()
-                
-                # Convert to float
-                adapter['original_price'] = float(orig_price_str)
-                
-            except (ValueError, TypeError) as e:
+            orig_price = parse_price(adapter['original_price'])
+            
+            if orig_price is None:
                 spider.logger.warning(
-                    f"⚠️ Could not convert original_price '{adapter.get('original_price')}': {e}"
+                    f"⚠️ Could not convert original_price '{adapter.get('original_price')}'"
                 )
-                adapter['original_price'] = None
+            adapter['original_price'] = orig_price
         
         return item
 
+@timed_stage
 class PriceToZARPipeline:
     """
     Convert Kenyan Shillings (KSh) to South African Rand (ZAR)
@@ -95,6 +103,7 @@ class PriceToZARPipeline:
         
         return item
 
+@timed_stage
 class DropNoPricePipeline:
     """
     Drop (remove) items that don't have a price
@@ -110,20 +119,37 @@ class DropNoPricePipeline:
         else:
             # No price! Drop this item
             spider.logger.warning(
-                f"🗑️ Dropping item (no price): {adapter.get('name', 'Unknown')}"
+                f"🗑️ Dropping item (no price): {adapter.get('name') or 'Unknown'}"
             )
-            raise DropItem(f"Missing price in {adapter.get('name', 'item')}")
+            raise DropItem(f"Missing price in {adapter.get('name') or 'item'}")
 
+@timed_stage
 class DuplicatesPipeline:
     """
-    Remove duplicate products
+    Remove duplicate products (same product_id)
+
+    Product ids are kept in a set, or as fixed-size digests
+    (DEDUP_MODE = 'exact') or in a Bloom filter ('bloom') so memory
+    stays bounded on big crawls.
     """
     
-    def __init__(self):
+    def __init__(self, mode='set', capacity=1_000_000, error_rate=0.001,
+                 frontier_url=None, frontier_key='jumia'):
         """
         Initialize the pipeline
         """
-        self.names_seen = set()
+        self.seen = make_deduper(mode, capacity, error_rate, frontier_url, frontier_key)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            mode=settings.get('DEDUP_MODE', 'set'),
+            capacity=settings.getint('DEDUP_CAPACITY', 1_000_000),
+            error_rate=settings.getfloat('DEDUP_ERROR_RATE', 0.001),
+            frontier_url=settings.get('FRONTIER_URL'),
+            frontier_key=settings.get('FRONTIER_KEY', 'jumia'),
+        )
     
     def process_item(self, item, spider):
         """
@@ -131,34 +157,27 @@ class DuplicatesPipeline:
         """
         adapter = ItemAdapter(item)
         
-        # Get the product name
-        product_name = adapter.get('name')
+        product_id = adapter.get('product_id')
         
-        # IMPORTANT: Skip items without names (don't drop them here)
-        if not product_name:
+        # IMPORTANT: Skip items without ids (don't drop them here)
+        if not product_id:
             spider.logger.warning(
-                f"⚠️ Item has no name, skipping duplicate check"
+                f"⚠️ Item has no product_id, skipping duplicate check"
             )
             return item  # Let it continue to next pipeline
         
-        # Check if we've seen this name before
-        if product_name in self.names_seen:
+        # add() tells us whether the id was already there
+        if self.seen.add(product_id):
             # DUPLICATE! Drop it
             spider.logger.warning(
-                f"🔄 Duplicate found (dropping): {product_name}"
-            )
-            raise DropItem(f"Duplicate item: {product_name}")
-        else:
-            # NEW PRODUCT! Add to our "seen" list and continue
-            self.names_seen.add(product_name)
-            spider.logger.debug(
-                f"✅ New unique product: {product_name}"
+                f"🔄 Duplicate found (dropping): {adapter.get('name') or product_id}"
             )
-            return item
-
-
+            raise DropItem(f"Duplicate item: {product_id}")
+        
+        return item
 
 
+@timed_stage
 class CalculateSavingsPipeline:
     """
     Calculate how much money you save with the discount
@@ -182,7 +201,8 @@ class CalculateSavingsPipeline:
                     adapter['savings_percent'] = f"{savings_percent}%"
                 
                 spider.logger.debug(
-                    f"💰 Calculated savings: {savings} ZAR ({adapter.get('savings_percent')})"
+                    f"💰 Calculated savings: {savings} {adapter.get('currency') or ''} "
+                    f"({adapter.get('savings_percent')})"
                 )
             except (TypeError, ValueError) as e:
                 spider.logger.warning(f"Could not calculate savings: {e}")
@@ -190,6 +210,7 @@ class CalculateSavingsPipeline:
         return item
 
 
+@timed_stage
 class ValidateItemPipeline:
     """
     Validate that items have all required fields
@@ -216,7 +237,829 @@ class ValidateItemPipeline:
                 f"❌ Item missing required fields: {missing_fields}"
             )
             raise DropItem(
-                f"Missing required fields {missing_fields} in {adapter.get('name', 'unknown item')}"
+                f"Missing required fields {missing_fields} in {adapter.get('name') or 'unknown item'}"
             )
         
-        return item
\ No newline at end of file
+        return item
+
+@timed_stage
+class NormalizePipeline:
+    """
+    Fused replacement for the six-stage chain above.
+
+    Parses prices once, converts currency, calculates savings,
+    drops items without a price, removes duplicates and validates
+    required fields - all with a single ItemAdapter per item.
+
+    Each stage can be switched off with the NORMALIZE_RULES setting:
+
+        NORMALIZE_RULES = {'convert_currency': False}
+    """
+
+    default_rules = {
+        'parse_prices': True,
+        'convert_currency': True,
+        'calculate_savings': True,
+        'drop_no_price': True,
+        'dedup': True,
+        'validate': True,
+    }
+    exchange_rate = PriceToZARPipeline.ksh_to_zar_rate
+    target_currency = 'ZAR'
+    required_fields = ValidateItemPipeline.required_fields
+
+    def __init__(self, rules=None, exchange_rate=None, target_currency=None,
+                 required_fields=None, dedup_mode='set', dedup_capacity=1_000_000,
+                 dedup_error_rate=0.001, frontier_url=None, frontier_key='jumia'):
+        self.rules = dict(self.default_rules)
+        self.rules.update(rules or {})
+        if exchange_rate is not None:
+            self.exchange_rate = exchange_rate
+        if target_currency is not None:
+            self.target_currency = target_currency
+        if required_fields is not None:
+            self.required_fields = list(required_fields)
+        self.seen = make_deduper(
+            dedup_mode, dedup_capacity, dedup_error_rate, frontier_url, frontier_key
+        )
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            rules=settings.getdict('NORMALIZE_RULES'),
+            exchange_rate=settings.getfloat('NORMALIZE_EXCHANGE_RATE', cls.exchange_rate),
+            target_currency=settings.get('NORMALIZE_TARGET_CURRENCY', cls.target_currency),
+            required_fields=settings.getlist('NORMALIZE_REQUIRED_FIELDS') or None,
+            dedup_mode=settings.get('DEDUP_MODE', 'set'),
+            dedup_capacity=settings.getint('DEDUP_CAPACITY', 1_000_000),
+            dedup_error_rate=settings.getfloat('DEDUP_ERROR_RATE', 0.001),
+            frontier_url=settings.get('FRONTIER_URL'),
+            frontier_key=settings.get('FRONTIER_KEY', 'jumia'),
+        )
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        rules = self.rules
+
+        current = adapter.get('current_price')
+        original = adapter.get('original_price')
+
+        # 1. Parse prices (PriceConverterPipeline)
+        if rules['parse_prices']:
+            if current:
+                current = parse_price(current)
+                if current is None:
+                    spider.logger.warning(
+                        "Could not convert price %r to float", adapter.get('current_price'))
+                adapter['current_price'] = current
+            if original:
+                original = parse_price(original)
+                if original is None:
+                    spider.logger.warning(
+                        "Could not convert original_price %r", adapter.get('original_price'))
+                adapter['original_price'] = original
+
+        # 2. Convert currency (PriceToZARPipeline)
+        if rules['convert_currency']:
+            try:
+                if current:
+                    current = adapter['current_price'] = round(current * self.exchange_rate, 2)
+                if original:
+                    original = adapter['original_price'] = round(original * self.exchange_rate, 2)
+            except (TypeError, ValueError) as e:
+                spider.logger.warning("Could not convert currency: %s", e)
+            adapter['currency'] = self.target_currency
+
+        # 3. Calculate savings (CalculateSavingsPipeline)
+        if rules['calculate_savings'] and current and original:
+            try:
+                savings = round(original - current, 2)
+                adapter['savings_amount'] = savings
+                if original > 0:
+                    adapter['savings_percent'] = f"{round((savings / original) * 100, 1)}%"
+            except (TypeError, ValueError) as e:
+                spider.logger.warning("Could not calculate savings: %s", e)
+
+        name = adapter.get('name')
+
+        # 4. Drop items without a price (DropNoPricePipeline)
+        if rules['drop_no_price'] and not current:
+            spider.logger.warning("🗑️ Dropping item (no price): %s", name or 'Unknown')
+            raise DropItem(f"Missing price in {name or 'item'}")
+
+        # 5. Remove duplicates (DuplicatesPipeline)
+        if rules['dedup']:
+            product_id = adapter.get('product_id')
+            if product_id and self.seen.add(product_id):
+                spider.logger.warning("🔄 Duplicate found (dropping): %s", name or product_id)
+                raise DropItem(f"Duplicate item: {product_id}")
+
+        # 6. Validate required fields (ValidateItemPipeline)
+        if rules['validate']:
+            missing_fields = [f for f in self.required_fields if not adapter.get(f)]
+            if missing_fields:
+                spider.logger.error("❌ Item missing required fields: %s", missing_fields)
+                raise DropItem(
+                    f"Missing required fields {missing_fields} in {name or 'unknown item'}"
+                )
+
+        return item
+
+
+@timed_stage
+class IncrementalPipeline:
+    """
+    Only let new or changed products through
+
+    Every product's fingerprint (name, prices, discount) is kept in an
+    on-disk FingerprintStore keyed by product_id. Unchanged products
+    are dropped quietly. A new or changed fingerprint is only stored
+    once the item is scraped, so an item dropped by a later stage comes
+    through again next run. When the crawl finishes normally, products
+    that weren't seen are written to a JSON lines tombstone file.
+
+    With RECRAWL_ENABLED, listing pages that aren't due are skipped and
+    their products go unseen; tombstones are not collected for runs
+    that skipped any page (recrawl/skipped), since the missing
+    products weren't deleted, just not looked at.
+
+    Settings:
+        INCREMENTAL_ENABLED     - turn the pipeline on (off by default)
+        INCREMENTAL_STORE       - path of the SQLite store
+        INCREMENTAL_TOMBSTONES  - path of the tombstone file
+    """
+
+    def __init__(self, store_path, tombstones_path, stats=None):
+        self.store_path = store_path
+        self.tombstones_path = tombstones_path
+        self.stats = stats
+        self.store = None
+        # product_id -> fingerprint of items still on their way to the exporter
+        self.pending = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('INCREMENTAL_ENABLED'):
+            raise NotConfigured('INCREMENTAL_ENABLED is off')
+        pipeline = cls(
+            store_path=settings.get('INCREMENTAL_STORE', 'incremental.sqlite'),
+            tombstones_path=settings.get('INCREMENTAL_TOMBSTONES', 'tombstones.jsonl'),
+            stats=crawler.stats,
+        )
+        crawler.signals.connect(pipeline.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(pipeline.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def open_spider(self, spider):
+        self.store = FingerprintStore(self.store_path)
+        run_id = self.store.open_run()
+        spider.logger.info(f"Incremental run {run_id} using {self.store_path}")
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        product_id = adapter.get('product_id')
+        if not product_id:
+            return item
+
+        fingerprint = product_fingerprint(item)
+        status = self.store.check(product_id, fingerprint)
+        if self.stats is not None:
+            self.stats.inc_value(f'incremental/{status}')
+        if status != NEW:
+            # Seen this run, so it's no tombstone even if a later stage drops it
+            self.store.touch(product_id)
+        if status == UNCHANGED:
+            raise DropItem(f"Unchanged since last run: {product_id}", log_level='DEBUG')
+        self.pending[product_id] = fingerprint
+        return item
+
+    def item_scraped(self, item, response, spider):
+        product_id = ItemAdapter(item).get('product_id')
+        fingerprint = self.pending.pop(product_id, None)
+        if fingerprint is not None:
+            self.store.record(product_id, fingerprint)
+
+    def item_dropped(self, item, response, exception, spider):
+        self.pending.pop(ItemAdapter(item).get('product_id'), None)
+
+    def spider_closed(self, spider, reason):
+        # Tombstones only make sense when the whole catalogue was crawled
+        complete = reason == 'finished'
+        if complete and self.stats is not None and self.stats.get_value('recrawl/skipped'):
+            spider.logger.info("Listing pages were skipped by the recrawl schedule, no tombstones this run")
+            complete = False
+        vanished = self.store.close_run(collect_vanished=complete)
+        if vanished:
+            removed_at = time.time()
+            with open(self.tombstones_path, 'a', encoding='utf-8') as f:
+                for product_id in vanished:
+                    f.write(json.dumps({'product_id': product_id, 'removed_at': removed_at}) + '\n')
+            spider.logger.info(f"{len(vanished)} products vanished, see {self.tombstones_path}")
+        if self.stats is not None:
+            self.stats.set_value('incremental/vanished', len(vanished))
+        self.pending.clear()
+        self.store.close()
+
+
+@timed_stage
+class DatabaseSinkPipeline:
+    """
+    Write items to a database in batches, upserting on product_id
+
+    Uses Twisted's adbapi connection pool, so the writes run in pool
+    threads and never block the reactor. Any DB-API module with a
+    qmark/format/pyformat paramstyle works (sqlite3, psycopg2, ...).
+
+    When DB_SINK_MAX_PENDING batches are already in flight, items are
+    held back until the oldest batch is written. That backpressure
+    slows the crawl down to what the database can take.
+
+    Settings:
+        DB_SINK_ENABLED      - turn the pipeline on (off by default)
+        DB_SINK_DRIVER       - DB-API module name (default 'sqlite3')
+        DB_SINK_ARGS         - positional connect() args (default ['products.sqlite'])
+        DB_SINK_KWARGS       - keyword connect() args
+        DB_SINK_TABLE        - table name (default 'products')
+        DB_SINK_BATCH_SIZE   - items per batch (default 500)
+        DB_SINK_MAX_PENDING  - batches in flight before backpressure (default 4)
+    """
+
+    # Column -> SQL type; understood by both SQLite and PostgreSQL
+    columns = {
+        'product_id': 'TEXT PRIMARY KEY',
+        'name': 'TEXT',
+        'brand': 'TEXT',
+        'current_price': 'DOUBLE PRECISION',
+        'original_price': 'DOUBLE PRECISION',
+        'currency': 'TEXT',
+        'discount': 'TEXT',
+        'savings_amount': 'DOUBLE PRECISION',
+        'savings_percent': 'TEXT',
+        'url': 'TEXT',
+        'full_url': 'TEXT',
+        'image': 'TEXT',
+        'rating': 'DOUBLE PRECISION',
+        'reviews_count': 'INTEGER',
+        'in_stock': 'BOOLEAN',
+        'seller': 'TEXT',
+        'scraped_at': 'DOUBLE PRECISION',
+    }
+    placeholders = {'qmark': '?', 'format': '%s', 'pyformat': '%s'}
+
+    def __init__(self, driver='sqlite3', connect_args=(), connect_kwargs=None,
+                 table='products', batch_size=500, max_pending=4, stats=None):
+        self.driver = driver
+        self.connect_args = tuple(connect_args)
+        self.connect_kwargs = dict(connect_kwargs or {})
+        self.table = table
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.stats = stats
+
+        self.buffer = []
+        self.pending = []
+        self.waiters = []
+        self.pool = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('DB_SINK_ENABLED'):
+            raise NotConfigured('DB_SINK_ENABLED is off')
+        return cls(
+            driver=settings.get('DB_SINK_DRIVER', 'sqlite3'),
+            connect_args=settings.getlist('DB_SINK_ARGS', ['products.sqlite']),
+            connect_kwargs=settings.getdict('DB_SINK_KWARGS'),
+            table=settings.get('DB_SINK_TABLE', 'products'),
+            batch_size=settings.getint('DB_SINK_BATCH_SIZE', 500),
+            max_pending=settings.getint('DB_SINK_MAX_PENDING', 4),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        paramstyle = importlib.import_module(self.driver).paramstyle
+        if paramstyle not in self.placeholders:
+            raise NotConfigured(f"Unsupported DB-API paramstyle {paramstyle!r} of {self.driver}")
+        mark = self.placeholders[paramstyle]
+
+        names = list(self.columns)
+        updates = ', '.join(f'{name} = excluded.{name}' for name in names if name != 'product_id')
+        self.upsert_sql = (
+            f"INSERT INTO {self.table} ({', '.join(names)}) "
+            f"VALUES ({', '.join([mark] * len(names))}) "
+            f"ON CONFLICT (product_id) DO UPDATE SET {updates}"
+        )
+        self.create_sql = (
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            + ', '.join(f'{name} {sql_type}' for name, sql_type in self.columns.items())
+            + ')'
+        )
+
+        kwargs = dict(self.connect_kwargs)
+        if self.driver == 'sqlite3':
+            # One writer thread; sqlite connections are used from that thread only
+            kwargs.setdefault('check_same_thread', False)
+            kwargs.setdefault('cp_max', 1)
+        self.pool = adbapi.ConnectionPool(self.driver, *self.connect_args, **kwargs)
+        return self.pool.runOperation(self.create_sql)
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        now = time.time()
+        self.buffer.append(tuple(
+            now if name == 'scraped_at' else adapter.get(name) for name in self.columns
+        ))
+        if len(self.buffer) >= self.batch_size:
+            self._flush(spider)
+
+        if len(self.pending) >= self.max_pending:
+            # The writer is behind: hold this item until a batch lands
+            waiter = Deferred()
+            self.waiters.append((waiter, item))
+            if self.stats is not None:
+                self.stats.inc_value('db_sink/backpressure_waits')
+            return waiter
+        return item
+
+    def close_spider(self, spider):
+        self._flush(spider)
+        d = DeferredList(list(self.pending))
+        d.addBoth(lambda _: self.pool.close())
+        return d
+
+    def _flush(self, spider):
+        if not self.buffer:
+            return
+        rows, self.buffer = self.buffer, []
+        d = self.pool.runInteraction(self._write_batch, rows)
+        self.pending.append(d)
+        d.addCallbacks(self._batch_written, self._batch_failed,
+                       callbackArgs=(len(rows),), errbackArgs=(len(rows), spider))
+        d.addBoth(self._batch_done, d)
+
+    def _write_batch(self, cursor, rows):
+        # Runs in a pool thread; runInteraction commits on success
+        cursor.executemany(self.upsert_sql, rows)
+
+    def _batch_written(self, _, count):
+        if self.stats is not None:
+            self.stats.inc_value('db_sink/items_written', count)
+
+    def _batch_failed(self, failure, count, spider):
+        spider.logger.error(f"DB sink failed to write {count} items: {failure.value}")
+        if self.stats is not None:
+            self.stats.inc_value('db_sink/items_failed', count)
+
+    def _batch_done(self, _, d):
+        self.pending.remove(d)
+        # Release held items while there's room again
+        while self.waiters and len(self.pending) < self.max_pending:
+            waiter, item = self.waiters.pop(0)
+            waiter.callback(item)
+
+
+@timed_stage
+class PriceHistoryPipeline:
+    """
+    Append price changes to the on-disk PriceHistory store
+
+    Only changes are written (see pricehistory.py); the items pass
+    through untouched.
+
+    Settings:
+        PRICE_HISTORY_ENABLED      - turn the pipeline on (off by default)
+        PRICE_HISTORY_DIR          - store directory (default 'price_history')
+        PRICE_HISTORY_FLUSH_EVERY  - write to disk every N changes (default 10000)
+    """
+
+    def __init__(self, path, stats=None, flush_every=10000):
+        self.path = path
+        self.stats = stats
+        self.flush_every = flush_every
+        self.store = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('PRICE_HISTORY_ENABLED'):
+            raise NotConfigured('PRICE_HISTORY_ENABLED is off')
+        return cls(
+            settings.get('PRICE_HISTORY_DIR', 'price_history'),
+            stats=crawler.stats,
+            flush_every=settings.getint('PRICE_HISTORY_FLUSH_EVERY', 10000),
+        )
+
+    def open_spider(self, spider):
+        self.store = PriceHistory(self.path, flush_every=self.flush_every)
+        self.now = int(time.time())
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        product_id = adapter.get('product_id')
+        price = adapter.get('current_price')
+        if product_id and isinstance(price, (int, float)):
+            # One timestamp per crawl keeps the ts deltas at zero
+            if self.store.record(product_id, price, ts=self.now) and self.stats is not None:
+                self.stats.inc_value('price_history/changes')
+        return item
+
+    def close_spider(self, spider):
+        self.store.close()
+
+
+@timed_stage
+class CurrencyConversionPipeline:
+    """
+    Convert prices into several currencies, keeping the source price
+
+    current_price/original_price stay in the storefront currency
+    (currency field). Conversions go to converted_prices and
+    converted_original_prices as {currency: amount}, and to price_zar
+    when ZAR is a target. Rates come from currency.py and are
+    refreshed every CURRENCY_RATES_TTL seconds in a worker thread.
+
+    With BATCH_ENABLED the conversion moves to BatchPostProcessPipeline,
+    which converts each batch per source currency in one step
+    (currency.convert_items); this pipeline then switches itself off.
+    An item whose currency has no rate passes through unconverted, with
+    one warning per currency.
+
+    Settings:
+        CURRENCY_TARGETS     - e.g. ['ZAR', 'USD'] (pipeline is off when empty)
+        CURRENCY_RATES_FILE  - local rate JSON (default 'rates.json'; relative
+                               paths fall back to the project directory)
+        CURRENCY_RATES_URL   - or an HTTP endpoint serving it
+        CURRENCY_RATES_TTL   - seconds between refreshes (default 3600)
+        CURRENCY_SOURCE      - currency when the item/URL doesn't say (default 'KES')
+    """
+
+    def __init__(self, source, targets, ttl=3600, default_currency='KES'):
+        self.targets = list(targets)
+        self.ttl = ttl
+        self.default_currency = default_currency
+        self.converter = CurrencyConverter(source, ttl=ttl)
+        self.refresh_task = None
+        self.missing = set()
+
+    @classmethod
+    def from_crawler(cls, crawler, in_batches=False):
+        settings = crawler.settings
+        targets = settings.getlist('CURRENCY_TARGETS')
+        if not targets:
+            raise NotConfigured('CURRENCY_TARGETS is empty')
+        if settings.getbool('BATCH_ENABLED') and not in_batches:
+            raise NotConfigured('BATCH_ENABLED: BatchPostProcessPipeline converts currencies')
+        source = rate_source_from_settings(settings)
+        try:
+            return cls(
+                source,
+                targets,
+                ttl=settings.getfloat('CURRENCY_RATES_TTL', 3600),
+                default_currency=settings.get('CURRENCY_SOURCE', 'KES'),
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Could not load exchange rates, currency conversion is off: {e}")
+            raise NotConfigured(f'no exchange rates: {e}')
+
+    def open_spider(self, spider):
+        # Reload rates in a thread so a slow rate service never blocks the
+        # crawl. force: the loop already runs once per TTL
+        self.refresh_task = task.LoopingCall(threads.deferToThread, self.converter.refresh, True)
+        self.refresh_task.start(self.ttl, now=False)
+
+    def close_spider(self, spider):
+        if self.refresh_task is not None and self.refresh_task.running:
+            self.refresh_task.stop()
+
+    def process_item(self, item, spider):
+        self.convert_batch([item], spider)
+        return item
+
+    def convert_batch(self, items, spider):
+        missing = convert_items(
+            [ItemAdapter(item) for item in items],
+            self.converter.table, self.targets, self.default_currency,
+        )
+        for currency in sorted(missing - self.missing):
+            spider.logger.warning(f"⚠️ Could not convert currency: no exchange rate for {currency}")
+        self.missing |= missing
+
+
+@timed_stage
+class BatchPostProcessPipeline:
+    """
+    Savings, drop-no-price and validation on batches of items (batch.py)
+
+    Items are held until BATCH_SIZE of them are buffered (or
+    BATCH_FLUSH_INTERVAL seconds pass), processed with NumPy in one go
+    and released in the order they arrived. Replaces the
+    calculate_savings, drop_no_price and validate rules of
+    NormalizePipeline, so switch those off when enabling it. When
+    CURRENCY_TARGETS is set the kept items of each batch are also
+    converted here, one step per source currency, instead of item by
+    item in CurrencyConversionPipeline.
+
+    The batch work is about 5x faster than the per-item stages
+    (benchmarks/bench_batch.py), but every item waits up to
+    BATCH_FLUSH_INTERVAL for its batch; worth it for bulk
+    re-processing and very fast crawls, not for a polite live crawl.
+
+    Settings:
+        BATCH_ENABLED         - turn the pipeline on (off by default)
+        BATCH_SIZE            - items per batch (default 1000)
+        BATCH_FLUSH_INTERVAL  - max seconds an item waits (default 1.0)
+    """
+
+    required_fields = ValidateItemPipeline.required_fields
+
+    def __init__(self, batch_size=1000, flush_interval=1.0, clock=None, currency=None):
+        if batch_np is None:
+            raise NotConfigured('BatchPostProcessPipeline needs numpy: pip install numpy')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.currency = currency
+        self.buffer = []
+        self.timer = None
+        self.spider = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('BATCH_ENABLED'):
+            raise NotConfigured('BATCH_ENABLED is off')
+        try:
+            currency = CurrencyConversionPipeline.from_crawler(crawler, in_batches=True)
+        except NotConfigured:
+            currency = None
+        return cls(
+            batch_size=settings.getint('BATCH_SIZE', 1000),
+            flush_interval=settings.getfloat('BATCH_FLUSH_INTERVAL', 1.0),
+            currency=currency,
+        )
+
+    def open_spider(self, spider):
+        self.spider = spider
+        if self.clock is None:
+            from twisted.internet import reactor
+            self.clock = reactor
+        if self.currency is not None:
+            self.currency.open_spider(spider)
+
+    def process_item(self, item, spider):
+        d = Deferred()
+        self.buffer.append((item, d))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        elif self.timer is None:
+            # Don't hold a half-full batch forever
+            self.timer = self.clock.callLater(self.flush_interval, self.flush)
+        return d
+
+    def close_spider(self, spider):
+        self.flush()
+        if self.currency is not None:
+            self.currency.close_spider(spider)
+
+    def flush(self):
+        if self.timer is not None:
+            if self.timer.active():
+                self.timer.cancel()
+            self.timer = None
+        if not self.buffer:
+            return
+
+        pending, self.buffer = self.buffer, []
+        items = [item for item, _ in pending]
+        reasons = process_batch(items, self.required_fields)
+        if self.currency is not None:
+            self.currency.convert_batch(
+                [item for item, reason in zip(items, reasons) if reason is None], self.spider)
+        for (item, d), reason in zip(pending, reasons):
+            if reason is None:
+                d.callback(item)
+            else:
+                d.errback(DropItem(reason))
+
+
+@timed_stage
+class ProductImagePipeline:
+    """
+    Download product images into a content-addressed ImageStore
+
+    Images go through the crawler's own downloader (its pooled,
+    persistent connections and middlewares) in a download slot of their
+    own, at most PRODUCT_IMAGES_CONCURRENCY at a time. Hashing,
+    decoding and thumbnails run in a separate worker thread pool, never
+    on the reactor thread. The stored path, relative to
+    PRODUCT_IMAGES_DIR, goes to image_path.
+
+    An image isn't requested again while its URL's ?NNNN cache-buster
+    is unchanged, and isn't written again when the same bytes (or, for a
+    new cache-buster, a visually identical picture) are already stored;
+    see imagestore.py. Items whose image fails to download pass through
+    without image_path.
+
+    Settings:
+        PRODUCT_IMAGES_ENABLED       - turn the pipeline on (off by default)
+        PRODUCT_IMAGES_DIR           - store directory (default 'images')
+        PRODUCT_IMAGES_CONCURRENCY   - concurrent image downloads (default 4)
+        PRODUCT_IMAGES_DELAY         - delay of the image download slot (default 0)
+        PRODUCT_IMAGES_WORKERS       - hashing/thumbnail threads (default 2)
+        PRODUCT_IMAGES_THUMBS        - {name: [width, height]} (default {'small': [100, 100]})
+        PRODUCT_IMAGES_MAX_DISTANCE  - perceptual hash bits that may differ (default 4)
+    """
+
+    slot = 'jumia-images'
+
+    def __init__(self, crawler, root, concurrency=4, workers=2, thumbs=None, max_distance=4):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.root = root
+        self.thumbs = thumbs
+        self.max_distance = max_distance
+        self.workers = workers
+        self.semaphore = DeferredSemaphore(concurrency)
+        self.store = None
+        self.threadpool = None
+        # (kind, key) -> Deferreds waiting for the same download or write
+        self.in_flight = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('PRODUCT_IMAGES_ENABLED'):
+            raise NotConfigured('PRODUCT_IMAGES_ENABLED is off')
+        return cls(
+            crawler,
+            settings.get('PRODUCT_IMAGES_DIR', 'images'),
+            concurrency=settings.getint('PRODUCT_IMAGES_CONCURRENCY', 4),
+            workers=settings.getint('PRODUCT_IMAGES_WORKERS', 2),
+            thumbs=settings.getdict('PRODUCT_IMAGES_THUMBS', {'small': [100, 100]}),
+            max_distance=settings.getint('PRODUCT_IMAGES_MAX_DISTANCE', 4),
+        )
+
+    def open_spider(self, spider):
+        from twisted.internet import reactor
+        self.reactor = reactor
+        self.store = ImageStore(self.root, thumbs=self.thumbs, max_distance=self.max_distance)
+        self.threadpool = ThreadPool(minthreads=1, maxthreads=self.workers, name='images')
+        self.threadpool.start()
+
+    def close_spider(self, spider):
+        self.threadpool.stop()
+        self.store.close()
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        url = adapter.get('image')
+        if not url:
+            return item
+        path = self.store.lookup(url)
+        if path is not None:
+            self.stats.inc_value('images/cached')
+            adapter['image_path'] = path
+            return item
+
+        # Listed twice (or shared by several products): downloaded once
+        d = self._once(('url', url), lambda: self._fetch(url))
+        d.addCallbacks(self._stored, self._failed,
+                       callbackArgs=(adapter,), errbackArgs=(url, spider))
+        d.addCallback(lambda _: item)
+        return d
+
+    def _once(self, key, start):
+        waiter = Deferred()
+        if key in self.in_flight:
+            self.in_flight[key].append(waiter)
+        else:
+            self.in_flight[key] = [waiter]
+            start().addBoth(self._notify, key)
+        return waiter
+
+    def _notify(self, result, key):
+        for waiter in self.in_flight.pop(key):
+            if isinstance(result, Failure):
+                waiter.errback(result)
+            else:
+                waiter.callback(result)
+
+    def _in_thread(self, f, *args):
+        return threads.deferToThreadPool(self.reactor, self.threadpool, f, *args)
+
+    def _fetch(self, url):
+        d = self.semaphore.run(
+            self.crawler.engine.download, Request(url, meta={'download_slot': self.slot})
+        )
+        d.addCallback(self._downloaded, url)
+        return d
+
+    def _downloaded(self, response, url):
+        if response.status != 200:
+            raise ValueError(f'HTTP {response.status}')
+        self.stats.inc_value('images/downloaded')
+        self.stats.inc_value('images/downloaded_bytes', len(response.body))
+        d = self._in_thread(self.store.analyse, response.body)
+        d.addCallback(self._place, url, response.body)
+        return d
+
+    def _place(self, analysis, url, body):
+        sha, phash, image = analysis
+        existing = self.store.match(url, sha, phash)
+        if existing is None:
+            path = self.store.reserve(sha, image)
+            d = self._once(('blob', sha), lambda: self._write(sha, path, body, image, phash))
+        else:
+            self.stats.inc_value('images/duplicates' if existing == sha else 'images/near_duplicates')
+            sha = existing
+            d = succeed(None)
+            if ('blob', sha) in self.in_flight:
+                # Still being written for another URL: wait for the file
+                d = Deferred()
+                self.in_flight[('blob', sha)].append(d)
+        d.addCallback(lambda _: self.store.link(url, sha, phash))
+        return d
+
+    def _write(self, sha, path, body, image, phash):
+        d = self._in_thread(self.store.write, sha, path, body, image)
+
+        def written(thumbs):
+            self.store.add(sha, phash)
+            self.stats.inc_value('images/stored')
+            self.stats.inc_value('images/thumbnails', thumbs)
+
+        def not_written(failure):
+            # Don't let later images match a file that isn't there
+            self.store.paths.pop(sha, None)
+            return failure
+        return d.addCallbacks(written, not_written)
+
+    def _stored(self, path, adapter):
+        adapter['image_path'] = path
+
+    def _failed(self, failure, url, spider):
+        self.stats.inc_value('images/failed')
+        spider.logger.warning(f"⚠️ Image not stored: {url} ({failure.value!r})")
+
+
+@timed_stage
+class SearchIndexPipeline:
+    """
+    Add scraped products to the on-disk SearchIndex (search.py)
+
+    Only products that changed since they were last indexed are
+    written. They become searchable at every SEARCH_INDEX_COMMIT_EVERY
+    products and when the spider closes:
+
+        python -m jumiascraper.search search_index samsung under 20,000 with 128gb
+
+    Settings:
+        SEARCH_INDEX_ENABLED       - turn the pipeline on (off by default)
+        SEARCH_INDEX_DIR           - index directory (default 'search_index')
+        SEARCH_INDEX_COMMIT_EVERY  - products per commit (default 100000)
+    """
+
+    def __init__(self, path, commit_every=100000, stats=None):
+        if search_np is None:
+            raise NotConfigured('SearchIndexPipeline needs numpy: pip install numpy')
+        self.path = path
+        self.commit_every = commit_every
+        self.stats = stats
+        self.index = None
+        self.queued = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('SEARCH_INDEX_ENABLED'):
+            raise NotConfigured('SEARCH_INDEX_ENABLED is off')
+        return cls(
+            settings.get('SEARCH_INDEX_DIR', 'search_index'),
+            commit_every=settings.getint('SEARCH_INDEX_COMMIT_EVERY', 100000),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        self.index = SearchIndex(self.path)
+
+    def process_item(self, item, spider):
+        if self.index.add(item):
+            self.queued += 1
+            if self.queued >= self.commit_every:
+                self._commit()
+        elif self.stats is not None:
+            self.stats.inc_value('search_index/unchanged')
+        return item
+
+    def close_spider(self, spider):
+        self._commit()
+        spider.logger.info(f"Search index: {len(self.index)} products in {self.path}")
+
+    def _commit(self):
+        written = self.index.commit()
+        self.queued = 0
+        if self.stats is not None:
+            self.stats.inc_value('search_index/indexed', written)
@@ -0,0 +1,261 @@
+"""
+Append-only price history store
+
+One directory holds:
+
+    products.txt    product ids, line number = product index
+    log.product     array('I')  product index of each change record
+    log.ts          array('q')  seconds since the previous record (delta)
+    log.price       array('q')  price in cents minus the product's previous price (delta)
+    summary.*       per-product last/previous/min/max price, last change
+                    time and change count, rewritten on every flush
+    meta.json       base timestamp and record count
+
+New records are flushed to disk every flush_every changes and on
+close(), so a crash loses at most that many. A log left longer than
+meta.json says (crash in the middle of a flush) is replayed into the
+summary on the next open.
+
+Records are only appended when a product's price actually changes, so
+the log grows with price activity, not with crawl frequency. Queries
+(min/max/last change, recent drops) read the summary columns and never
+scan the log; only history() walks it.
+
+    store = PriceHistory('price_history')
+    store.record('XI996MP5R1YBONAFAMZ', 7699.0)
+    store.stats('XI996MP5R1YBONAFAMZ')
+    store.close()
+
+Command line:
+
+    python -m jumiascraper.pricehistory price_history XI996MP5R1YBONAFAMZ
+    python -m jumiascraper.pricehistory price_history --drops 10
+"""
+
+import argparse
+import json
+import os
+import time
+from array import array
+from pathlib import Path
+
+LOG_COLUMNS = {'product': 'I', 'ts': 'q', 'price': 'q'}
+SUMMARY_COLUMNS = {
+    'last': 'q', 'previous': 'q', 'min': 'q', 'max': 'q',
+    'last_change': 'q', 'changes': 'I',
+}
+
+
+def _cents(price):
+    return int(round(price * 100))
+
+
+class PriceHistory:
+
+    def __init__(self, path, flush_every=10000):
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        meta_path = self.path / 'meta.json'
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        self.base_ts = meta.get('base_ts')
+        self.last_ts = meta.get('last_ts', self.base_ts)
+
+        products_path = self.path / 'products.txt'
+        self.product_ids = products_path.read_text(encoding='utf-8').split('\n')[:-1] \
+            if products_path.exists() else []
+        self.index = {product_id: i for i, product_id in enumerate(self.product_ids)}
+
+        self.log = {name: self._load(f'log.{name}', code) for name, code in LOG_COLUMNS.items()}
+        records = min(len(column) for column in self.log.values())
+        for name, column in self.log.items():
+            path = self.path / f'log.{name}'
+            if path.exists() and path.stat().st_size > records * column.itemsize:
+                # Half-written record from an interrupted flush
+                del column[records:]
+                os.truncate(path, records * column.itemsize)
+        self.summary = {name: self._load(f'summary.{name}', code) for name, code in SUMMARY_COLUMNS.items()}
+        if meta.get('records') != len(self.log['product']) or any(
+            len(column) != len(self.product_ids) for column in self.summary.values()
+        ):
+            # Crashed before close(): rebuild the summary from the log
+            self._rebuild_summary()
+
+        # Appended since the last flush
+        self._new_products = []
+        self._new_records = 0
+
+    def _load(self, name, code):
+        column = array(code)
+        path = self.path / name
+        if path.exists():
+            data = path.read_bytes()
+            column.frombytes(data[:len(data) - len(data) % column.itemsize])
+        return column
+
+    def _rebuild_summary(self):
+        self.summary = {name: array(code, [0]) * len(self.product_ids)
+                        for name, code in SUMMARY_COLUMNS.items()}
+        summary = self.summary
+        ts = self.base_ts or 0
+        for product, ts_delta, price_delta in zip(*self.log.values()):
+            ts += ts_delta
+            price = summary['last'][product] + price_delta
+            if summary['changes'][product] == 0:
+                summary['min'][product] = summary['max'][product] = price
+            summary['previous'][product] = summary['last'][product]
+            summary['last'][product] = price
+            summary['min'][product] = min(summary['min'][product], price)
+            summary['max'][product] = max(summary['max'][product], price)
+            summary['last_change'][product] = ts
+            summary['changes'][product] += 1
+
+    def record(self, product_id, price, ts=None):
+        """
+        Record a price observation; returns True if it was a change
+        (and so got appended), False otherwise
+        """
+        if price is None:
+            return False
+        ts = int(ts if ts is not None else time.time())
+        cents = _cents(price)
+        summary = self.summary
+
+        product = self.index.get(product_id)
+        if product is None:
+            product = len(self.product_ids)
+            self.index[product_id] = product
+            self.product_ids.append(product_id)
+            self._new_products.append(product_id)
+            for name, column in summary.items():
+                column.append(0)
+            summary['min'][product] = summary['max'][product] = cents
+        elif summary['last'][product] == cents:
+            return False
+
+        if self.base_ts is None:
+            self.base_ts = self.last_ts = ts
+        self.log['product'].append(product)
+        self.log['ts'].append(ts - self.last_ts)
+        self.log['price'].append(cents - summary['last'][product])
+        self.last_ts = ts
+        self._new_records += 1
+
+        summary['previous'][product] = summary['last'][product]
+        summary['last'][product] = cents
+        summary['min'][product] = min(summary['min'][product], cents)
+        summary['max'][product] = max(summary['max'][product], cents)
+        summary['last_change'][product] = ts
+        summary['changes'][product] += 1
+        if self.flush_every and self._new_records >= self.flush_every:
+            self.flush()
+        return True
+
+    def stats(self, product_id):
+        """
+        Summary for one product, or None if it was never recorded
+        """
+        product = self.index.get(product_id)
+        if product is None:
+            return None
+        summary = self.summary
+        changes = summary['changes'][product]
+        return {
+            'product_id': product_id,
+            'last': summary['last'][product] / 100,
+            'previous': summary['previous'][product] / 100 if changes > 1 else None,
+            'min': summary['min'][product] / 100,
+            'max': summary['max'][product] / 100,
+            'last_change': summary['last_change'][product],
+            'changes': changes,
+        }
+
+    def history(self, product_id):
+        """
+        [(timestamp, price), ...] for one product; scans the log
+        """
+        product = self.index.get(product_id)
+        if product is None:
+            return []
+        points = []
+        ts = self.base_ts or 0
+        price = 0
+        for p, ts_delta, price_delta in zip(*self.log.values()):
+            ts += ts_delta
+            if p == product:
+                price += price_delta
+                points.append((ts, price / 100))
+        return points
+
+    def drops(self, min_percent=0.0, since=None):
+        """
+        Products whose latest change was a price drop of at least
+        min_percent, biggest drop first
+        """
+        summary = self.summary
+        results = []
+        for product, product_id in enumerate(self.product_ids):
+            if summary['changes'][product] < 2:
+                continue
+            if since is not None and summary['last_change'][product] < since:
+                continue
+            previous, last = summary['previous'][product], summary['last'][product]
+            if previous <= 0 or last >= previous:
+                continue
+            percent = (previous - last) / previous * 100
+            if percent >= min_percent:
+                results.append({**self.stats(product_id), 'drop_percent': round(percent, 1)})
+        results.sort(key=lambda row: row['drop_percent'], reverse=True)
+        return results
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def flush(self):
+        """
+        Append new products/records to disk and rewrite the summary
+        """
+        if self._new_products:
+            with open(self.path / 'products.txt', 'a', encoding='utf-8') as f:
+                f.write(''.join(f'{product_id}\n' for product_id in self._new_products))
+            self._new_products = []
+        if self._new_records:
+            for name, column in self.log.items():
+                with open(self.path / f'log.{name}', 'ab') as f:
+                    column[-self._new_records:].tofile(f)
+            self._new_records = 0
+        for name, column in self.summary.items():
+            _write_atomic(self.path / f'summary.{name}', column.tobytes())
+        meta = {'base_ts': self.base_ts, 'last_ts': self.last_ts, 'records': len(self.log['product'])}
+        _write_atomic(self.path / 'meta.json', json.dumps(meta).encode('utf-8'))
+
+    def close(self):
+        self.flush()
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query a price history store')
+    parser.add_argument('path', help='store directory (PRICE_HISTORY_DIR)')
+    parser.add_argument('product_ids', nargs='*', help='show stats and history for these products')
+    parser.add_argument('--drops', type=float, metavar='PERCENT',
+                        help='list products whose last change was a drop of at least PERCENT')
+    args = parser.parse_args()
+
+    store = PriceHistory(args.path)
+    if args.drops is not None:
+        for row in store.drops(args.drops):
+            print(json.dumps(row))
+    for product_id in args.product_ids:
+        print(json.dumps({**(store.stats(product_id) or {'product_id': product_id}),
+                          'history': store.history(product_id)}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Price parsing shared by the item loaders and pipelines
+
+All Jumia storefronts render prices as a currency marker plus a
+number with thousands separators, e.g.
+
+    "KSh 7,699"              (Kenya)
+    "₦ 125,000"              (Nigeria)
+    "EGP 4,599.00"           (Egypt)
+    "1 299,00 Dhs"           (Morocco)
+    "1.299,00 DT"            (dot thousands, decimal comma)
+    "KSh 1,000 - KSh 2,000"  (price range)
+
+Everything is done with precompiled patterns, so each value is
+scanned once no matter how it is formatted.
+"""
+
+import re
+
+# Currency markers used across the Jumia country sites -> ISO code.
+# Longer markers come first so the regex alternation prefers them.
+CURRENCY_SYMBOLS = {
+    'KSh': 'KES', 'Ksh': 'KES', 'ksh': 'KES', 'KES': 'KES',
+    '₦': 'NGN', 'NGN': 'NGN',
+    'EGP': 'EGP', 'E£': 'EGP', 'جنيه': 'EGP',
+    'GH₵': 'GHS', 'GH¢': 'GHS', 'GHS': 'GHS',
+    'Dhs': 'MAD', 'DH': 'MAD', 'MAD': 'MAD',
+    'USh': 'UGX', 'UGX': 'UGX',
+    'FCFA': 'XOF', 'CFA': 'XOF', 'XOF': 'XOF',
+    'TND': 'TND', 'DT': 'TND',
+    'DZD': 'DZD', 'DA': 'DZD',
+    'ZAR': 'ZAR',
+}
+
+# Markers only count as whole words: "DA" in "DAY" or "DH" in "ADHD" is not a price
+_CURRENCY_RE = re.compile(
+    r'(?<![^\W\d_])(?:'
+    + '|'.join(re.escape(s) for s in sorted(CURRENCY_SYMBOLS, key=len, reverse=True))
+    + r')(?![^\W\d_])'
+)
+
+# A number may use commas, dots, spaces or (narrow) no-break spaces as
+# separators, but not line breaks or tabs: "KSh 1,000\n2 left" is 1000.
+# _to_number() works out which separator is the decimal mark:
+# "4,599.00", "1 299,00" (Morocco, francophone sites), "1.299,00".
+_NUMBER_RE = re.compile(r'\d(?:[\d,. \u00a0\u202f]*\d)?')
+
+# Spaces to delete before float()
+_SPACES = str.maketrans('', '', ' \u00a0\u202f')
+
+
+def _to_number(token):
+    token = token.translate(_SPACES)
+    comma, dot = token.rfind(','), token.rfind('.')
+    if comma > dot:
+        # Decimal comma after dot thousands ("1.299,00"), or a lone
+        # comma before one or two digits ("1 299,00"); else thousands
+        decimal = ',' if dot >= 0 or len(token) - comma <= 3 else None
+    elif dot > comma:
+        # Several dots are thousands separators ("1.299.000")
+        decimal = '.' if token.count('.') == 1 else None
+    else:
+        decimal = None
+    thousands = {',': '.', '.': ',', None: ',.'}[decimal]
+    token = token.translate(str.maketrans('', '', thousands))
+    if decimal == ',':
+        token = token.replace(',', '.')
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def parse_price_range(value):
+    """
+    Parse a price string into a (low, high) tuple of floats
+
+    Single prices give low == high. Returns None if the value
+    holds no number.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value), float(value)
+
+    numbers = _NUMBER_RE.findall(str(value))
+    if not numbers:
+        return None
+
+    low = _to_number(numbers[0])
+    high = _to_number(numbers[-1]) if len(numbers) > 1 else low
+    if low is None or high is None:
+        return None
+    return low, high
+
+
+def parse_price(value):
+    """
+    Parse a price string into a float
+
+    "KSh 7,699" -> 7699.0
+    For ranges the lower bound is returned ("from" price).
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    match = _NUMBER_RE.search(str(value))
+    if match is None:
+        return None
+    return _to_number(match.group())
+
+
+def detect_currency(value):
+    """
+    Return the ISO currency code of a price string, or None
+    """
+    if not value or not isinstance(value, str):
+        return None
+    match = _CURRENCY_RE.search(value)
+    return CURRENCY_SYMBOLS[match.group()] if match else None
@@ -0,0 +1,406 @@
+"""
+Change-rate-aware recrawling of listing pages
+
+Every visit to a listing page is recorded with a fingerprint of the
+products on it (product ids and prices). From the visits and the
+changes they found, each page gets an estimated change rate, using
+the Cho & Garcia-Molina estimator for pages observed at intervals:
+
+    rate = -ln((n - X + 0.5) / (n + 0.5)) / mean interval
+
+for n compared visits of which X saw a change. The rate sets
+
+    revisit interval  long enough that the page has changed with
+                      probability RECRAWL_TARGET_PROBABILITY, clamped
+                      to [RECRAWL_MIN_INTERVAL, RECRAWL_MAX_INTERVAL]
+    priority          0-100, the probability it has changed by now
+
+RecrawlSpiderMiddleware applies them during a crawl: fanned-out
+listing pages that aren't due are not requested, the others are
+requested most-likely-changed first. Pages never seen before are due
+at once.
+
+Every observation is also kept, so a policy can be checked offline
+against a recorded history, next to a uniform revisit schedule with
+the same request budget:
+
+    python -m jumiascraper.recrawl recrawl.sqlite               # pages, rates, next visits
+    python -m jumiascraper.recrawl recrawl.sqlite --simulate 20 # replay, 20 visits per step
+
+benchmarks/bench_recrawl.py does the same on synthetic histories.
+"""
+
+import argparse
+import hashlib
+import math
+import sqlite3
+import time
+from urllib.parse import urldefrag
+
+from itemadapter import ItemAdapter
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def page_fingerprint(items):
+    """
+    8-byte digest of the (product_id, price) set on a page
+    """
+    entries = []
+    for item in items:
+        adapter = ItemAdapter(item)
+        entries.append(f"{adapter.get('product_id')}\x1f{adapter.get('current_price')}")
+    data = '\x1e'.join(sorted(entries))
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=8).digest()
+
+
+def estimate_change_rate(visits, changes, observed):
+    """
+    Changes per second from `visits` compared visits spread over
+    `observed` seconds, `changes` of which found the page changed.
+    None until there is a comparison to go on.
+    """
+    if visits <= 0 or observed <= 0:
+        return None
+    mean_interval = observed / visits
+    return max(0.0, -math.log((visits - changes + 0.5) / (visits + 0.5)) / mean_interval)
+
+
+class RecrawlPolicy:
+    """
+    Revisit interval and priority from a change rate
+    """
+
+    def __init__(self, min_interval=HOUR, max_interval=7 * DAY, target_probability=0.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_probability = target_probability
+
+    def interval(self, rate):
+        if rate is None:
+            return self.min_interval
+        if rate <= 0:
+            return self.max_interval
+        interval = -math.log(1 - self.target_probability) / rate
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def priority(self, rate, since):
+        """
+        Probability, in percent, that the page changed in the last `since` seconds
+        """
+        if rate is None:
+            return 100
+        return round(100 * (1 - math.exp(-rate * max(0.0, since))))
+
+
+class PageHistory:
+    """
+    Per-page visit statistics and the raw observations, in SQLite
+
+        history = PageHistory('recrawl.sqlite')
+        history.record(url, page_fingerprint(items))  # True if the page changed
+        history.due(url), history.priority(url)
+    """
+
+    def __init__(self, path, policy=None):
+        self.path = path
+        self.policy = policy or RecrawlPolicy()
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url         TEXT PRIMARY KEY,
+                fingerprint BLOB NOT NULL,
+                visits      INTEGER NOT NULL,  -- visits compared with a previous one
+                changes     INTEGER NOT NULL,
+                observed    REAL NOT NULL,     -- seconds covered by those visits
+                last_visit  REAL NOT NULL,
+                last_change REAL,
+                next_visit  REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS observations (
+                url         TEXT NOT NULL,
+                ts          REAL NOT NULL,
+                fingerprint BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS observations_url ON observations (url, ts);
+        """)
+
+    def _page(self, url):
+        return self.conn.execute(
+            'SELECT fingerprint, visits, changes, observed, last_visit FROM pages WHERE url = ?',
+            (url,),
+        ).fetchone()
+
+    def record(self, url, fingerprint, now=None):
+        """
+        Record a visit; returns True if the page changed since the last one
+        """
+        now = time.time() if now is None else now
+        self.conn.execute(
+            'INSERT INTO observations (url, ts, fingerprint) VALUES (?, ?, ?)',
+            (url, now, fingerprint),
+        )
+        row = self._page(url)
+        if row is None:
+            visits = changes = 0
+            observed = 0.0
+            changed = False
+        else:
+            previous, visits, changes, observed, last_visit = row
+            changed = previous != fingerprint
+            visits += 1
+            changes += changed
+            observed += max(0.0, now - last_visit)
+        rate = estimate_change_rate(visits, changes, observed)
+        self.conn.execute(
+            'INSERT INTO pages (url, fingerprint, visits, changes, observed, last_visit, '
+            'last_change, next_visit) VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (url) DO UPDATE SET fingerprint = excluded.fingerprint, '
+            'visits = excluded.visits, changes = excluded.changes, '
+            'observed = excluded.observed, last_visit = excluded.last_visit, '
+            'last_change = COALESCE(excluded.last_change, pages.last_change), '
+            'next_visit = excluded.next_visit',
+            (url, fingerprint, visits, changes, observed, now,
+             now if changed else None, now + self.policy.interval(rate)),
+        )
+        self.conn.commit()
+        return changed
+
+    def rate(self, url):
+        row = self._page(url)
+        return None if row is None else estimate_change_rate(row[1], row[2], row[3])
+
+    def due(self, url, now=None):
+        now = time.time() if now is None else now
+        row = self.conn.execute('SELECT next_visit FROM pages WHERE url = ?', (url,)).fetchone()
+        return row is None or row[0] <= now
+
+    def priority(self, url, now=None):
+        now = time.time() if now is None else now
+        row = self._page(url)
+        if row is None:
+            return 100
+        return self.policy.priority(estimate_change_rate(row[1], row[2], row[3]), now - row[4])
+
+    def pages(self):
+        """
+        (url, visits, changes, rate per day, next visit) for every page
+        """
+        for url, visits, changes, observed, next_visit in self.conn.execute(
+            'SELECT url, visits, changes, observed, next_visit FROM pages ORDER BY url'
+        ):
+            rate = estimate_change_rate(visits, changes, observed)
+            yield url, visits, changes, None if rate is None else rate * DAY, next_visit
+
+    def timelines(self):
+        """
+        {url: [(ts, fingerprint), ...]} of every recorded observation
+        """
+        timelines = {}
+        for url, ts, fingerprint in self.conn.execute(
+            'SELECT url, ts, fingerprint FROM observations ORDER BY url, ts'
+        ):
+            timelines.setdefault(url, []).append((ts, fingerprint))
+        return timelines
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def change_times(observations):
+    """
+    Times at which a recorded page was first seen changed
+    """
+    times = []
+    for (_, before), (ts, after) in zip(observations, observations[1:]):
+        if before != after:
+            times.append(ts)
+    return times
+
+
+def simulate(timelines, budget, step, policy=None, start=None, end=None):
+    """
+    Replay pages' change times with `budget` visits every `step` seconds.
+
+    timelines is {url: sorted change times}. Returns, for the adaptive
+    policy and for a uniform round robin, the visits made and the
+    changes they caught (a visit catches a change when the page changed
+    at least once since the previous visit).
+    """
+    policy = policy or RecrawlPolicy(min_interval=step, max_interval=1000 * step)
+    urls = sorted(timelines)
+    all_times = [t for times in timelines.values() for t in times]
+    start = min(all_times, default=0.0) if start is None else start
+    end = max(all_times, default=0.0) if end is None else end
+
+    def changed_between(url, since, until):
+        return any(since < t <= until for t in timelines[url])
+
+    results = {}
+    # Uniform: visit pages in a fixed rotation
+    last = {url: start for url in urls}
+    visits = caught = 0
+    cursor = 0
+    now = start
+    while now <= end:
+        for _ in range(min(budget, len(urls))):
+            url = urls[cursor % len(urls)]
+            cursor += 1
+            visits += 1
+            caught += changed_between(url, last[url], now)
+            last[url] = now
+        now += step
+    results['uniform'] = {'visits': visits, 'changes_caught': caught}
+
+    # Adaptive: most-likely-changed due pages first, same budget
+    state = {url: {'last': start, 'visits': 0, 'changes': 0, 'observed': 0.0, 'next': start}
+             for url in urls}
+    visits = caught = 0
+    now = start
+    while now <= end:
+        due = [url for url in urls if state[url]['next'] <= now]
+
+        def score(url):
+            s = state[url]
+            rate = estimate_change_rate(s['visits'], s['changes'], s['observed'])
+            return policy.priority(rate, now - s['last'])
+
+        for url in sorted(due, key=score, reverse=True)[:budget]:
+            s = state[url]
+            changed = changed_between(url, s['last'], now)
+            visits += 1
+            caught += changed
+            s['visits'] += 1
+            s['changes'] += changed
+            s['observed'] += now - s['last']
+            s['last'] = now
+            rate = estimate_change_rate(s['visits'], s['changes'], s['observed'])
+            s['next'] = now + policy.interval(rate)
+        now += step
+    results['adaptive'] = {'visits': visits, 'changes_caught': caught}
+    return results
+
+
+class RecrawlSpiderMiddleware:
+    """
+    Record listing page visits and schedule listing requests by change rate
+
+    Only requests that go to the spider's listing callback are touched.
+    Fanned-out pages (meta 'fanned_out') that aren't due are dropped;
+    other listing requests (start URLs, "Next Page" chains) are always
+    sent, since skipping them would cut the crawl short, but still get
+    their priority.
+
+    Products on skipped pages aren't seen in the run, so
+    IncrementalPipeline writes no tombstones for a run that skipped any
+    page (see the recrawl/skipped stat).
+
+    Settings:
+        RECRAWL_ENABLED              - turn it on (off by default)
+        RECRAWL_STORE                - path of the SQLite history
+        RECRAWL_MIN_INTERVAL         - seconds (default 1 hour)
+        RECRAWL_MAX_INTERVAL         - seconds (default 7 days)
+        RECRAWL_TARGET_PROBABILITY   - change probability to revisit at (0.5)
+    """
+
+    def __init__(self, history, stats):
+        self.history = history
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('RECRAWL_ENABLED'):
+            raise NotConfigured('RECRAWL_ENABLED is off')
+        policy = RecrawlPolicy(
+            min_interval=settings.getfloat('RECRAWL_MIN_INTERVAL', HOUR),
+            max_interval=settings.getfloat('RECRAWL_MAX_INTERVAL', 7 * DAY),
+            target_probability=settings.getfloat('RECRAWL_TARGET_PROBABILITY', 0.5),
+        )
+        middleware = cls(PageHistory(settings.get('RECRAWL_STORE', 'recrawl.sqlite'), policy),
+                         crawler.stats)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    @staticmethod
+    def _is_listing(request, spider):
+        callback = request.callback
+        return callback is None or getattr(callback, '__func__', None) is type(spider).parse
+
+    def process_spider_output(self, response, result, spider):
+        items = []
+        for obj in result:
+            if isinstance(obj, Request):
+                if self._is_listing(obj, spider):
+                    obj = self._schedule(obj)
+                    if obj is None:
+                        continue
+                elif 'item' in obj.cb_kwargs:
+                    # Items held back for enrichment still belong to this page
+                    items.append(obj.cb_kwargs['item'])
+            else:
+                items.append(obj)
+            yield obj
+        if self._is_listing(response.request, spider) and response.status == 200:
+            self._record(response, items)
+
+    async def process_spider_output_async(self, response, result, spider):
+        items = []
+        async for obj in result:
+            if isinstance(obj, Request):
+                if self._is_listing(obj, spider):
+                    obj = self._schedule(obj)
+                    if obj is None:
+                        continue
+                elif 'item' in obj.cb_kwargs:
+                    items.append(obj.cb_kwargs['item'])
+            else:
+                items.append(obj)
+            yield obj
+        if self._is_listing(response.request, spider) and response.status == 200:
+            self._record(response, items)
+
+    def _schedule(self, request):
+        url = urldefrag(request.url)[0]
+        if request.meta.get('fanned_out') and not self.history.due(url):
+            self.stats.inc_value('recrawl/skipped')
+            return None
+        self.stats.inc_value('recrawl/scheduled')
+        return request.replace(priority=request.priority + self.history.priority(url))
+
+    def _record(self, response, items):
+        changed = self.history.record(urldefrag(response.url)[0], page_fingerprint(items))
+        self.stats.inc_value('recrawl/changed' if changed else 'recrawl/unchanged')
+
+    def spider_closed(self, spider):
+        self.history.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or replay a recrawl history')
+    parser.add_argument('path', help='history file (RECRAWL_STORE)')
+    parser.add_argument('--simulate', type=int, metavar='BUDGET',
+                        help='replay the recorded observations with BUDGET visits per step')
+    parser.add_argument('--step', type=float, default=DAY, help='seconds per step (default 1 day)')
+    args = parser.parse_args()
+
+    history = PageHistory(args.path)
+    if args.simulate:
+        timelines = {url: change_times(obs) for url, obs in history.timelines().items()}
+        for name, result in simulate(timelines, args.simulate, args.step).items():
+            print(f"{name:9s} visits={result['visits']:6d}  changes caught={result['changes_caught']:6d}")
+        return
+    for url, visits, changes, per_day, next_visit in history.pages():
+        rate = '-' if per_day is None else f'{per_day:.2f}/day'
+        print(f"{url}  visits={visits} changes={changes} rate={rate} "
+              f"next={time.strftime('%Y-%m-%d %H:%M', time.localtime(next_visit))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,557 @@
+"""
+On-disk product search index
+
+Answers queries like
+
+    samsung under 20,000 ksh with 128gb
+
+over everything scraped so far, without loading a feed. One directory
+holds:
+
+    docs.jsonl      one JSON document per indexed product version
+    docs.offset     uint64   byte offset of each document in docs.jsonl
+    docs.price      float64  current_price (NaN when missing)
+    docs.key        uint64   hash of the document, to skip unchanged products
+    docs.live       uint8    0 once a newer version of the product is indexed
+    ids.txt         product ids, line number = doc id
+    seg-NNNNNN/     one segment per commit:
+        terms.json  {term: [start, count]} into postings
+        postings    uint32 doc ids, sorted, term after term
+        by_price    uint32 the segment's doc ids in price order
+    meta.json       document count, file sizes and segment list
+
+Doc ids only grow and a segment only holds the documents of its own
+commit, so a term's postings over the whole index are its per-segment
+lists one after the other, already sorted. A changed product gets a new
+doc id and its old one is marked dead; a commit appends and costs the
+size of the change, not of the index. Segments are merged (dropping
+dead doc ids) once there are more than max_segments; compact() also
+drops dead documents from docs.*.
+
+Terms are the name and brand tokens, lower-cased, accents stripped, a
+number joined to its unit ("128 GB" -> "128gb"), plus brand:<brand>.
+Every query term must match; prices are in each product's storefront
+currency. Uncommitted products aren't searchable yet.
+
+    index = SearchIndex('search_index')
+    index.add(item)
+    index.commit()
+    total, hits = index.search('samsung under 20,000 ksh with 128gb')
+
+Command line:
+
+    python -m jumiascraper.search search_index samsung under 20,000 with 128gb
+    python -m jumiascraper.search search_index --compact
+
+Needs numpy.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+from pathlib import Path
+
+from itemadapter import ItemAdapter
+
+from jumiascraper.prices import CURRENCY_SYMBOLS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Item fields kept in docs.jsonl and returned with every hit
+DOC_FIELDS = (
+    'product_id', 'name', 'brand', 'current_price', 'original_price',
+    'currency', 'full_url', 'rating',
+)
+DOC_COLUMNS = {'offset': 'u8', 'price': 'f8', 'key': 'u8', 'live': 'u1'}
+
+_TOKEN_RE = re.compile(r'[a-z]*\d+(?:\.\d+)?[a-z]*|[a-z]+')
+# Joined to the number before them: "128 GB" -> "128gb"
+_UNITS = frozenset({'gb', 'tb', 'mb', 'mah', 'mp', 'hz', 'w', 'g', 'inch', 'inches'})
+
+_STOPWORDS = frozenset({'a', 'an', 'and', 'the', 'with', 'for', 'in', 'of', 'on', 'or', 'to'})
+_CURRENCY_WORDS = frozenset(
+    normalized for normalized in (symbol.lower() for symbol in CURRENCY_SYMBOLS)
+    if normalized.isascii() and normalized.isalpha()
+) | {'shillings', 'naira', 'bob'}
+
+_THOUSANDS_RE = re.compile(r'(?<=\d),(?=\d{3}(?!\w))')
+_SYMBOLS_RE = re.compile(r'[₦£¢₵]')
+_PRICE_PREFIX_RE = re.compile(r'\bprice:\s*')
+_BRAND_RE = re.compile(r'\bbrand:(\S+)')
+_AMOUNT = r'(\d+(?:\.\d+)?)(k)?(?![a-z0-9.])'
+_RANGE_RE = re.compile(
+    rf'\b(?:between|from)\s+{_AMOUNT}\s*(?:and|to|-)\s*{_AMOUNT}|\b{_AMOUNT}\s*(?:-|to)\s*{_AMOUNT}'
+)
+_MAX_RE = re.compile(
+    rf'(?:\b(?:under|below|less than|cheaper than|at most|max|up to)|<=?)\s*{_AMOUNT}'
+)
+_MIN_RE = re.compile(rf'(?:\b(?:over|above|more than|at least|min|from)|>=?)\s*{_AMOUNT}')
+
+# A bare "12 to 13" / "12-13" is a model range ("iphone 12 to 13") unless
+# the query names a currency, says price:, or both ends are at least this
+RANGE_PRICE_FLOOR = 100
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    """
+    Normalised tokens of a product name, brand or query
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(normalize(text)):
+        if token in _UNITS and tokens and tokens[-1].replace('.', '', 1).isdigit():
+            tokens[-1] += token
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def _amount(number, k):
+    return float(number) * (1000 if k else 1)
+
+
+def parse_query(text):
+    """
+    {'terms', 'brands', 'min_price', 'max_price'} for a free-text query
+
+        >>> parse_query('Samsung under 20,000 KSh with 128GB')
+        {'terms': ['samsung', '128gb'], 'brands': [], 'min_price': None, 'max_price': 20000.0}
+        >>> parse_query('iphone 12 to 13')
+        {'terms': ['iphone', '12', '13'], 'brands': [], 'min_price': None, 'max_price': None}
+        >>> parse_query('iphone price:12k to 13k')
+        {'terms': ['iphone'], 'brands': [], 'min_price': 12000.0, 'max_price': 13000.0}
+    """
+    text = _THOUSANDS_RE.sub('', normalize(text))
+    has_currency = bool(_SYMBOLS_RE.search(text)) or any(word in _CURRENCY_WORDS for word in text.split())
+    text = _SYMBOLS_RE.sub(' ', text)
+    text = ' '.join(word for word in text.split() if word not in _CURRENCY_WORDS)
+    min_price = max_price = None
+
+    for match in _RANGE_RE.finditer(text):
+        groups = match.groups()
+        if groups[0]:
+            low, high = _amount(*groups[0:2]), _amount(*groups[2:4])
+        else:
+            low, high = _amount(*groups[4:6]), _amount(*groups[6:8])
+            priced = has_currency or text[:match.start()].rstrip().endswith('price:')
+            if not priced and min(low, high) < RANGE_PRICE_FLOOR:
+                continue
+        min_price, max_price = min(low, high), max(low, high)
+        text = text[:match.start()] + ' ' + text[match.end():]
+        break
+    text = _PRICE_PREFIX_RE.sub(' ', text)
+    for pattern in (_MAX_RE, _MIN_RE):
+        match = pattern.search(text)
+        if match:
+            if pattern is _MAX_RE:
+                max_price = _amount(*match.groups())
+            else:
+                min_price = _amount(*match.groups())
+            text = text[:match.start()] + ' ' + text[match.end():]
+
+    brands = [' '.join(tokenize(brand)) for brand in _BRAND_RE.findall(text)]
+    terms = [token for token in tokenize(_BRAND_RE.sub(' ', text)) if token not in _STOPWORDS]
+    return {
+        'terms': list(dict.fromkeys(terms)),
+        'brands': brands,
+        'min_price': min_price,
+        'max_price': max_price,
+    }
+
+
+def document_terms(doc):
+    terms = tokenize(doc.get('name')) + tokenize(doc.get('brand'))
+    brand = ' '.join(tokenize(doc.get('brand')))
+    if brand:
+        terms.append(f'brand:{brand}')
+    return set(terms)
+
+
+def _price(value):
+    return float(value) if isinstance(value, (int, float)) else float('nan')
+
+
+def _doc_key(doc):
+    data = json.dumps(doc, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def _read(path, dtype, writable=False):
+    if not path.exists() or path.stat().st_size == 0:
+        return np.empty(0, dtype=dtype)
+    if writable:
+        return np.fromfile(path, dtype=dtype)
+    # Postings stay on disk; the OS page cache keeps the hot ones
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class _Segment:
+
+    def __init__(self, path):
+        self.path = path
+        self.terms = json.loads((path / 'terms.json').read_text(encoding='utf-8'))
+        self.postings = _read(path / 'postings', np.uint32)
+        self.by_price = _read(path / 'by_price', np.uint32)
+        self._sorted_prices = None
+
+    def lookup(self, term):
+        span = self.terms.get(term)
+        return None if span is None else self.postings[span[0]:span[0] + span[1]]
+
+    def price_span(self, prices, low, high):
+        # A doc's price never changes (a new price is a new doc), so this stays valid
+        if self._sorted_prices is None:
+            self._sorted_prices = prices[self.by_price]
+        return (np.searchsorted(self._sorted_prices, low, 'left'),
+                np.searchsorted(self._sorted_prices, high, 'right'))
+
+    @classmethod
+    def write(cls, path, postings, doc_ids, prices):
+        """
+        postings: {term: sorted uint32 array}; doc_ids/prices: the segment's docs
+        """
+        path.mkdir(parents=True)
+        terms, start = {}, 0
+        with open(path / 'postings', 'wb') as f:
+            for term in sorted(postings):
+                ids = postings[term]
+                terms[term] = [start, len(ids)]
+                start += len(ids)
+                ids.astype(np.uint32, copy=False).tofile(f)
+        doc_ids = np.asarray(doc_ids, dtype=np.uint32)
+        doc_ids[np.argsort(prices, kind='stable')].tofile(path / 'by_price')
+        (path / 'terms.json').write_text(json.dumps(terms, ensure_ascii=False), encoding='utf-8')
+        return cls(path)
+
+
+class SearchIndex:
+
+    def __init__(self, path, max_segments=16):
+        if np is None:
+            raise RuntimeError("SearchIndex needs numpy: pip install numpy")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_segments = max_segments
+
+        meta_path = self.path / 'meta.json'
+        self.meta = json.loads(meta_path.read_text()) if meta_path.exists() else {
+            'docs': 0, 'live': 0, 'docs_bytes': 0, 'ids_bytes': 0,
+            'segments': [], 'next_segment': 1,
+        }
+        n = self.meta['docs']
+        # Anything past the last commit is from a commit (or merge) that
+        # didn't finish: cut the files back to what meta.json counts and
+        # drop segments it doesn't list
+        sizes = {'docs.jsonl': self.meta['docs_bytes'], 'ids.txt': self.meta['ids_bytes']}
+        for name, dtype in DOC_COLUMNS.items():
+            sizes[f'docs.{name}'] = n * np.dtype(dtype).itemsize
+        for name, size in sizes.items():
+            if (self.path / name).exists() and (self.path / name).stat().st_size > size:
+                os.truncate(self.path / name, size)
+        for segment_path in self.path.glob('seg-*'):
+            if segment_path.name not in self.meta['segments']:
+                shutil.rmtree(segment_path, ignore_errors=True)
+        self.columns = {}
+        for name, dtype in DOC_COLUMNS.items():
+            self.columns[name] = _read(self.path / f'docs.{name}', dtype, writable=True)
+        if len(self.columns['live']) != n or int(self.columns['live'].sum()) != self.meta['live']:
+            self._rebuild_live()
+        self.segments = [_Segment(self.path / name) for name in self.meta['segments']]
+
+        self._latest = None
+        # product_id -> (doc, key), until commit()
+        self._pending = {}
+
+    @property
+    def prices(self):
+        return self.columns['price']
+
+    def _product_ids(self):
+        path = self.path / 'ids.txt'
+        return path.read_text(encoding='utf-8').split('\n')[:-1] if path.exists() else []
+
+    def _rebuild_live(self):
+        # Crashed between writing docs.live and meta.json: the newest doc
+        # of every product is the live one
+        latest = {product_id: doc for doc, product_id in enumerate(self._product_ids())}
+        live = np.zeros(self.meta['docs'], dtype=np.uint8)
+        live[np.fromiter(latest.values(), dtype=np.int64, count=len(latest))] = 1
+        self.columns['live'] = live
+        self.meta['live'] = len(latest)
+
+    def _latest_docs(self):
+        if self._latest is None:
+            live = self.columns['live']
+            self._latest = {
+                product_id: doc for doc, product_id in enumerate(self._product_ids()) if live[doc]
+            }
+        return self._latest
+
+    def add(self, item):
+        """
+        Queue a product for the next commit; returns False when it is
+        indexed already exactly as it is
+        """
+        adapter = ItemAdapter(item)
+        product_id = adapter.get('product_id')
+        if not product_id:
+            return False
+        doc = {field: adapter.get(field) for field in DOC_FIELDS}
+        key = _doc_key(doc)
+        current = self._latest_docs().get(product_id)
+        if current is not None and int(self.columns['key'][current]) == key:
+            self._pending.pop(product_id, None)
+            return False
+        self._pending[product_id] = (doc, key)
+        return True
+
+    def commit(self):
+        """
+        Write the queued products as a new segment; returns how many
+        """
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        latest = self._latest_docs()
+        start = self.meta['docs']
+        doc_ids = np.arange(start, start + len(pending), dtype=np.uint32)
+
+        lines, offsets, prices, keys, postings = [], [], [], [], {}
+        offset = self.meta['docs_bytes']
+        live = np.concatenate([self.columns['live'], np.ones(len(pending), dtype=np.uint8)])
+        for doc_id, (product_id, (doc, key)) in zip(doc_ids.tolist(), pending.items()):
+            line = (json.dumps(doc, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+            lines.append(line)
+            offsets.append(offset)
+            offset += len(line)
+            prices.append(_price(doc['current_price']))
+            keys.append(key)
+            for term in document_terms(doc):
+                postings.setdefault(term, []).append(doc_id)
+            previous = latest.get(product_id)
+            if previous is not None:
+                live[previous] = 0
+            latest[product_id] = doc_id
+
+        with open(self.path / 'docs.jsonl', 'ab') as f:
+            f.write(b''.join(lines))
+        ids = ''.join(f'{product_id}\n' for product_id in pending).encode('utf-8')
+        with open(self.path / 'ids.txt', 'ab') as f:
+            f.write(ids)
+        new = {
+            'offset': np.array(offsets, dtype=np.uint64),
+            'price': np.array(prices, dtype=np.float64),
+            'key': np.array(keys, dtype=np.uint64),
+        }
+        for name, values in new.items():
+            with open(self.path / f'docs.{name}', 'ab') as f:
+                values.tofile(f)
+            self.columns[name] = np.concatenate([self.columns[name], values])
+        self.columns['live'] = live
+        _write_atomic(self.path / 'docs.live', live.tobytes())
+
+        name = self._new_segment_name()
+        self.segments.append(_Segment.write(
+            self.path / name,
+            {term: np.array(ids_, dtype=np.uint32) for term, ids_ in postings.items()},
+            doc_ids, new['price'],
+        ))
+        self.meta.update(
+            docs=start + len(pending),
+            live=int(live.sum()),
+            docs_bytes=offset,
+            ids_bytes=self.meta['ids_bytes'] + len(ids),
+            segments=self.meta['segments'] + [name],
+        )
+        self._write_meta()
+
+        if len(self.segments) > self.max_segments:
+            self.merge_segments()
+        return len(pending)
+
+    def _new_segment_name(self):
+        name = f"seg-{self.meta['next_segment']:06d}"
+        self.meta['next_segment'] += 1
+        return name
+
+    def _write_meta(self):
+        _write_atomic(self.path / 'meta.json', json.dumps(self.meta).encode('utf-8'))
+
+    def merge_segments(self):
+        """
+        Merge all segments into one, leaving out dead doc ids
+        """
+        if len(self.segments) < 2:
+            return
+        live = self.columns['live'].view(bool)
+        spans = {}
+        for segment in self.segments:
+            for term in segment.terms:
+                spans.setdefault(term, []).append(segment.lookup(term))
+        postings = {}
+        for term, parts in spans.items():
+            ids = np.concatenate(parts)
+            ids = ids[live[ids]]
+            if len(ids):
+                postings[term] = ids
+        doc_ids = np.flatnonzero(live).astype(np.uint32)
+
+        old = self.segments
+        name = self._new_segment_name()
+        self.segments = [_Segment.write(self.path / name, postings, doc_ids, self.prices[doc_ids])]
+        self.meta['segments'] = [name]
+        self._write_meta()
+        for segment in old:
+            shutil.rmtree(segment.path, ignore_errors=True)
+
+    def compact(self):
+        """
+        Rewrite the index with live documents only
+        """
+        self.commit()
+        tmp_path = self.path.with_name(f'{self.path.name}.compact')
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        compacted = SearchIndex(tmp_path, max_segments=self.max_segments)
+        live = self.columns['live']
+        with open(self.path / 'docs.jsonl', 'rb') as f:
+            for doc_id, line in enumerate(f):
+                if doc_id < len(live) and live[doc_id]:
+                    compacted.add(json.loads(line))
+        compacted.commit()
+
+        old_path = self.path.with_name(f'{self.path.name}.old')
+        os.replace(self.path, old_path)
+        os.replace(tmp_path, self.path)
+        shutil.rmtree(old_path)
+        self.__init__(self.path, max_segments=self.max_segments)
+
+    def _postings(self, term):
+        parts = [ids for ids in (segment.lookup(term) for segment in self.segments) if ids is not None]
+        if not parts:
+            return np.empty(0, dtype=np.uint32)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _price_range(self, low, high, count_only=False):
+        parts, count = [], 0
+        for segment in self.segments:
+            i, j = segment.price_span(self.prices, low, high)
+            count += j - i
+            if not count_only:
+                parts.append(segment.by_price[i:j])
+        if count_only:
+            return count
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.uint32)
+
+    def find(self, terms=(), brands=(), min_price=None, max_price=None, limit=20, sort='price'):
+        """
+        (total matches, first `limit` hits) for products matching every
+        term, any of brands and the price range.
+
+        sort: 'price', '-price' or None (most recently indexed first)
+        """
+        lists = [self._postings(term) for term in terms]
+        if brands:
+            brand_ids = [self._postings(f'brand:{brand}') for brand in brands]
+            lists.append(brand_ids[0] if len(brand_ids) == 1 else np.unique(np.concatenate(brand_ids)))
+        lists.sort(key=len)
+
+        low = -np.inf if min_price is None else min_price
+        high = np.inf if max_price is None else max_price
+        priced = min_price is not None or max_price is not None
+        # Start from whichever is smallest: a term's postings or the price range
+        if priced and (not lists or self._price_range(low, high, count_only=True) < len(lists[0])):
+            candidates, rest = np.sort(self._price_range(low, high)), lists
+        elif lists:
+            candidates, rest = lists[0], lists[1:]
+        else:
+            candidates, rest = np.flatnonzero(self.columns['live']), []
+        for ids in rest:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+
+        candidates = candidates[self.columns['live'][candidates].view(bool)]
+        prices = self.prices[candidates]
+        if priced:
+            mask = (prices >= low) & (prices <= high)
+            candidates, prices = candidates[mask], prices[mask]
+
+        total = len(candidates)
+        if sort == 'price':
+            keys = prices
+        elif sort == '-price':
+            keys = -prices
+        else:
+            keys = -candidates.astype(np.int64)
+        if limit < total:
+            top = np.argpartition(keys, limit)[:limit]
+            order = top[np.argsort(keys[top], kind='stable')]
+        else:
+            order = np.argsort(keys, kind='stable')
+        return total, self.documents(candidates[order[:limit]])
+
+    def search(self, query, limit=20, sort='price'):
+        """
+        find() for a free-text query (see parse_query)
+        """
+        return self.find(**parse_query(query), limit=limit, sort=sort)
+
+    def documents(self, doc_ids):
+        offsets = self.columns['offset']
+        docs = []
+        with open(self.path / 'docs.jsonl', 'rb') as f:
+            for doc_id in doc_ids.tolist():
+                f.seek(int(offsets[doc_id]))
+                docs.append(json.loads(f.readline()))
+        return docs
+
+    def __len__(self):
+        return self.meta['live']
+
+    def close(self):
+        self.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search the product index')
+    parser.add_argument('path', help='index directory (SEARCH_INDEX_DIR)')
+    parser.add_argument('query', nargs='*', help='e.g. samsung under 20,000 with 128gb')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--sort', choices=['price', '-price', 'recent'], default='price')
+    parser.add_argument('--compact', action='store_true', help='drop replaced documents')
+    args = parser.parse_args()
+
+    index = SearchIndex(args.path)
+    if args.compact:
+        index.compact()
+        print(f"{len(index)} products, {len(index.segments)} segment(s)")
+    if args.query:
+        started = time.perf_counter()
+        total, hits = index.search(' '.join(args.query), limit=args.limit,
+                                   sort=None if args.sort == 'recent' else args.sort)
+        took = (time.perf_counter() - started) * 1000
+        for hit in hits:
+            print(json.dumps(hit, ensure_ascii=False))
+        print(f"{total} matches in {took:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
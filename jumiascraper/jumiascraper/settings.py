@@ -26,6 +26,59 @@ ROBOTSTXT_OBEY = True
 CONCURRENT_REQUESTS_PER_DOMAIN = 1
 DOWNLOAD_DELAY = 1
 
+# Multi-category / multi-country crawls (see JumiaSpiderSpider).
+# Can also be passed per run: -a categories=smartphones,laptops -a countries=ke,ng
+#JUMIA_CATEGORIES = ["smartphones"]
+#JUMIA_COUNTRIES = ["ke", "ng", "eg"]
+# Politeness budget applied to *each* country domain; the global
+# CONCURRENT_REQUESTS is raised to cover all domains at once
+#JUMIA_DOMAIN_CONCURRENCY = 1
+#JUMIA_DOMAIN_DELAY = 1
+
+# Fetch product detail pages for specs, ratings and seller, in a separate
+# "<domain>/detail" download slot. Details are stored with the listing
+# fingerprint and only fetched again when the listing card changes.
+#JUMIA_ENRICH = True
+#JUMIA_ENRICH_STORE = "details.sqlite"
+#JUMIA_DETAIL_CONCURRENCY = 2
+#JUMIA_DETAIL_DELAY = 1
+
+# Revisit listing pages by how often they change (recrawl.py). Pages not
+# due yet are skipped, the rest are requested most-likely-changed first.
+# Inspect or replay the history: python -m jumiascraper.recrawl recrawl.sqlite
+#RECRAWL_ENABLED = True
+#RECRAWL_STORE = "recrawl.sqlite"
+#RECRAWL_MIN_INTERVAL = 3600
+#RECRAWL_MAX_INTERVAL = 604800
+#RECRAWL_TARGET_PROBABILITY = 0.5
+# With INCREMENTAL_ENABLED too, runs that skip pages write no tombstones
+# (their products weren't seen, not removed)
+
+# Download product images into a content-addressed store
+# (imagestore.py), in a "jumia-images" download slot. Unchanged images
+# (same ?NNNN cache-buster) are not fetched again. Thumbnails need Pillow.
+#PRODUCT_IMAGES_ENABLED = True
+#PRODUCT_IMAGES_DIR = "images"
+#PRODUCT_IMAGES_CONCURRENCY = 4
+#PRODUCT_IMAGES_DELAY = 0
+#PRODUCT_IMAGES_WORKERS = 2
+#PRODUCT_IMAGES_THUMBS = {"small": [100, 100]}
+#PRODUCT_IMAGES_MAX_DISTANCE = 4
+
+# Keep a searchable index of the scraped products (search.py), updated
+# with the products that changed at the end of every crawl:
+#   python -m jumiascraper.search search_index samsung under 20,000 with 128gb
+#SEARCH_INDEX_ENABLED = True
+#SEARCH_INDEX_DIR = "search_index"
+#SEARCH_INDEX_COMMIT_EVERY = 100000
+
+# Listing extraction engine: "loader" (ItemLoader per product card) or
+# "lxml" (single pass with precompiled XPath, same output)
+#JUMIA_EXTRACTOR = "lxml"
+# Read products from the JSON state embedded in listing pages when
+# present (adds rating, reviews_count, in_stock, seller)
+#JUMIA_JSON_FIRST = True
+
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
 
@@ -40,36 +93,174 @@ DOWNLOAD_DELAY = 1
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
+SPIDER_MIDDLEWARES = {
 #    "jumiascraper.middlewares.JumiascraperSpiderMiddleware": 543,
-#}
+    "jumiascraper.recrawl.RecrawlSpiderMiddleware": 900,
+    # Closest to the spider, so only the callback is timed
+    "jumiascraper.middlewares.InstrumentationSpiderMiddleware": 1000,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
+DOWNLOADER_MIDDLEWARES = {
 #    "jumiascraper.middlewares.JumiascraperDownloaderMiddleware": 543,
-#}
+    "jumiascraper.middlewares.AdaptiveThrottleMiddleware": 940,
+    "jumiascraper.middlewares.InstrumentationDownloaderMiddleware": 950,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
+EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+    # Does nothing unless METRICS_FILE is set
+    "jumiascraper.instrumentation.MetricsDump": 500,
+    # Does nothing unless FEED_SHARDS_DIR is set
+    "jumiascraper.shards.ShardedFeedExport": 510,
+}
+
+# Periodic machine-readable stats dump (instrumentation.MetricsDump)
+#METRICS_FILE = "metrics.jsonl"
+#METRICS_FORMAT = "jsonl"  # or "prometheus"
+#METRICS_INTERVAL = 30
+
+# Every pipeline stage records its time and drops (pipeline/<Stage>/*
+# stats, see instrumentation.timed_stage); False turns that off
+#PIPELINE_TIMING_ENABLED = True
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
 #    "jumiascraper.pipelines.JumiascraperPipeline": 300,
-    "jumiascraper.pipelines.PriceConverterPipeline":100,
-    "jumiascraper.pipelines.PriceToZARPipeline":200,
-    "jumiascraper.pipelines.CalculateSavingsPipeline":300,
-    "jumiascraper.pipelines.DropNoPricePipeline":400,
-    "jumiascraper.pipelines.DuplicatesPipeline":500,
-    'jumiascraper.pipelines.ValidateItemPipeline': 600,
+#    "jumiascraper.pipelines.PriceConverterPipeline":100,
+#    "jumiascraper.pipelines.PriceToZARPipeline":200,
+#    "jumiascraper.pipelines.CalculateSavingsPipeline":300,
+#    "jumiascraper.pipelines.DropNoPricePipeline":400,
+#    "jumiascraper.pipelines.DuplicatesPipeline":500,
+#    'jumiascraper.pipelines.ValidateItemPipeline': 600,
+    # One fused stage doing all of the above in a single pass
+    "jumiascraper.pipelines.NormalizePipeline": 100,
+    # Multi-currency prices next to the source price (CURRENCY_TARGETS)
+    "jumiascraper.pipelines.CurrencyConversionPipeline": 120,
+    # Does nothing unless PRICE_HISTORY_ENABLED is set
+    "jumiascraper.pipelines.PriceHistoryPipeline": 150,
+    # Does nothing unless INCREMENTAL_ENABLED is set
+    "jumiascraper.pipelines.IncrementalPipeline": 200,
+    # Does nothing unless BATCH_ENABLED is set
+    "jumiascraper.pipelines.BatchPostProcessPipeline": 300,
+    # Does nothing unless PRODUCT_IMAGES_ENABLED is set
+    "jumiascraper.pipelines.ProductImagePipeline": 800,
+    # Does nothing unless SEARCH_INDEX_ENABLED is set
+    "jumiascraper.pipelines.SearchIndexPipeline": 850,
+    # Does nothing unless DB_SINK_ENABLED is set
+    "jumiascraper.pipelines.DatabaseSinkPipeline": 900,
 }
 
+# Switch individual NormalizePipeline stages on/off.
+# Currency conversion is done by CurrencyConversionPipeline, which keeps
+# the source price, instead of overwriting prices in place: current_price
+# and original_price stay in KES (currency), the ZAR amounts are in
+# converted_prices / price_zar. Set "convert_currency" back to True (and
+# drop CurrencyConversionPipeline) for the old ZAR-in-place prices.
+NORMALIZE_RULES = {
+    "convert_currency": False,
+}
+#NORMALIZE_RULES = {
+#    "parse_prices": True,
+#    "convert_currency": True,
+#    "calculate_savings": True,
+#    "drop_no_price": True,
+#    "dedup": True,
+#    "validate": True,
+#}
+#NORMALIZE_EXCHANGE_RATE = 0.15
+#NORMALIZE_TARGET_CURRENCY = "ZAR"
+#NORMALIZE_REQUIRED_FIELDS = ["name", "product_id", "current_price"]
+
+# Exchange rates for CurrencyConversionPipeline (see currency.py). A relative
+# CURRENCY_RATES_FILE is looked up in the working directory, then in the
+# project directory; without a readable rate file conversion is switched off
+CURRENCY_TARGETS = ["ZAR"]
+CURRENCY_RATES_FILE = "rates.json"
+#CURRENCY_RATES_URL = "http://localhost:8000/rates.json"
+#CURRENCY_RATES_TTL = 3600
+#CURRENCY_SOURCE = "KES"
+
+# NumPy batch mode for savings/drop-no-price/validation (BatchPostProcessPipeline).
+# Currency conversion then also runs per batch. Turn the matching
+# NormalizePipeline rules off when enabling it:
+#BATCH_ENABLED = True
+#BATCH_SIZE = 1000
+#BATCH_FLUSH_INTERVAL = 1.0
+#NORMALIZE_RULES = {
+#    "convert_currency": False,
+#    "calculate_savings": False,
+#    "drop_no_price": False,
+#    "validate": False,
+#}
+
+# Duplicate filtering on product_id (DuplicatesPipeline / NormalizePipeline):
+# "set" keeps the ids in a set (fastest, fine for normal crawls), "exact"
+# 64-bit digests (a fraction of the memory, adds about 4x slower),
+# "bloom" a Bloom filter with bounded memory, "shared" dedups across
+# crawl nodes through FRONTIER_URL
+#DEDUP_MODE = "set"
+#DEDUP_CAPACITY = 1000000
+#DEDUP_ERROR_RATE = 0.001
+
+# Share one crawl between several processes/hosts (frontier.py): every
+# node runs the same spider with the same FRONTIER_URL. Per-domain rate
+# budgets (requests/s) hold across all nodes, so set DOWNLOAD_DELAY = 0.
+#SCHEDULER = "jumiascraper.frontier.FrontierScheduler"
+#DOWNLOADER_MIDDLEWARES["jumiascraper.frontier.FrontierAckMiddleware"] = 1000
+#FRONTIER_URL = "sqlite:///frontier.sqlite"  # or "redis://host:6379/0"
+#FRONTIER_KEY = "jumia"
+#FRONTIER_DOMAIN_RATE = 1.0
+#FRONTIER_DOMAIN_RATES = {"www.jumia.co.ke": 2.0}
+#FRONTIER_LEASE = 300
+#FRONTIER_IDLE_TIMEOUT = 10
+
+# Incremental crawls: only emit new/changed products (IncrementalPipeline)
+#INCREMENTAL_ENABLED = True
+#INCREMENTAL_STORE = "incremental.sqlite"
+#INCREMENTAL_TOMBSTONES = "tombstones.jsonl"
+
+# Append-only price change history (PriceHistoryPipeline), query with
+# python -m jumiascraper.pricehistory price_history --drops 10
+#PRICE_HISTORY_ENABLED = True
+#PRICE_HISTORY_DIR = "price_history"
+#PRICE_HISTORY_FLUSH_EVERY = 10000
+
+# Batched upserts into a database (DatabaseSinkPipeline). Any DB-API
+# driver works, e.g. DB_SINK_DRIVER = "psycopg2", DB_SINK_ARGS = ["dbname=jumia"]
+#DB_SINK_ENABLED = True
+#DB_SINK_DRIVER = "sqlite3"
+#DB_SINK_ARGS = ["products.sqlite"]
+#DB_SINK_TABLE = "products"
+#DB_SINK_BATCH_SIZE = 500
+#DB_SINK_MAX_PENDING = 4
+
+# Adaptive per-domain rate control (AdaptiveThrottleMiddleware), off by
+# default: the crawl keeps DOWNLOAD_DELAY / CONCURRENT_REQUESTS_PER_DOMAIN
+# above. When enabled it starts from those, speeds up while responses stay
+# fast (delay down to ADAPTIVE_THROTTLE_MIN_DELAY, then concurrency up to
+# ADAPTIVE_THROTTLE_MAX_CONCURRENCY per listing domain) and backs off on
+# 429/503, errors and slowdowns. Detail and image slots never go above
+# their configured concurrency. Raise MIN_DELAY to keep a floor on the
+# delay against live sites.
+# Try it locally with python benchmarks/bench_throttle.py
+#ADAPTIVE_THROTTLE_ENABLED = True
+#ADAPTIVE_THROTTLE_MIN_CONCURRENCY = 1
+#ADAPTIVE_THROTTLE_MAX_CONCURRENCY = 8
+#ADAPTIVE_THROTTLE_MIN_DELAY = 0
+#ADAPTIVE_THROTTLE_MAX_DELAY = 60
+#ADAPTIVE_THROTTLE_DELAY_STEP = 0.25
+#ADAPTIVE_THROTTLE_TARGET_LATENCY = 2.0
+#ADAPTIVE_THROTTLE_SLOWDOWN = 2.0
+#ADAPTIVE_THROTTLE_BACKOFF_CODES = [429, 503]
+#ADAPTIVE_THROTTLE_DEBUG = False
 
 # Enable and configure the AutoThrottle extension (disabled by default)
+# Use either this or ADAPTIVE_THROTTLE_ENABLED, not both
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 #AUTOTHROTTLE_ENABLED = True
 # The initial download delay
@@ -90,5 +281,28 @@ ITEM_PIPELINES = {
 #HTTPCACHE_IGNORE_HTTP_CODES = []
 #HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
 
+# Record/replay crawls with the content-addressed cache (httpcache.py).
+# "record" fetches every page live and stores it (replacing older copies),
+# "replay" runs from the cache only.
+#JUMIA_CACHE_MODE = "record"
+#JUMIA_REPLAY_CONCURRENCY = 64
+# Evict least recently used bodies past this size (0 = no limit)
+#HTTPCACHE_MAX_BYTES = 2 * 1024**3
+#HTTPCACHE_COMPRESS_LEVEL = 6
+
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
+
+# Typed columnar feeds (needs pyarrow): -O items.parquet / -O items.arrow
+FEED_EXPORTERS = {
+    "parquet": "jumiascraper.exporters.ParquetItemExporter",
+    "arrow": "jumiascraper.exporters.ArrowItemExporter",
+}
+#PARQUET_ROW_GROUP_SIZE = 10000
+
+# Compressed JSON Lines shards plus a manifest.json listing the finished
+# ones, readable while the crawl runs (shards.py)
+#FEED_SHARDS_DIR = "feed"
+#FEED_SHARDS_COMPRESSION = "gzip"  # or "zstd" (needs zstandard), "none"
+#FEED_SHARDS_MAX_ITEMS = 10000
+#FEED_SHARDS_MAX_BYTES = 33554432
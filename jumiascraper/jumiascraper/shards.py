@@ -0,0 +1,278 @@
+"""
+Sharded, compressed JSON Lines feed
+
+ShardedFeedExport (EXTENSIONS) writes scraped items as JSON lines into
+a directory of compressed shards, starting a new shard every
+FEED_SHARDS_MAX_ITEMS items or FEED_SHARDS_MAX_BYTES compressed bytes:
+
+    feed/
+        jumiaspider-20261017T104512-3fa2c1-00001.jsonl.gz
+        jumiaspider-20261017T104512-3fa2c1-00002.jsonl.gz
+        jumiaspider-20261017T104512-3fa2c1-00003.jsonl.gz.part   (being written)
+        manifest.json
+
+A shard is written under a .part name and renamed when it is complete,
+then added to manifest.json (rewritten atomically). Anything listed in
+the manifest is finished and will not change, so downstream jobs can
+pick shards up while the crawl is still running and read them in
+parallel. A run's "complete" flag is set when the spider closes.
+Give every crawl process its own directory: the manifest has a single
+writer.
+
+    {"shards": [{"file": "...-00001.jsonl.gz", "run": "...", "items": 10000,
+                 "bytes": 1283344, "sha256": "...", "created": 1760697912.4}, ...],
+     "runs": {"jumiaspider-20261017T104512-3fa2c1": {"started": ..., "complete": true}}}
+
+Run names are the spider name, start time and a random suffix, so two
+runs started in the same second never share shard names.
+
+Compression is gzip by default, zstd with the zstandard package
+(pip install zstandard) or none. read_shard() and finished_shards()
+read them back:
+
+    for path in finished_shards('feed'):
+        for item in read_shard(path):
+            ...
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.serialize import ScrapyJSONEncoder
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}
+
+
+class _CountingFile:
+    """
+    Raw output file that counts and hashes what the compressor writes
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.bytes = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.bytes += len(data)
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ShardWriter:
+    """
+    Rotating writer of compressed JSON Lines shards plus manifest.json
+
+        writer = ShardWriter('feed', 'jumiaspider-20261017T104512-3fa2c1', max_items=10000)
+        writer.write(item)
+        writer.close()
+    """
+
+    def __init__(self, directory, run, compression='gzip', max_items=10000,
+                 max_bytes=32 * 1024**2, level=None):
+        if compression not in EXTENSIONS:
+            raise ValueError(f"compression must be one of {sorted(EXTENSIONS)}, got {compression!r}")
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError("zstd shards need zstandard: pip install zstandard")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.run = run
+        self.compression = compression
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.level = level
+        self.encoder = ScrapyJSONEncoder(ensure_ascii=False)
+
+        self.shard_number = 0
+        self.raw = self.stream = None
+        self.items = 0
+        self.manifest = self._load_manifest()
+        self.manifest['runs'][run] = {
+            'started': time.time(), 'compression': compression, 'complete': False,
+        }
+        self._write_manifest()
+
+    def _load_manifest(self):
+        path = self.directory / 'manifest.json'
+        if path.exists():
+            return json.loads(path.read_text(encoding='utf-8'))
+        return {'shards': [], 'runs': {}}
+
+    def _write_manifest(self):
+        path = self.directory / 'manifest.json'
+        tmp_path = path.with_name(f'{path.name}.tmp')
+        tmp_path.write_text(json.dumps(self.manifest, indent=1), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def _shard_name(self):
+        return f'{self.run}-{self.shard_number:05d}.jsonl{EXTENSIONS[self.compression]}'
+
+    def _open(self):
+        self.shard_number += 1
+        self.raw = _CountingFile(self.directory / f'{self._shard_name()}.part')
+        if self.compression == 'gzip':
+            self.stream = gzip.GzipFile(
+                fileobj=self.raw, mode='wb', mtime=0,
+                compresslevel=self.level if self.level is not None else 6,
+            )
+        elif self.compression == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=self.level if self.level is not None else 3)
+            self.stream = compressor.stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+        self.items = 0
+
+    def write(self, item):
+        if self.stream is None:
+            self._open()
+        line = self.encoder.encode(ItemAdapter(item).asdict()) + '\n'
+        self.stream.write(line.encode('utf-8'))
+        self.items += 1
+        # Compressors buffer, so the byte count lags a little behind
+        if self.items >= self.max_items or (self.max_bytes and self.raw.bytes >= self.max_bytes):
+            self.rotate()
+
+    def rotate(self):
+        """
+        Finish the current shard and list it in the manifest
+        """
+        if self.stream is None:
+            return None
+        if self.stream is not self.raw:
+            self.stream.close()
+        self.raw.close()
+        name = self._shard_name()
+        os.replace(self.directory / f'{name}.part', self.directory / name)
+        self.manifest['shards'].append({
+            'file': name,
+            'run': self.run,
+            'items': self.items,
+            'bytes': self.raw.bytes,
+            'sha256': self.raw.sha256.hexdigest(),
+            'created': time.time(),
+        })
+        self._write_manifest()
+        self.stream = self.raw = None
+        return name
+
+    def close(self):
+        self.rotate()
+        self.manifest['runs'][self.run]['complete'] = True
+        self.manifest['runs'][self.run]['finished'] = time.time()
+        self._write_manifest()
+
+
+class ShardedFeedExport:
+    """
+    Write every scraped item to a ShardWriter
+
+    Settings:
+        FEED_SHARDS_DIR          - output directory (extension is off without it)
+        FEED_SHARDS_COMPRESSION  - 'gzip' (default), 'zstd' or 'none'
+        FEED_SHARDS_LEVEL        - compression level (default 6 for gzip, 3 for zstd)
+        FEED_SHARDS_MAX_ITEMS    - items per shard (default 10000)
+        FEED_SHARDS_MAX_BYTES    - compressed bytes per shard (default 32 MiB, 0 = no limit)
+    """
+
+    def __init__(self, directory, compression='gzip', max_items=10000,
+                 max_bytes=32 * 1024**2, level=None, stats=None):
+        if compression not in EXTENSIONS:
+            raise NotConfigured(
+                f'FEED_SHARDS_COMPRESSION must be one of {sorted(EXTENSIONS)}, got {compression!r}')
+        if compression == 'zstd' and zstandard is None:
+            raise NotConfigured('FEED_SHARDS_COMPRESSION = "zstd" needs zstandard: pip install zstandard')
+        self.directory = directory
+        self.compression = compression
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.level = level
+        self.stats = stats
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        directory = settings.get('FEED_SHARDS_DIR')
+        if not directory:
+            raise NotConfigured('FEED_SHARDS_DIR is not set')
+        level = settings.get('FEED_SHARDS_LEVEL')
+        ext = cls(
+            directory,
+            compression=settings.get('FEED_SHARDS_COMPRESSION', 'gzip'),
+            max_items=settings.getint('FEED_SHARDS_MAX_ITEMS', 10000),
+            max_bytes=settings.getint('FEED_SHARDS_MAX_BYTES', 32 * 1024**2),
+            level=int(level) if level is not None else None,
+            stats=crawler.stats,
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        run = f"{spider.name}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.writer = ShardWriter(
+            self.directory, run, compression=self.compression,
+            max_items=self.max_items, max_bytes=self.max_bytes, level=self.level,
+        )
+
+    def item_scraped(self, item, spider):
+        self.writer.write(item)
+        if self.stats is not None:
+            self.stats.inc_value('feed_shards/items')
+
+    def spider_closed(self, spider, reason):
+        if self.writer is None:
+            return
+        self.writer.close()
+        if self.stats is not None:
+            self.stats.set_value('feed_shards/shards', self.writer.shard_number)
+
+
+def finished_shards(directory, run=None):
+    """
+    Paths of the finished shards listed in directory/manifest.json
+    """
+    directory = Path(directory)
+    manifest = json.loads((directory / 'manifest.json').read_text(encoding='utf-8'))
+    return [
+        directory / shard['file'] for shard in manifest['shards']
+        if run is None or shard['run'] == run
+    ]
+
+
+def read_shard(path):
+    """
+    Items (dicts) of one shard, decompressed by file extension
+    """
+    path = Path(path)
+    if path.suffix == '.gz':
+        f = gzip.open(path, 'rb')
+    elif path.suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError("reading zstd shards needs zstandard: pip install zstandard")
+        f = zstandard.open(path, 'rb')
+    else:
+        f = open(path, 'rb')
+    with f:
+        for line in f:
+            yield json.loads(line)
@@ -1,12 +1,270 @@
+from urllib.parse import parse_qs, urldefrag, urlparse
+
 import scrapy
-from jumiascraper.items import JumiaProduct
+from itemadapter import ItemAdapter
+from scrapy import signals
+from w3lib.url import add_or_replace_parameter
+
+from jumiascraper.enrichment import DetailStore, parse_detail
+from jumiascraper.extractors import extract_listing, extract_store_products
+from jumiascraper.fingerprints import product_fingerprint
+from jumiascraper.items import JumiaProduct, register_adapter
 from jumiascraper.itemloaders import JumiaProductLoader
+from jumiascraper.pipelines import ProductImagePipeline
 
 class JumiaSpiderSpider(scrapy.Spider):
+    """
+    Crawl Jumia category listings
+
+    By default only Kenyan smartphones are crawled. Pass categories
+    and/or countries (comma separated) to crawl several storefronts
+    at once:
+
+        scrapy crawl jumiaspider -a categories=smartphones,laptops -a countries=ke,ng,eg
+
+    Every country domain gets its own download slot, so each site is
+    throttled on its own and the sites are crawled side by side.
+
+    With JUMIA_ENRICH = True every product's detail page is fetched too,
+    in a download slot of its own, unless its listing card is unchanged
+    since the details were last fetched (see enrichment.py).
+    """
     name = 'jumiaspider'
     start_urls = ['https://www.jumia.co.ke/smartphones/']
-    
+
+    # 'loader' (JumiaProductLoader per card) or 'lxml' (extractors.py)
+    extractor = 'loader'
+    # Read products from window.__STORE__ when the page has it
+    json_first = True
+    # Fetch product detail pages (specs, ratings, seller)
+    enrich_details = False
+    detail_store = None
+
+    # Jumia storefronts by country code
+    country_domains = {
+        'ke': 'www.jumia.co.ke',
+        'ng': 'www.jumia.com.ng',
+        'eg': 'www.jumia.com.eg',
+        'gh': 'www.jumia.com.gh',
+        'ma': 'www.jumia.ma',
+        'ug': 'www.jumia.ug',
+        'ci': 'www.jumia.ci',
+        'sn': 'www.jumia.sn',
+        'tn': 'www.jumia.com.tn',
+        'dz': 'www.jumia.dz',
+    }
+
+    def __init__(self, categories=None, countries=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.categories = _split_arg(categories)
+        self.countries = _split_arg(countries)
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        register_adapter()
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        settings = crawler.settings
+
+        # Fall back to the project settings when no -a arguments are given
+        categories = spider.categories or settings.getlist('JUMIA_CATEGORIES')
+        countries = spider.countries or settings.getlist('JUMIA_COUNTRIES')
+        if categories or countries:
+            spider.start_urls = spider.build_start_urls(
+                categories or ['smartphones'], countries or ['ke']
+            )
+
+        spider.configure_cache_mode(settings)
+        spider.configure_domain_slots(settings)
+        spider.extractor = settings.get('JUMIA_EXTRACTOR', spider.extractor)
+        spider.json_first = settings.getbool('JUMIA_JSON_FIRST', spider.json_first)
+        spider.enrich_details = settings.getbool('JUMIA_ENRICH', spider.enrich_details)
+        if spider.enrich_details:
+            spider.detail_store = DetailStore(settings.get('JUMIA_ENRICH_STORE', 'details.sqlite'))
+            crawler.signals.connect(spider.close_detail_store, signal=signals.spider_closed)
+        return spider
+
+    def build_start_urls(self, categories, countries):
+        """
+        One listing URL per (country, category) pair
+        """
+        urls = []
+        for country in countries:
+            domain = self.country_domains.get(country.lower())
+            if domain is None:
+                raise ValueError(
+                    f"Unknown country {country!r}, expected one of {sorted(self.country_domains)}"
+                )
+            for category in categories:
+                urls.append(f"https://{domain}/{category.strip('/')}/")
+        return urls
+
+    def configure_cache_mode(self, settings):
+        """
+        JUMIA_CACHE_MODE = 'record' fetches every page live and keeps
+        the response in the content-addressed cache (httpcache.py),
+        replacing older copies; 'replay' serves the crawl from that
+        cache only, with no network and no delays.
+        """
+        mode = settings.get('JUMIA_CACHE_MODE')
+        if not mode:
+            return
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"JUMIA_CACHE_MODE must be 'record' or 'replay', got {mode!r}")
+
+        settings.set('HTTPCACHE_ENABLED', True, priority='spider')
+        settings.set(
+            'HTTPCACHE_STORAGE', 'jumiascraper.httpcache.ContentAddressedCacheStorage',
+            priority='spider',
+        )
+        if mode == 'record':
+            settings.set('HTTPCACHE_POLICY', 'jumiascraper.httpcache.RecordPolicy', priority='spider')
+        if mode == 'replay':
+            # Requests missing from the cache are ignored, never downloaded
+            concurrency = settings.getint('JUMIA_REPLAY_CONCURRENCY', 64)
+            settings.set('HTTPCACHE_IGNORE_MISSING', True, priority='spider')
+            settings.set('HTTPCACHE_EXPIRATION_SECS', 0, priority='spider')
+            settings.set('DOWNLOAD_DELAY', 0, priority='spider')
+            settings.set('AUTOTHROTTLE_ENABLED', False, priority='spider')
+            settings.set('ADAPTIVE_THROTTLE_ENABLED', False, priority='spider')
+            settings.set('JUMIA_DOMAIN_DELAY', 0, priority='spider')
+            settings.set('JUMIA_DOMAIN_CONCURRENCY', concurrency, priority='spider')
+            settings.set('CONCURRENT_REQUESTS', concurrency, priority='spider')
+
+        self.logger.info(f'HTTP cache mode: {mode}')
+
+    def configure_domain_slots(self, settings):
+        """
+        Give every domain its own politeness budget and scale the
+        global concurrency limit with the number of domains.
+
+        Settings are still unfrozen at this point in the crawler
+        start-up, so they can be adjusted here.
+        """
+        domains = sorted({urlparse(url).hostname for url in self.start_urls})
+
+        per_domain = settings.getint(
+            'JUMIA_DOMAIN_CONCURRENCY', settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN')
+        )
+        delay = settings.getfloat('JUMIA_DOMAIN_DELAY', settings.getfloat('DOWNLOAD_DELAY'))
+
+        slots = dict(settings.getdict('DOWNLOAD_SLOTS'))
+        # AdaptiveThrottleMiddleware may raise the listing slots up to its
+        # maximum; every other configured slot keeps its concurrency as a ceiling
+        max_per_domain = max(per_domain, settings.getint('ADAPTIVE_THROTTLE_MAX_CONCURRENCY', 8))
+        for domain in domains:
+            slots.setdefault(domain, {
+                'concurrency': per_domain, 'delay': delay, 'max_concurrency': max_per_domain,
+            })
+
+        # Detail pages get their own budget so they never starve the listings
+        per_detail_slot = 0
+        if settings.getbool('JUMIA_ENRICH', self.enrich_details):
+            per_detail_slot = settings.getint('JUMIA_DETAIL_CONCURRENCY', 2)
+            detail_delay = settings.getfloat('JUMIA_DETAIL_DELAY', delay)
+            for domain in domains:
+                slots.setdefault(
+                    self.detail_slot(domain),
+                    {'concurrency': per_detail_slot, 'delay': detail_delay},
+                )
+
+        # Product images come from the CDN, one shared slot (pipelines.ProductImagePipeline)
+        image_slot = 0
+        if settings.getbool('PRODUCT_IMAGES_ENABLED'):
+            image_slot = settings.getint('PRODUCT_IMAGES_CONCURRENCY', 4)
+            slots.setdefault(ProductImagePipeline.slot, {
+                'concurrency': image_slot,
+                'delay': settings.getfloat('PRODUCT_IMAGES_DELAY', 0),
+            })
+        settings.set('DOWNLOAD_SLOTS', slots, priority='spider')
+
+        total = (per_domain + per_detail_slot) * len(domains) + image_slot
+        if total > settings.getint('CONCURRENT_REQUESTS'):
+            settings.set('CONCURRENT_REQUESTS', total, priority='spider')
+
+        self.logger.info(
+            f'Crawling {len(self.start_urls)} listings on {len(domains)} domains '
+            f'({per_domain} requests / {delay}s delay per domain)'
+        )
+
     def parse(self, response):
+        # Prefer the embedded JSON state, fall back to the HTML cards
+        items = extract_store_products(response, logger=self.logger) if self.json_first else None
+        if items is None:
+            if self.extractor == 'lxml':
+                items = extract_listing(response, logger=self.logger)
+            else:
+                items = self.parse_products(response)
+        yield from self.enrich(items)
+
+        yield from self.paginate(response)
+
+    @staticmethod
+    def detail_slot(domain):
+        return f'{domain}/detail'
+
+    def enrich(self, items):
+        """
+        Pass listing items through, or hold each one back until its
+        detail page is fetched. Stored details are merged instead when
+        the listing fingerprint matches the one they were fetched for.
+        """
+        if not self.enrich_details:
+            yield from items
+            return
+        stats = self.crawler.stats
+        for item in items:
+            adapter = ItemAdapter(item)
+            product_id = adapter.get('product_id')
+            detail_url = adapter.get('full_url')
+            if not product_id or not detail_url:
+                yield item
+                continue
+            fingerprint = product_fingerprint(item)
+            details = self.detail_store.lookup(product_id, fingerprint)
+            if details is not None:
+                stats.inc_value('enrich/unchanged')
+                self.merge_details(adapter, details)
+                yield item
+                continue
+            stats.inc_value('enrich/requested')
+            # A product listed twice is requested once: the dupefilter drops
+            # the second request along with its duplicate item
+            yield scrapy.Request(
+                detail_url,
+                callback=self.parse_detail,
+                errback=self.detail_failed,
+                cb_kwargs={'item': item, 'fingerprint': fingerprint},
+                meta={'download_slot': self.detail_slot(urlparse(detail_url).hostname)},
+                # Listing pages first, they are what discovers new products
+                priority=-1,
+            )
+
+    def parse_detail(self, response, item, fingerprint):
+        adapter = ItemAdapter(item)
+        details = parse_detail(response)
+        self.detail_store.save(adapter['product_id'], fingerprint, details)
+        self.crawler.stats.inc_value('enrich/fetched')
+        self.merge_details(adapter, details)
+        yield item
+
+    def detail_failed(self, failure):
+        # Still emit the listing data, just without details
+        self.crawler.stats.inc_value('enrich/failed')
+        self.logger.warning(f'Detail page failed: {failure.request.url} ({failure.value!r})')
+        yield failure.request.cb_kwargs['item']
+
+    @staticmethod
+    def merge_details(adapter, details):
+        for field, value in details.items():
+            adapter[field] = value
+
+    def close_detail_store(self, spider):
+        self.detail_store.close()
+
+    def parse_products(self, response):
+        """
+        Loader-based extraction, one JumiaProductLoader per product card
+        """
         products = response.css('a.core')
         self.logger.info(f'Found {len(products)} products on {response.url}')
         
@@ -47,12 +305,68 @@ class JumiaSpiderSpider(scrapy.Spider):
             loader.add_css('image', 'img.img::attr(data-src)')
             
             yield loader.load_item()
-        
-        # Pagination
+
+    def paginate(self, response):
+        # Pages requested by the fan-out below don't paginate themselves
+        if response.meta.get('fanned_out'):
+            return
+
+        # Request all remaining pages at once when the last page is known
+        last_page = self.last_page_number(response)
+        current_page = self.page_number(response.url)
+        if last_page and last_page > current_page:
+            self.logger.info(
+                f'Fanning out pages {current_page + 1}-{last_page} from {response.url}'
+            )
+            for page in range(current_page + 1, last_page + 1):
+                yield scrapy.Request(
+                    self.page_url(response.url, page),
+                    callback=self.parse,
+                    meta={'fanned_out': True, 'page': page},
+                )
+            return
+
+        # Otherwise fall back to following "Next Page" one by one
         next_page = response.css('a[aria-label="Next Page"]::attr(href)').get()
         if next_page is not None:
             next_page_url = response.urljoin(next_page)
             self.logger.info(f'Following next page: {next_page_url}')
             yield response.follow(next_page_url, callback=self.parse)
         else:
-            self.logger.info('Reached last page - Scraping Complete.')
\ No newline at end of file
+            self.logger.info('Reached last page - Scraping Complete.')
+
+    def last_page_number(self, response):
+        """
+        Page number of the "Last Page" link, or None if there isn't one
+        """
+        last_page = response.css('a[aria-label="Last Page"]::attr(href)').get()
+        if last_page is None:
+            return None
+        return self.page_number(response.urljoin(last_page))
+
+    @staticmethod
+    def page_number(url):
+        """
+        "/smartphones/?page=7#catalog-listing" -> 7 (1 when there's no page param)
+        """
+        page = parse_qs(urlparse(url).query).get('page')
+        try:
+            return int(page[0]) if page else 1
+        except ValueError:
+            return 1
+
+    @staticmethod
+    def page_url(url, page):
+        url, _ = urldefrag(url)
+        return add_or_replace_parameter(url, 'page', str(page))
+
+
+def _split_arg(value):
+    """
+    "a, b,c" -> ['a', 'b', 'c'] (spider -a arguments are plain strings)
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [v.strip() for v in value if v.strip()]
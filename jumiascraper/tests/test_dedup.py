@@ -0,0 +1,50 @@
+import pytest
+
+from jumiascraper.dedup import BloomDeduper, DigestDeduper, SetDeduper, make_deduper
+
+
+@pytest.mark.parametrize('mode, cls', [
+    ('set', SetDeduper),
+    ('exact', DigestDeduper),
+    ('bloom', BloomDeduper),
+])
+def test_make_deduper_modes(mode, cls):
+    deduper = make_deduper(mode, capacity=100, error_rate=0.001)
+    assert isinstance(deduper, cls)
+    assert deduper.add('XI996MP5R1YBONAFAMZ') is False
+    assert deduper.add('XI996MP5R1YBONAFAMZ') is True
+    assert deduper.add('IN213MP6GL5WWNAFAMZ') is False
+    assert len(deduper) == 2
+
+
+def test_default_mode_is_set():
+    assert isinstance(make_deduper(), SetDeduper)
+
+
+def test_shared_mode_needs_frontier_url():
+    with pytest.raises(ValueError):
+        make_deduper('shared')
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        make_deduper('sorted')
+
+
+def test_digest_deduper_grows_without_losing_keys():
+    deduper = DigestDeduper(size=8)
+    keys = [f'product-{i}' for i in range(1000)]
+    assert not any(deduper.add(key) for key in keys)
+    assert all(deduper.add(key) for key in keys)
+    assert len(deduper) == 1000
+    assert deduper.count <= len(deduper.table) * deduper.max_load
+
+
+def test_bloom_deduper_past_capacity():
+    deduper = BloomDeduper(capacity=100, error_rate=0.001)
+    keys = [f'product-{i}' for i in range(500)]
+    for key in keys:
+        deduper.add(key)
+    # A duplicate is never missed, whatever filter it landed in
+    assert all(deduper.add(key) for key in keys)
+    assert len(deduper.filters) > 1
@@ -0,0 +1,24 @@
+import pytest
+
+from jumiascraper.exporters import _to_bool
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('False', False),
+    ('false', False),
+    (' FALSE ', False),
+    ('0', False),
+    ('no', False),
+    ('off', False),
+    ('', False),
+    ('True', True),
+    ('yes', True),
+    ('1', True),
+    (True, True),
+    (False, False),
+    (0, False),
+    (1, True),
+    (None, None),
+])
+def test_to_bool(value, expected):
+    assert _to_bool(value) is expected
@@ -0,0 +1,110 @@
+import json
+import logging
+
+import pytest
+from scrapy.exceptions import DropItem
+
+from jumiascraper.items import JumiaProduct
+from jumiascraper.pipelines import IncrementalPipeline
+
+
+class Stats(dict):
+    """
+    The parts of a StatsCollector the pipeline uses
+    """
+
+    def inc_value(self, key, count=1, start=0):
+        self[key] = self.get(key, start) + count
+
+    def get_value(self, key, default=None):
+        return self.get(key, default)
+
+    def set_value(self, key, value):
+        self[key] = value
+
+
+class Spider:
+    logger = logging.getLogger('test')
+
+
+def product(product_id, price=7699.0):
+    return JumiaProduct(name=f'Phone {product_id}', current_price=price, product_id=product_id)
+
+
+def crawl(tmp_path, items, reason='finished', skipped_pages=0, dropped_later=()):
+    """
+    One run of the pipeline; returns (ids let through, stats)
+    """
+    stats = Stats()
+    if skipped_pages:
+        stats['recrawl/skipped'] = skipped_pages
+    pipeline = IncrementalPipeline(
+        str(tmp_path / 'incremental.sqlite'), str(tmp_path / 'tombstones.jsonl'), stats=stats,
+    )
+    spider = Spider()
+    pipeline.open_spider(spider)
+    passed = []
+    for item in items:
+        try:
+            pipeline.process_item(item, spider)
+        except DropItem:
+            continue
+        if item.product_id in dropped_later:
+            pipeline.item_dropped(item, None, DropItem('later stage'), spider)
+        else:
+            pipeline.item_scraped(item, None, spider)
+            passed.append(item.product_id)
+    pipeline.spider_closed(spider, reason)
+    return passed, stats
+
+
+def tombstones(tmp_path):
+    path = tmp_path / 'tombstones.jsonl'
+    if not path.exists():
+        return []
+    return [json.loads(line)['product_id'] for line in path.read_text().splitlines()]
+
+
+def test_only_new_and_changed_items_pass(tmp_path):
+    passed, _ = crawl(tmp_path, [product('A'), product('B')])
+    assert passed == ['A', 'B']
+    passed, stats = crawl(tmp_path, [product('A'), product('B', 6999.0)])
+    assert passed == ['B']
+    assert stats['incremental/unchanged'] == 1
+    assert stats['incremental/changed'] == 1
+
+
+def test_vanished_products_are_tombstoned(tmp_path):
+    crawl(tmp_path, [product('A'), product('B')])
+    _, stats = crawl(tmp_path, [product('A')])
+    assert tombstones(tmp_path) == ['B']
+    assert stats['incremental/vanished'] == 1
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'skipped_pages': 3},
+    {'reason': 'shutdown'},
+])
+def test_no_tombstones_for_partial_runs(tmp_path, kwargs):
+    crawl(tmp_path, [product('A'), product('B')])
+    _, stats = crawl(tmp_path, [product('A')], **kwargs)
+    assert tombstones(tmp_path) == []
+    assert stats['incremental/vanished'] == 0
+    # B is still known, so an unchanged B is dropped next time
+    passed, _ = crawl(tmp_path, [product('A'), product('B')])
+    assert passed == []
+
+
+def test_fingerprint_recorded_only_once_scraped(tmp_path):
+    crawl(tmp_path, [product('A'), product('B')], dropped_later={'B'})
+    # B never reached the feed: it comes through again
+    passed, _ = crawl(tmp_path, [product('A'), product('B')])
+    assert passed == ['B']
+
+
+def test_changed_item_dropped_later_is_not_tombstoned(tmp_path):
+    crawl(tmp_path, [product('A'), product('B')])
+    crawl(tmp_path, [product('A'), product('B', 6999.0)], dropped_later={'B'})
+    assert tombstones(tmp_path) == []
+    passed, _ = crawl(tmp_path, [product('A'), product('B', 6999.0)])
+    assert passed == ['B']
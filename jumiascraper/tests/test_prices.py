@@ -0,0 +1,50 @@
+import pytest
+
+from jumiascraper.prices import _to_number, detect_currency, parse_price, parse_price_range
+
+
+@pytest.mark.parametrize('token, expected', [
+    ('7699', 7699.0),
+    ('7,699', 7699.0),
+    ('12,345,678', 12345678.0),
+    ('4,599.00', 4599.0),
+    ('1.299,00', 1299.0),
+    ('1 299,00', 1299.0),
+    ('1 299,50', 1299.5),
+    ('1.299.000', 1299000.0),
+    ('4,5', 4.5),
+    ('4.5', 4.5),
+])
+def test_to_number_separators(token, expected):
+    assert _to_number(token) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('KSh 7,699', 7699.0),
+    ('KSh 1,000\n2 left', 1000.0),
+    ('1 299,00 Dhs', 1299.0),
+    ('₦ 245,000', 245000.0),
+    ('KSh 7,699 - KSh 9,200', 7699.0),
+    (9200, 9200.0),
+    ('no price', None),
+    (None, None),
+])
+def test_parse_price(value, expected):
+    assert parse_price(value) == expected
+
+
+def test_parse_price_range():
+    assert parse_price_range('KSh 7,699 - KSh 9,200') == (7699.0, 9200.0)
+    assert parse_price_range('KSh 7,699') == (7699.0, 7699.0)
+    assert parse_price_range('') is None
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('KSh 7,699', 'KES'),
+    ('GH₵ 1,200', 'GHS'),
+    ('1 299,00 Dhs', 'MAD'),
+    ('2 DAYS left', None),
+    (None, None),
+])
+def test_detect_currency(value, expected):
+    assert detect_currency(value) == expected